@@ -0,0 +1,40 @@
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import ARRAY
+
+revision = '2026_10_17_100000'
+down_revision = '2025_01_20_123456'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('promo_codes', sa.Column('target_country', sa.String(2), nullable=True))
+    op.add_column('promo_codes', sa.Column('target_age_from', sa.Integer, nullable=True))
+    op.add_column('promo_codes', sa.Column('target_age_until', sa.Integer, nullable=True))
+    op.add_column('promo_codes', sa.Column('target_categories', ARRAY(sa.String(20)), nullable=True))
+
+    op.execute("""
+        UPDATE promo_codes SET
+            target_country = lower(target::jsonb ->> 'country'),
+            target_age_from = (target::jsonb ->> 'age_from')::integer,
+            target_age_until = (target::jsonb ->> 'age_until')::integer,
+            target_categories = CASE
+                WHEN jsonb_typeof(target::jsonb -> 'categories') = 'array'
+                     AND jsonb_array_length(target::jsonb -> 'categories') > 0
+                THEN ARRAY(SELECT lower(c) FROM jsonb_array_elements_text(target::jsonb -> 'categories') AS c)
+            END
+        WHERE target IS NOT NULL
+    """)
+
+    op.create_index('ix_promo_codes_target_country', 'promo_codes', ['target_country'])
+    op.create_index('ix_promo_codes_target_age', 'promo_codes', ['target_age_from', 'target_age_until'])
+    op.create_index('ix_promo_codes_target_categories', 'promo_codes', ['target_categories'], postgresql_using='gin')
+
+def downgrade():
+    op.drop_index('ix_promo_codes_target_categories', table_name='promo_codes')
+    op.drop_index('ix_promo_codes_target_age', table_name='promo_codes')
+    op.drop_index('ix_promo_codes_target_country', table_name='promo_codes')
+    op.drop_column('promo_codes', 'target_categories')
+    op.drop_column('promo_codes', 'target_age_until')
+    op.drop_column('promo_codes', 'target_age_from')
+    op.drop_column('promo_codes', 'target_country')
@@ -0,0 +1,26 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '2026_10_17_110000'
+down_revision = '2026_10_17_100000'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index(
+        'ix_promo_codes_created_at_id', 'promo_codes',
+        [sa.text('created_at DESC'), sa.text('id DESC')]
+    )
+    op.create_index(
+        'ix_promo_codes_company_created_at_id', 'promo_codes',
+        ['company_id', sa.text('created_at DESC'), sa.text('id DESC')]
+    )
+    op.create_index(
+        'ix_comments_promo_date_id', 'comments',
+        ['promo_id', sa.text('date DESC'), sa.text('id DESC')]
+    )
+
+def downgrade():
+    op.drop_index('ix_comments_promo_date_id', table_name='comments')
+    op.drop_index('ix_promo_codes_company_created_at_id', table_name='promo_codes')
+    op.drop_index('ix_promo_codes_created_at_id', table_name='promo_codes')
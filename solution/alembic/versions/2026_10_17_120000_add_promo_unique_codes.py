@@ -0,0 +1,42 @@
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '2026_10_17_120000'
+down_revision = '2026_10_17_110000'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'promo_unique_codes',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('promo_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('code', sa.String(length=30), nullable=False),
+        sa.Column('activated_by', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('activated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['promo_id'], ['promo_codes.promo_id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['activated_by'], ['users.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(
+        'ix_promo_unique_codes_free', 'promo_unique_codes', ['promo_id', 'id'],
+        postgresql_where=sa.text('activated_by IS NULL')
+    )
+    op.execute("""
+        INSERT INTO promo_unique_codes (promo_id, code)
+        SELECT p.promo_id, c.code
+        FROM promo_codes p
+        CROSS JOIN LATERAL json_array_elements_text(p.promo_unique) WITH ORDINALITY AS c(code, position)
+        WHERE p.mode = 'UNIQUE' AND p.promo_unique IS NOT NULL
+        ORDER BY p.promo_id, c.position
+    """)
+    op.execute("""
+        UPDATE promo_codes
+        SET unique_count = json_array_length(promo_unique)
+        WHERE mode = 'UNIQUE' AND promo_unique IS NOT NULL
+    """)
+
+def downgrade():
+    op.drop_index('ix_promo_unique_codes_free', table_name='promo_unique_codes')
+    op.drop_table('promo_unique_codes')
@@ -0,0 +1,30 @@
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '2026_10_17_130000'
+down_revision = '2026_10_17_120000'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'promo_stats_by_country',
+        sa.Column('promo_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('country', sa.String(length=2), nullable=False),
+        sa.Column('activations_count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['promo_id'], ['promo_codes.promo_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('promo_id', 'country')
+    )
+    op.execute("""
+        INSERT INTO promo_stats_by_country (promo_id, country, activations_count)
+        SELECT a.promo_id, lower(u.other ->> 'country'), sum(a.activation_count)
+        FROM user_activated_promos a
+        JOIN users u ON u.id = a.user_id
+        WHERE u.other ->> 'country' IS NOT NULL
+        GROUP BY a.promo_id, lower(u.other ->> 'country')
+        HAVING sum(a.activation_count) > 0
+    """)
+
+def downgrade():
+    op.drop_table('promo_stats_by_country')
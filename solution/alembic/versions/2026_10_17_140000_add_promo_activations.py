@@ -0,0 +1,37 @@
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision = '2026_10_17_140000'
+down_revision = '2026_10_17_130000'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table(
+        'promo_activations',
+        sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column('user_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('promo_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('activated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['promo_id'], ['promo_codes.promo_id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("""
+        INSERT INTO promo_activations (user_id, promo_id, activated_at)
+        SELECT a.user_id, a.promo_id, coalesce(a.activation_date, now())
+        FROM user_activated_promos a
+        CROSS JOIN LATERAL generate_series(1, a.activation_count)
+        ORDER BY a.activation_date
+    """)
+    op.create_index(
+        'ix_promo_activations_user_activated_at', 'promo_activations',
+        ['user_id', sa.text('activated_at DESC'), sa.text('id DESC')]
+    )
+    op.create_index('ix_promo_activations_promo_id', 'promo_activations', ['promo_id'])
+
+def downgrade():
+    op.drop_index('ix_promo_activations_promo_id', table_name='promo_activations')
+    op.drop_index('ix_promo_activations_user_activated_at', table_name='promo_activations')
+    op.drop_table('promo_activations')
@@ -0,0 +1,35 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '2026_10_17_150000'
+down_revision = '2026_10_17_140000'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index(
+        'ix_user_liked_promos_promo_id_user_id', 'user_liked_promos', ['promo_id', 'user_id']
+    )
+    op.create_index(
+        'ix_user_activated_promos_promo_id_user_id', 'user_activated_promos', ['promo_id', 'user_id']
+    )
+    op.create_index(
+        'ix_promo_codes_company_active_from', 'promo_codes',
+        ['company_id', sa.text('active_from DESC')]
+    )
+    op.create_index(
+        'ix_promo_codes_company_active_until', 'promo_codes',
+        ['company_id', sa.text('active_until DESC')]
+    )
+    op.create_index(
+        'ix_promo_codes_active_created_at_id', 'promo_codes',
+        [sa.text('created_at DESC'), sa.text('id DESC')],
+        postgresql_where=sa.text('active')
+    )
+
+def downgrade():
+    op.drop_index('ix_promo_codes_active_created_at_id', table_name='promo_codes')
+    op.drop_index('ix_promo_codes_company_active_until', table_name='promo_codes')
+    op.drop_index('ix_promo_codes_company_active_from', table_name='promo_codes')
+    op.drop_index('ix_user_activated_promos_promo_id_user_id', table_name='user_activated_promos')
+    op.drop_index('ix_user_liked_promos_promo_id_user_id', table_name='user_liked_promos')
@@ -0,0 +1,45 @@
+from alembic import op
+import sqlalchemy as sa
+
+revision = '2026_10_17_160000'
+down_revision = '2026_10_17_150000'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index(
+        'ix_promo_unique_codes_issued', 'promo_unique_codes', ['promo_id'],
+        postgresql_where=sa.text('activated_by IS NOT NULL')
+    )
+    op.add_column(
+        'promo_stats_by_country',
+        sa.Column('shard', sa.Integer(), nullable=False, server_default='0')
+    )
+    op.drop_constraint('promo_stats_by_country_pkey', 'promo_stats_by_country', type_='primary')
+    op.create_primary_key('promo_stats_by_country_pkey', 'promo_stats_by_country', ['promo_id', 'country', 'shard'])
+
+def downgrade():
+    op.execute("""
+        CREATE TEMP TABLE merged_stats AS
+        SELECT promo_id, country, sum(activations_count) AS activations_count
+        FROM promo_stats_by_country
+        GROUP BY promo_id, country
+    """)
+    op.execute("DELETE FROM promo_stats_by_country")
+    op.drop_constraint('promo_stats_by_country_pkey', 'promo_stats_by_country', type_='primary')
+    op.drop_column('promo_stats_by_country', 'shard')
+    op.create_primary_key('promo_stats_by_country_pkey', 'promo_stats_by_country', ['promo_id', 'country'])
+    op.execute("""
+        INSERT INTO promo_stats_by_country (promo_id, country, activations_count)
+        SELECT promo_id, country, activations_count FROM merged_stats
+    """)
+    op.execute("DROP TABLE merged_stats")
+    op.execute("""
+        UPDATE promo_codes p
+        SET used_count = (
+            SELECT count(*) FROM promo_unique_codes c
+            WHERE c.promo_id = p.promo_id AND c.activated_by IS NOT NULL
+        )
+        WHERE p.mode = 'UNIQUE'
+    """)
+    op.drop_index('ix_promo_unique_codes_issued', table_name='promo_unique_codes')
@@ -0,0 +1,176 @@
+"""
+Фильтр ленты по категориям: прежний поиск подстроки в JSON таргета против массива target_categories с GIN-индексом.
+
+Создаёт базу <POSTGRES_DATABASE>_categories и засевает --promos промокодов по --per-promo категорий
+из словаря c1..c<--vocabulary>. Имена вида c1 и c12 нарочно пересекаются как подстроки: прежний
+фильтр lower(target->'categories') LIKE '%c1%' находит для c1 ещё и c10..c19.
+
+Замеряет через EXPLAIN (ANALYZE, BUFFERS) запросы, которые выполняет get_feed_promos: одна категория,
+несколько через OR (&&) и через AND (@>), а рядом те же страница и COUNT с прежним LIKE.
+Печатает медиану времени, число найденных строк и ложных совпадений, индексы; полный результат - в JSON.
+
+    python -m benchmarks.category_filter --promos 100000 --per-promo 20 --output categories.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from src.backend.config import settings
+from src.backend.db import Base
+from src.models import Company, PromoCode, User  # noqa: F401 регистрирует все таблицы в metadata
+from src.repositories.user_promo import PromoRepository
+from benchmarks.explain_hot_paths import database_url, uuid_sql, walk
+
+LEGACY_FILTER = "lower((target->'categories')::text) LIKE :pattern"
+LEGACY_PAGE = f"""
+SELECT id, promo_id, created_at FROM promo_codes
+WHERE {LEGACY_FILTER}
+ORDER BY created_at DESC, id DESC LIMIT 10
+"""
+LEGACY_COUNT = f"SELECT count(id) FROM promo_codes WHERE {LEGACY_FILTER}"
+
+
+def seed_statements(args) -> list:
+    categories = (
+        f"ARRAY(SELECT 'c' || (1 + (n * 31 + j) % {args.vocabulary}) "
+        f"FROM generate_series(1, {args.per_promo}) j)"
+    )
+    return [
+        f"""
+        INSERT INTO companies (id, name, email, password)
+        VALUES ({uuid_sql('c', '1')}, 'Company', 'company@bench.com', 'hashed')
+        """,
+        f"""
+        INSERT INTO promo_codes (
+            id, promo_id, company_id, company_name, created_at, mode, promo_common, description,
+            target, target_categories, "limit", max_count, like_count, used_count, unique_count, comment_count, active
+        )
+        SELECT {uuid_sql('pk', 'n')}, {uuid_sql('p', 'n')}, {uuid_sql('c', '1')}, 'Company',
+               now() - n * interval '1 second', 'COMMON', 'bench-promo', 'Benchmark promo ' || n,
+               json_build_object('categories', array_to_json(categories)), categories,
+               1000000, 1000000, 0, 0, 0, 0, true
+        FROM (SELECT n, {categories} AS categories FROM generate_series(1, {args.promos}) n) seeded
+        """,
+    ]
+
+
+async def prepare(args) -> None:
+    if args.skip_seed:
+        return
+    admin = create_async_engine(database_url("postgres"), isolation_level="AUTOCOMMIT")
+    async with admin.connect() as conn:
+        await conn.execute(text(f'DROP DATABASE IF EXISTS "{args.database}"'))
+        await conn.execute(text(f'CREATE DATABASE "{args.database}"'))
+    await admin.dispose()
+
+    engine = create_async_engine(database_url(args.database))
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    for statement in seed_statements(args):
+        async with engine.begin() as conn:
+            print(f"seeding: {' '.join(statement.split())[:70]}...", flush=True)
+            await conn.execute(text(statement))
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE"))
+    await engine.dispose()
+
+
+def cases() -> list:
+    """
+    (название, категории, match_all, подстрока для прежнего фильтра или None)
+    """
+    return [
+        ("one category", ["c1"], False, "%c1%"),
+        ("any of 3 categories", ["c1", "c7", "c42"], False, None),
+        ("all of 2 categories", ["c1", "c2"], True, None),
+        ("all of 3 categories", ["c1", "c2", "c3"], True, None),
+    ]
+
+
+async def explain(conn, statement: str, parameters, repeat: int) -> dict:
+    timings, plan = [], None
+    for _ in range(repeat):
+        result = await conn.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters)
+        plan = result.scalar()
+        plan = plan[0] if isinstance(plan, list) else json.loads(plan)[0]
+        timings.append(plan["Execution Time"])
+    nodes = list(walk(plan["Plan"]))
+    return {
+        "sql": statement,
+        "execution_ms": statistics.median(timings),
+        "scans": sorted({node["Node Type"] for node in nodes if "Scan" in node["Node Type"]}),
+        "indexes": sorted({node["Index Name"] for node in nodes if "Index Name" in node}),
+        "plan": plan["Plan"],
+    }
+
+
+async def measure(args) -> list:
+    engine = create_async_engine(database_url(args.database))
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith("EXPLAIN"):
+            captured.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    results = []
+    for name, categories, match_all, pattern in cases():
+        captured.clear()
+        async with session_maker() as session:
+            _, total = await PromoRepository(session).get_feed_promos(
+                None, "ru", 25, category=categories, limit=10, match_all=match_all
+            )
+        statements = list(captured)
+        async with engine.connect() as conn:
+            for statement, parameters in statements:
+                kind = "count" if "count(promo_codes.id)" in statement else "page"
+                results.append({"case": name, "filter": "array", "query": kind, "rows": total,
+                                **await explain(conn, statement, parameters, args.repeat)})
+            if pattern is not None:
+                legacy_total = (await conn.execute(text(LEGACY_COUNT), {"pattern": pattern})).scalar()
+                for kind, statement in (("count", LEGACY_COUNT), ("page", LEGACY_PAGE)):
+                    compiled = text(statement).bindparams(pattern=pattern).compile(engine.sync_engine)
+                    parameters = tuple(compiled.params[name] for name in compiled.positiontup)
+                    results.append({
+                        "case": name, "filter": "legacy like", "query": kind, "rows": legacy_total,
+                        "false_positives": legacy_total - total,
+                        **await explain(conn, str(compiled), parameters, args.repeat),
+                    })
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default=f"{settings.POSTGRES_DATABASE}_categories", help="база для бенчмарка, пересоздаётся")
+    parser.add_argument("--promos", type=int, default=100_000)
+    parser.add_argument("--per-promo", type=int, default=20, help="категорий у каждого промокода")
+    parser.add_argument("--vocabulary", type=int, default=200, help="различных категорий")
+    parser.add_argument("--repeat", type=int, default=5, help="прогонов EXPLAIN ANALYZE на запрос")
+    parser.add_argument("--skip-seed", action="store_true", help="использовать уже засеянную базу")
+    parser.add_argument("--output", default="category_filter.json", help="куда записать результаты в JSON")
+    args = parser.parse_args()
+
+    asyncio.run(prepare(args))
+    results = asyncio.run(measure(args))
+
+    print(f"{'case':<22} {'filter':<12} {'query':<6} {'rows':>7} {'false+':>7} {'exec ms':>9}  scans / indexes")
+    for row in results:
+        print(
+            f"{row['case']:<22} {row['filter']:<12} {row['query']:<6} {row['rows']:>7} "
+            f"{row.get('false_positives', ''):>7} {row['execution_ms']:>9.2f}  "
+            f"{', '.join(row['scans'])} / {', '.join(row['indexes']) or '-'}"
+        )
+    with open(args.output, "w") as output:
+        json.dump({"args": vars(args), "results": results}, output, indent=2, default=str)
+    print(f"written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
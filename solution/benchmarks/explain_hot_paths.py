@@ -0,0 +1,260 @@
+"""
+EXPLAIN ANALYZE для запросов горячих эндпоинтов на большой синтетической базе.
+
+Создаёт отдельную базу (по умолчанию <POSTGRES_DATABASE>_bench), схему из моделей и засевает её:
+--promos промокодов, --activations активаций, лайки и комментарии. Затем вызывает методы
+репозиториев так же, как их вызывают эндпоинты, перехватывает каждый выполненный SQL и прогоняет
+его через EXPLAIN (ANALYZE, BUFFERS) --repeat раз. Печатает медианное время выполнения, узлы
+сканирования и использованные индексы, полный результат пишет в JSON (--output).
+
+С --drop-indexes перед замером удаляет индексы миграции 2026_10_17_150000, чтобы сравнить планы
+до и после. Повторный запуск с --skip-seed использует уже засеянную базу.
+
+    python -m benchmarks.explain_hot_paths --promos 1000000 --activations 10000000 --output explain.json
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import statistics
+from uuid import UUID
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from src.backend.config import settings
+from src.backend.db import Base
+from src.models import Company, PromoCode, User  # noqa: F401 регистрирует все таблицы в metadata
+from src.repositories.comment import CommentRepository
+from src.repositories.promo import PromoRepository as BusinessPromoRepository
+from src.repositories.user_promo import PromoRepository
+
+HOT_PATH_INDEXES = (
+    "ix_user_liked_promos_promo_id_user_id",
+    "ix_user_activated_promos_promo_id_user_id",
+    "ix_promo_codes_company_active_from",
+    "ix_promo_codes_company_active_until",
+    "ix_promo_codes_active_created_at_id",
+)
+COUNTRIES = ("ru", "us", "fr", "de", "gb", "it", "es", "cn", "jp", "br")
+CATEGORIES = ("food", "travel", "cats", "sport", "music", "books", "games", "kids", "auto", "beauty")
+
+
+def database_url(database: str) -> str:
+    return settings.database_url.rsplit("/", 1)[0] + f"/{database}"
+
+
+def uuid_sql(prefix: str, expression: str) -> str:
+    """
+    Детерминированный UUID для n-й сущности: md5(prefix || n)
+    """
+    return f"md5('{prefix}' || ({expression})::text)::uuid"
+
+
+def stable_uuid(prefix: str, n: int) -> UUID:
+    return UUID(hashlib.md5(f"{prefix}{n}".encode()).hexdigest())
+
+
+def seed_statements(args) -> list:
+    countries = "ARRAY[" + ",".join(f"'{country}'" for country in COUNTRIES) + "]"
+    categories = "ARRAY[" + ",".join(f"'{category}'" for category in CATEGORIES) + "]"
+    random_user = uuid_sql("u", f"1 + floor(random() * {args.users})::int")
+    random_promo = uuid_sql("p", f"1 + floor(random() * {args.promos})::int")
+    return [
+        f"SELECT setseed({args.seed})",
+        f"""
+        INSERT INTO companies (id, name, email, password)
+        SELECT {uuid_sql('c', 'n')}, 'Company ' || n, 'company' || n || '@bench.com', 'hashed'
+        FROM generate_series(1, {args.companies}) n
+        """,
+        f"""
+        INSERT INTO users (id, name, surname, email, password, other)
+        SELECT {uuid_sql('u', 'n')}, 'User', 'Bench', 'user' || n || '@bench.com', 'hashed',
+               json_build_object('age', 14 + n % 60, 'country', upper(({countries})[1 + n % 10]))
+        FROM generate_series(1, {args.users}) n
+        """,
+        f"""
+        INSERT INTO promo_codes (
+            id, promo_id, company_id, company_name, created_at, mode, promo_common, description,
+            active_from, active_until, target, target_country, target_age_from, target_age_until,
+            target_categories, "limit", max_count, like_count, used_count, unique_count, comment_count, active
+        )
+        SELECT {uuid_sql('pk', 'n')}, {uuid_sql('p', 'n')}, {uuid_sql('c', f'1 + n % {args.companies}')},
+               'Company ' || (1 + n % {args.companies}), now() - n * interval '1 second', 'COMMON', 'bench-promo',
+               'Benchmark promo ' || n,
+               CASE WHEN n % 3 = 0 THEN NULL ELSE date '2025-01-01' + n % 365 END,
+               CASE WHEN n % 4 = 0 THEN NULL ELSE date '2027-01-01' + n % 365 END,
+               json_build_object('country', CASE WHEN n % 2 = 0 THEN ({countries})[1 + n % 10] END),
+               CASE WHEN n % 2 = 0 THEN ({countries})[1 + n % 10] END,
+               CASE WHEN n % 5 = 0 THEN 18 END, CASE WHEN n % 7 = 0 THEN 40 END,
+               ARRAY[({categories})[1 + n % 10], ({categories})[1 + (n / 10) % 10]],
+               1000000, 1000000, 0, 0, 0, 0, n % 10 <> 0
+        FROM generate_series(1, {args.promos}) n
+        """,
+        f"""
+        INSERT INTO promo_activations (user_id, promo_id, activated_at)
+        SELECT {random_user}, {random_promo}, now() - random() * interval '365 days'
+        FROM generate_series(1, {args.activations})
+        """,
+        """
+        INSERT INTO user_activated_promos (user_id, promo_id, activation_date, activation_count)
+        SELECT user_id, promo_id, max(activated_at), count(*)
+        FROM promo_activations GROUP BY user_id, promo_id
+        """,
+        """
+        UPDATE promo_codes SET used_count = a.count
+        FROM (SELECT promo_id, count(*) AS count FROM promo_activations GROUP BY promo_id) a
+        WHERE promo_codes.promo_id = a.promo_id
+        """,
+        f"""
+        INSERT INTO user_liked_promos (user_id, promo_id)
+        SELECT {random_user}, {random_promo} FROM generate_series(1, {args.likes})
+        ON CONFLICT DO NOTHING
+        """,
+        f"""
+        INSERT INTO comments (id, text, date, author_id, promo_id)
+        SELECT {uuid_sql('m', 'n')}, 'Bench comment ' || n, now() - n * interval '1 second',
+               {random_user}, {uuid_sql('p', f'1 + n % {max(args.promos // 100, 1)}')}
+        FROM generate_series(1, {args.comments}) n
+        """,
+    ]
+
+
+async def prepare(args) -> None:
+    if args.skip_seed:
+        return
+    admin = create_async_engine(database_url("postgres"), isolation_level="AUTOCOMMIT")
+    async with admin.connect() as conn:
+        await conn.execute(text(f'DROP DATABASE IF EXISTS "{args.database}"'))
+        await conn.execute(text(f'CREATE DATABASE "{args.database}"'))
+    await admin.dispose()
+
+    engine = create_async_engine(database_url(args.database))
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    for statement in seed_statements(args):
+        async with engine.begin() as conn:
+            print(f"seeding: {' '.join(statement.split())[:70]}...", flush=True)
+            await conn.execute(text(statement))
+    async with sessionmaker(engine, class_=AsyncSession)() as session:
+        print("seeding: promo_stats_by_country", flush=True)
+        await BusinessPromoRepository(session).rebuild_promo_stats()
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE"))
+    await engine.dispose()
+
+
+def hot_paths() -> list:
+    """
+    (эндпоинт, вызов репозитория) с теми же аргументами, что передают сервисы
+    """
+    company_id = stable_uuid("c", 1)
+    user_id = stable_uuid("u", 1)
+    promo_id = stable_uuid("p", 1)
+    promo_ids = [stable_uuid("p", n) for n in range(1, 11)]
+    return [
+        ("GET /user/feed", lambda db: PromoRepository(db).get_feed_promos(None, "ru", 25, limit=10)),
+        ("GET /user/feed?active=true", lambda db: PromoRepository(db).get_feed_promos(None, "ru", 25, active=True, limit=10)),
+        ("GET /user/feed?category", lambda db: PromoRepository(db).get_feed_promos(None, "ru", 25, category="cats", limit=10)),
+        ("GET /user/feed flags", lambda db: PromoRepository(db).get_liked_promo_ids(user_id, promo_ids)),
+        ("GET /user/promo/{id}", lambda db: PromoRepository(db).get_by_id(promo_id)),
+        ("GET /user/promo/history", lambda db: PromoRepository(db).get_activation_history(user_id, limit=10)),
+        ("GET /user/promo/{id}/comments", lambda db: CommentRepository(db).get_comments(promo_id, limit=10)),
+        ("GET /business/promo", lambda db: BusinessPromoRepository(db).get_promos_by_company(company_id, limit=10)),
+        ("GET /business/promo?sort_by=active_from",
+         lambda db: BusinessPromoRepository(db).get_promos_by_company(company_id, limit=10, sort_by="active_from")),
+        ("GET /business/promo?sort_by=active_until",
+         lambda db: BusinessPromoRepository(db).get_promos_by_company(company_id, limit=10, sort_by="active_until")),
+        ("GET /business/promo/{id}/stat", lambda db: BusinessPromoRepository(db).get_promo_stat(promo_id)),
+        ("likes by promo", lambda db: db.execute(text(
+            "SELECT user_id FROM user_liked_promos WHERE promo_id = :promo_id"), {"promo_id": promo_id})),
+        ("activations by promo", lambda db: db.execute(text(
+            "SELECT user_id FROM user_activated_promos WHERE promo_id = :promo_id"), {"promo_id": promo_id})),
+    ]
+
+
+def walk(plan: dict):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+async def explain(args) -> list:
+    engine = create_async_engine(database_url(args.database))
+    if args.drop_indexes:
+        async with engine.begin() as conn:
+            for index in HOT_PATH_INDEXES:
+                await conn.execute(text(f"DROP INDEX IF EXISTS {index}"))
+
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith("EXPLAIN"):
+            captured.append((statement, parameters))
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    results = []
+    for endpoint, call in hot_paths():
+        captured.clear()
+        async with session_maker() as session:
+            await call(session)
+        statements = list(captured)
+        for number, (statement, parameters) in enumerate(statements, start=1):
+            timings, plan = [], None
+            async with engine.connect() as conn:
+                for _ in range(args.repeat):
+                    result = await conn.exec_driver_sql(
+                        "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters
+                    )
+                    plan = result.scalar()
+                    plan = plan[0] if isinstance(plan, list) else json.loads(plan)[0]
+                    timings.append(plan["Execution Time"])
+            nodes = list(walk(plan["Plan"]))
+            results.append({
+                "endpoint": endpoint,
+                "statement": number,
+                "sql": statement,
+                "execution_ms": statistics.median(timings),
+                "planning_ms": plan["Planning Time"],
+                "scans": sorted({node["Node Type"] for node in nodes if "Scan" in node["Node Type"]}),
+                "indexes": sorted({node["Index Name"] for node in nodes if "Index Name" in node}),
+                "plan": plan["Plan"],
+            })
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+    await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default=f"{settings.POSTGRES_DATABASE}_bench", help="база для бенчмарка, пересоздаётся")
+    parser.add_argument("--promos", type=int, default=1_000_000)
+    parser.add_argument("--activations", type=int, default=10_000_000)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--companies", type=int, default=1_000)
+    parser.add_argument("--likes", type=int, default=1_000_000)
+    parser.add_argument("--comments", type=int, default=1_000_000)
+    parser.add_argument("--seed", type=float, default=0.42, help="setseed() для воспроизводимых данных")
+    parser.add_argument("--repeat", type=int, default=5, help="прогонов EXPLAIN ANALYZE на запрос")
+    parser.add_argument("--skip-seed", action="store_true", help="использовать уже засеянную базу")
+    parser.add_argument("--drop-indexes", action="store_true", help="замерить без индексов миграции 2026_10_17_150000")
+    parser.add_argument("--output", default="explain_hot_paths.json", help="куда записать результаты в JSON")
+    args = parser.parse_args()
+
+    asyncio.run(prepare(args))
+    results = asyncio.run(explain(args))
+
+    print(f"{'endpoint':<40} {'#':>2} {'exec ms':>9} {'plan ms':>8}  scans / indexes")
+    for row in results:
+        print(
+            f"{row['endpoint']:<40} {row['statement']:>2} {row['execution_ms']:>9.2f} {row['planning_ms']:>8.2f}  "
+            f"{', '.join(row['scans'])} / {', '.join(row['indexes']) or '-'}"
+        )
+    with open(args.output, "w") as output:
+        json.dump({"args": vars(args), "results": results}, output, indent=2, default=str)
+    print(f"written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,264 @@
+"""
+Нагрузочный тест всего API со смешанным трафиком пользователей.
+
+Пересоздаёт базу <POSTGRES_DATABASE>_load, накатывает миграции и засевает её тем же генератором,
+что и explain_hot_paths (компании, пользователи, промокоды, активации, лайки, комментарии).
+Затем поднимает заглушку антифрода и приложение src.main:app в uvicorn с --workers процессами,
+логинит --sessions пользователей и --duration секунд гоняет --concurrency клиентов по смеси
+запросов: лента, промокод по ID, лайк, комментарий, активация. Postgres и Redis берутся из .env;
+с --compose они сначала поднимаются через docker compose из корня проекта.
+
+Результат - JSON с p50/p95/p99, RPS и кодами ответов по каждому эндпоинту и коммитом,
+на котором он получен. С --baseline печатает сравнение с прошлым результатом.
+
+    python -m benchmarks.load_test --duration 60 --concurrency 64 --output load.json --baseline load_main.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+import aiohttp
+from aiohttp import web
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from src.backend.config import settings
+from src.backend.hashing import pwd_context
+from benchmarks.explain_hot_paths import database_url, seed_statements, stable_uuid
+
+PASSWORD = "LoadTest123!"
+MIX = {
+    "GET /user/feed": 40,
+    "GET /user/promo/{id}": 30,
+    "POST /user/promo/{id}/like": 15,
+    "POST /user/promo/{id}/comments": 5,
+    "POST /user/promo/{id}/activate": 10,
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def seed(args, env: dict) -> None:
+    admin = create_async_engine(database_url("postgres"), isolation_level="AUTOCOMMIT")
+    async with admin.connect() as conn:
+        await conn.execute(text(f'DROP DATABASE IF EXISTS "{args.database}"'))
+        await conn.execute(text(f'CREATE DATABASE "{args.database}"'))
+    await admin.dispose()
+    subprocess.run(["alembic", "upgrade", "head"], env=env, check=True, capture_output=True)
+
+    engine = create_async_engine(database_url(args.database))
+    for statement in seed_statements(args):
+        async with engine.begin() as conn:
+            await conn.execute(text(statement))
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("UPDATE users SET password = :password WHERE email = ANY(:emails)"),
+            {"password": pwd_context.hash(PASSWORD), "emails": [f"user{n}@bench.com" for n in range(1, args.sessions + 1)]},
+        )
+    async with engine.connect() as conn:
+        await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("VACUUM ANALYZE"))
+    await engine.dispose()
+
+
+async def start_antifraud_stub(port: int) -> web.AppRunner:
+    async def validate(request):
+        until = datetime.now(timezone.utc) + timedelta(seconds=30)
+        return web.json_response({"ok": True, "cache_until": until.isoformat()})
+
+    app = web.Application()
+    app.router.add_post("/api/validate", validate)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+async def wait_for_app(base_url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.monotonic() < deadline:
+            try:
+                async with session.get(f"{base_url}/api/ping") as response:
+                    if response.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError("application did not start")
+
+
+async def sign_in(session: aiohttp.ClientSession, base_url: str, count: int) -> list:
+    limit = asyncio.Semaphore(8)
+
+    async def one(n: int) -> str:
+        async with limit:
+            async with session.post(
+                f"{base_url}/api/user/auth/sign-in", json={"email": f"user{n}@bench.com", "password": PASSWORD}
+            ) as response:
+                response.raise_for_status()
+                return (await response.json())["token"]
+
+    return await asyncio.gather(*(one(n) for n in range(1, count + 1)))
+
+
+def pick_promo(rng: random.Random, args) -> str:
+    # Большая часть трафика приходится на небольшой набор популярных промокодов
+    upper = args.hot_promos if rng.random() < 0.8 else args.promos
+    return str(stable_uuid("p", rng.randint(1, upper)))
+
+
+async def drive(args, base_url: str, tokens: list) -> dict:
+    samples = defaultdict(list)
+    statuses = defaultdict(Counter)
+    names, weights = list(MIX), list(MIX.values())
+    rng = random.Random(args.seed)
+    connector = aiohttp.TCPConnector(limit=args.concurrency)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+        async def request(name: str, token: str, record: bool):
+            promo_id = pick_promo(rng, args)
+            method, path = name.split(" ", 1)
+            url = base_url + "/api" + path.replace("{id}", promo_id)
+            kwargs = {"headers": {"Authorization": f"Bearer {token}"}}
+            if name == "GET /user/feed":
+                kwargs["params"] = {"limit": 10, "offset": rng.randint(0, 50)}
+            elif name.endswith("/comments"):
+                kwargs["json"] = {"text": f"Load test comment {rng.randint(0, 10 ** 6)}"}
+            start = time.perf_counter()
+            try:
+                async with session.request(method, url, **kwargs) as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError:
+                status = "error"
+            if record:
+                samples[name].append((time.perf_counter() - start) * 1000)
+                statuses[name][str(status)] += 1
+
+        async def client(deadline: float, record: bool):
+            while time.monotonic() < deadline:
+                await request(rng.choices(names, weights)[0], rng.choice(tokens), record)
+
+        warmup_deadline = time.monotonic() + args.warmup
+        await asyncio.gather(*(client(warmup_deadline, False) for _ in range(args.concurrency)))
+        started = time.monotonic()
+        await asyncio.gather(*(client(started + args.duration, True) for _ in range(args.concurrency)))
+        elapsed = time.monotonic() - started
+
+    return {
+        name: {
+            "requests": len(latencies),
+            "rps": len(latencies) / elapsed,
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "statuses": dict(statuses[name]),
+        }
+        for name, latencies in sorted(samples.items())
+    }
+
+
+def print_report(endpoints: dict, baseline: dict = None) -> None:
+    print(f"{'endpoint':<34} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}  statuses")
+    for name, row in endpoints.items():
+        line = (
+            f"{name:<34} {row['rps']:>8.1f} {row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}  "
+            f"{', '.join(f'{code}:{count}' for code, count in sorted(row['statuses'].items()))}"
+        )
+        previous = (baseline or {}).get(name)
+        if previous:
+            line += f"  (rps {row['rps'] / previous['rps'] - 1:+.0%}, p95 {row['p95_ms'] / previous['p95_ms'] - 1:+.0%})"
+        print(line)
+
+
+async def run(args) -> dict:
+    if args.compose:
+        subprocess.run(["docker", "compose", "up", "-d", "db", "redis"], check=True)
+    app_port, antifraud_port = free_port(), free_port()
+    env = {
+        **os.environ,
+        "POSTGRES_DATABASE": args.database,
+        "ANTIFRAUD_ADDRESS": f"127.0.0.1:{antifraud_port}",
+        "SERVER_ADDRESS": f"127.0.0.1:{app_port}",
+        "SERVER_PORT": str(app_port),
+    }
+    print(f"seeding {args.database}", flush=True)
+    await seed(args, env)
+
+    antifraud = await start_antifraud_stub(antifraud_port)
+    app = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "src.main:app", "--host", "127.0.0.1", "--port", str(app_port),
+         "--workers", str(args.workers), "--log-level", "warning", "--no-access-log"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{app_port}"
+    try:
+        await wait_for_app(base_url)
+        async with aiohttp.ClientSession() as session:
+            tokens = await sign_in(session, base_url, args.sessions)
+        print(f"driving traffic: {args.concurrency} clients for {args.duration}s", flush=True)
+        endpoints = await drive(args, base_url, tokens)
+    finally:
+        app.terminate()
+        app.wait(timeout=30)
+        await antifraud.cleanup()
+    return endpoints
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", default=f"{settings.POSTGRES_DATABASE}_load", help="база для теста, пересоздаётся")
+    parser.add_argument("--companies", type=int, default=200)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--promos", type=int, default=100_000)
+    parser.add_argument("--hot-promos", type=int, default=1_000, help="популярные промокоды, на них 80%% запросов")
+    parser.add_argument("--activations", type=int, default=500_000)
+    parser.add_argument("--likes", type=int, default=200_000)
+    parser.add_argument("--comments", type=int, default=100_000)
+    parser.add_argument("--sessions", type=int, default=200, help="сколько пользователей залогинить")
+    parser.add_argument("--workers", type=int, default=1, help="процессов uvicorn")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--warmup", type=float, default=5)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--seed", type=float, default=0.42, help="setseed() и random.seed для повторяемости")
+    parser.add_argument("--compose", action="store_true", help="поднять db и redis через docker compose")
+    parser.add_argument("--output", default="load_test.json")
+    parser.add_argument("--baseline", default=None, help="прошлый результат для сравнения")
+    args = parser.parse_args()
+
+    endpoints = asyncio.run(run(args))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as previous:
+            baseline = json.load(previous)["endpoints"]
+    print_report(endpoints, baseline)
+    with open(args.output, "w") as output:
+        json.dump({"commit": git_commit(), "args": vars(args), "endpoints": endpoints}, output, indent=2)
+    print(f"written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Нагрузочный тест пула соединений: N процессов (как воркеры gunicorn) против одного Postgres.
+
+Для каждой комбинации pool_size/max_overflow запускает --workers процессов, в каждом
+--concurrency корутин в течение --duration секунд выполняют запрос, и печатает RPS,
+задержки, время ожидания соединения из пула и пиковое число соединений на сервере.
+В конце выводит лучшую конфигурацию, которая укладывается в max_connections.
+
+    python -m benchmarks.pool_load --workers 4 --concurrency 50 --pool-sizes 5,10,20 --overflows 0,10
+"""
+import argparse
+import asyncio
+import multiprocessing
+import statistics
+import time
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from src.backend.config import settings
+from src.backend.db import InstrumentedPool, pool_stats
+
+RESERVED_CONNECTIONS = 10
+
+
+async def run_worker(pool_size: int, max_overflow: int, concurrency: int, duration: float, query: str) -> dict:
+    engine = create_async_engine(
+        settings.database_url,
+        poolclass=InstrumentedPool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args={"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+    )
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                async with engine.connect() as conn:
+                    await conn.execute(text(query))
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    await engine.dispose()
+    return {
+        "latencies": latencies,
+        "errors": errors,
+        "checkouts": pool_stats.checkouts,
+        "wait_total": pool_stats.wait_seconds_total,
+        "wait_max": pool_stats.wait_seconds_max,
+    }
+
+
+def worker_process(args, queue):
+    queue.put(asyncio.run(run_worker(*args)))
+
+
+async def server_connections() -> tuple:
+    engine = create_async_engine(settings.database_url)
+    async with engine.connect() as conn:
+        max_connections = int(await conn.scalar(text("SHOW max_connections")))
+        active = await conn.scalar(text("SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()"))
+    await engine.dispose()
+    return max_connections, active
+
+
+def sample_connections(stop, peak):
+    while not stop.is_set():
+        _, active = asyncio.run(server_connections())
+        peak.value = max(peak.value, active)
+        time.sleep(0.5)
+
+
+def run_config(workers: int, pool_size: int, max_overflow: int, concurrency: int, duration: float, query: str) -> dict:
+    queue = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    peak = multiprocessing.Value("i", 0)
+    sampler = multiprocessing.Process(target=sample_connections, args=(stop, peak))
+    sampler.start()
+    processes = [
+        multiprocessing.Process(target=worker_process, args=((pool_size, max_overflow, concurrency, duration, query), queue))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    results = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+    stop.set()
+    sampler.join()
+
+    latencies = sorted(latency for result in results for latency in result["latencies"])
+    checkouts = sum(result["checkouts"] for result in results) or 1
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    return {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "rps": len(latencies) / duration,
+        "p50_ms": quantiles[49] * 1000,
+        "p95_ms": quantiles[94] * 1000,
+        "p99_ms": quantiles[98] * 1000,
+        "wait_avg_ms": sum(result["wait_total"] for result in results) / checkouts * 1000,
+        "wait_max_ms": max(result["wait_max"] for result in results) * 1000,
+        "errors": sum(result["errors"] for result in results),
+        "peak_connections": peak.value,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4, help="число воркеров gunicorn")
+    parser.add_argument("--concurrency", type=int, default=50, help="одновременных запросов на воркер")
+    parser.add_argument("--duration", type=float, default=10.0, help="секунд на одну конфигурацию")
+    parser.add_argument("--pool-sizes", default="5,10,20")
+    parser.add_argument("--overflows", default="0,10")
+    parser.add_argument("--query", default="SELECT count(*) FROM generate_series(1, 5000)")
+    args = parser.parse_args()
+
+    max_connections, _ = asyncio.run(server_connections())
+    budget = max_connections - RESERVED_CONNECTIONS
+    print(f"max_connections={max_connections}, workers={args.workers}, concurrency per worker={args.concurrency}")
+    print(f"{'pool':>5} {'overflow':>8} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'wait avg':>9} {'wait max':>9} {'errors':>6} {'peak conn':>9}")
+
+    results = []
+    for pool_size in map(int, args.pool_sizes.split(",")):
+        for max_overflow in map(int, args.overflows.split(",")):
+            if args.workers * (pool_size + max_overflow) > budget:
+                print(f"{pool_size:>5} {max_overflow:>8}  skipped: needs more than {budget} connections")
+                continue
+            result = run_config(args.workers, pool_size, max_overflow, args.concurrency, args.duration, args.query)
+            results.append(result)
+            print(f"{pool_size:>5} {max_overflow:>8} {result['rps']:>9.0f} {result['p50_ms']:>8.1f} "
+                  f"{result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} {result['wait_avg_ms']:>9.2f} "
+                  f"{result['wait_max_ms']:>9.1f} {result['errors']:>6} {result['peak_connections']:>9}")
+
+    healthy = [result for result in results if not result["errors"]]
+    if healthy:
+        best = max(healthy, key=lambda result: (result["rps"], -result["p99_ms"]))
+        print(f"\nRecommended for {args.workers} workers: "
+              f"DB_POOL_SIZE={best['pool_size']} DB_MAX_OVERFLOW={best['max_overflow']} "
+              f"(at most {args.workers * (best['pool_size'] + best['max_overflow'])} of {max_connections} connections)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Микробенчмарк сериализации списков промокодов: прежний путь через pydantic и быстрый путь.
+
+Строит --rows промокодов в памяти (база не нужна) и --repeat раз превращает их в тело
+ответа ленты (PromoForUser) и списка компании (PromoReadOnly), печатая строки в секунду.
+
+    python -m benchmarks.serialization --rows 1000 --repeat 50
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+from uuid import uuid4
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from sqlalchemy.orm import class_mapper
+from src.models.promocode import PromoCode
+from src.schemas.promo import PromoReadOnly
+from src.schemas.user_promo import PromoForUser
+from src.utils.promo_helpers import calculate_active, target_columns, promo_for_user, promo_read_only
+from src.utils.serializer import uuid_to_str
+
+
+def make_promos(count: int) -> list:
+    company_id = uuid4()
+    now = datetime.utcnow()
+    promos = []
+    for i in range(count):
+        target = {"age_from": 18, "age_until": 60, "country": "ru", "categories": ["food", "travel"]}
+        promos.append(PromoCode(
+            company_id=company_id,
+            company_name="Benchmark Company",
+            mode="COMMON",
+            promo_common="common-promo",
+            max_count=100,
+            target=target,
+            **target_columns(target),
+            description=f"Benchmark promo number {i}",
+            image_url="https://cdn.example.com/promo.png",
+            active_from=date(2025, 1, 1),
+            active_until=date(2030, 1, 1),
+            like_count=i,
+            used_count=i % 100,
+            comment_count=i % 7,
+            created_at=now - timedelta(seconds=i),
+            promo_id=uuid4(),
+        ))
+    return promos
+
+
+def legacy_to_dict(obj):
+    return {column.name: getattr(obj, column.name) for column in class_mapper(obj.__class__).columns}
+
+
+def legacy_feed(promos: list) -> bytes:
+    response = []
+    for promo in promos:
+        promo_dict = legacy_to_dict(promo)
+        promo_dict.update({"active": calculate_active(promo), "is_activated_by_user": False, "is_liked_by_user": False})
+        promo_data = PromoForUser(**promo_dict).model_dump(exclude_unset=True)
+        response.append({k: uuid_to_str(v) for k, v in promo_data.items() if v is not None})
+    return JSONResponse(content=response).body
+
+
+def legacy_business(promos: list) -> bytes:
+    result = []
+    for promo in promos:
+        promo_dict = legacy_to_dict(promo)
+        promo_dict["target"] = {k: v for k, v in promo_dict["target"].items() if v is not None}
+        promo_dict.update({
+            "active_from": promo.active_from.strftime("%Y-%m-%d") if promo.active_from else None,
+            "active_until": promo.active_until.strftime("%Y-%m-%d") if promo.active_until else None,
+            "active": calculate_active(promo),
+        })
+        result.append(PromoReadOnly(**promo_dict).model_dump(exclude_unset=True))
+    result = [{k: uuid_to_str(v) for k, v in promo.items() if v is not None} for promo in result]
+    return JSONResponse(content=jsonable_encoder(result)).body
+
+
+def fast_feed(promos: list) -> bytes:
+    return ORJSONResponse(content=[promo_for_user(promo, False, False) for promo in promos]).body
+
+
+def fast_business(promos: list) -> bytes:
+    return ORJSONResponse(content=[promo_read_only(promo, drop_none=True) for promo in promos]).body
+
+
+def rows_per_second(render, promos: list, repeat: int) -> float:
+    render(promos)
+    start = time.perf_counter()
+    for _ in range(repeat):
+        render(promos)
+    return len(promos) * repeat / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000, help="промокодов в одном ответе")
+    parser.add_argument("--repeat", type=int, default=50, help="сколько раз сериализовать ответ")
+    args = parser.parse_args()
+
+    promos = make_promos(args.rows)
+    print(f"{'endpoint':<10} {'before rows/s':>14} {'after rows/s':>14} {'speedup':>8}")
+    for name, before, after in (("feed", legacy_feed, fast_feed), ("business", legacy_business, fast_business)):
+        before_rps = rows_per_second(before, promos, args.repeat)
+        after_rps = rows_per_second(after, promos, args.repeat)
+        print(f"{name:<10} {before_rps:>14.0f} {after_rps:>14.0f} {after_rps / before_rps:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
-alembic -c /app/alembic.ini upgrade 2025_01_20_123456
+alembic -c /app/alembic.ini upgrade head
+export PROMETHEUS_MULTIPROC_DIR="${PROMETHEUS_MULTIPROC_DIR:-/tmp/prometheus}"
+rm -rf "$PROMETHEUS_MULTIPROC_DIR" && mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
 gunicorn src.main:app \
+  --config gunicorn.conf.py \
   --worker-class uvicorn.workers.UvicornWorker \
   --bind "$SERVER_ADDRESS:$SERVER_PORT" \
-  --access-logfile -
\ No newline at end of file
+  --access-logfile -
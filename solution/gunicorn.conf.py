@@ -0,0 +1,6 @@
+from prometheus_client import multiprocess
+
+
+def child_exit(server, worker):
+    # Метрики живых gauge умершего воркера больше не учитываются в сумме
+    multiprocess.mark_process_dead(worker.pid)
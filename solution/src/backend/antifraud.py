@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+from uuid import UUID
+import aiohttp
+from redis.asyncio import Redis
+from src.backend.config import settings
+from src.backend.metrics import record_antifraud
+
+logger = logging.getLogger(__name__)
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def antifraud_url(address: str, path: str) -> str:
+    if not address.startswith(("http://", "https://")):
+        address = f"http://{address}"
+    return f"{address.rstrip('/')}{path}"
+
+
+def verdict_ttl_ms(cache_until: Optional[str]) -> int:
+    """
+    Сколько миллисекунд ещё можно доверять вердикту антифрода.
+    Время без часового пояса считается UTC.
+    """
+    if not cache_until:
+        return 0
+    try:
+        until = datetime.fromisoformat(cache_until.replace("Z", "+00:00"))
+    except ValueError:
+        return 0
+    if until.tzinfo is None:
+        until = until.replace(tzinfo=timezone.utc)
+    return int((until - datetime.now(timezone.utc)).total_seconds() * 1000)
+
+
+class AntifraudClient:
+    """
+    Долгоживущий клиент антифрода: одна aiohttp-сессия с keep-alive пулом соединений на воркер,
+    таймауты на каждый вызов, повтор с джиттером и кэш вердиктов в Redis до cache_until.
+    Одновременные проверки одной пары (пользователь, промокод) схлопываются в один запрос к сервису.
+    """
+    def __init__(
+        self,
+        address: str = settings.ANTIFRAUD_ADDRESS,
+        pool_size: int = settings.ANTIFRAUD_POOL_SIZE,
+        keepalive: float = settings.ANTIFRAUD_KEEPALIVE,
+        timeout: float = settings.ANTIFRAUD_TIMEOUT,
+        connect_timeout: float = settings.ANTIFRAUD_CONNECT_TIMEOUT,
+        retries: int = settings.ANTIFRAUD_RETRIES,
+        retry_backoff: float = settings.ANTIFRAUD_RETRY_BACKOFF,
+        lock_ttl: int = settings.ANTIFRAUD_LOCK_TTL,
+        lock_poll: float = settings.ANTIFRAUD_LOCK_POLL,
+    ):
+        self.url = antifraud_url(address, "/api/validate")
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.timeout = aiohttp.ClientTimeout(total=timeout, connect=connect_timeout)
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.lock_ttl = lock_ttl
+        self.lock_poll = lock_poll
+        self._in_flight = {}
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def start(self) -> None:
+        connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=self.keepalive)
+        self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @staticmethod
+    def cache_key(user_email: str, promo_id: UUID) -> str:
+        return f"antifraud:{user_email}:{promo_id}"
+
+    async def get_cached(self, redis: Redis, user_email: str, promo_id: UUID) -> Optional[bool]:
+        cached = await redis.get(self.cache_key(user_email, promo_id))
+        if cached is None:
+            return None
+        return cached == b"1"
+
+    async def validate(self, redis: Redis, user_email: str, promo_id: UUID) -> bool:
+        """
+        Возвращает вердикт антифрода для пары (пользователь, промокод).
+        Пока не наступил cache_until, ответ берётся из Redis без обращения к сервису.
+        Одинаковые параллельные проверки в воркере ждут один общий запрос.
+        """
+        cached = await self.get_cached(redis, user_email, promo_id)
+        if cached is not None:
+            return cached
+        key = self.cache_key(user_email, promo_id)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._validate_once(redis, user_email, promo_id))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _validate_once(self, redis: Redis, user_email: str, promo_id: UUID) -> bool:
+        """
+        Между воркерами к сервису идёт только владелец короткой блокировки в Redis,
+        остальные ждут его вердикт в кэше. Если блокировка снята, а вердикта нет
+        (ошибка или нулевой cache_until), воркер спрашивает сервис сам.
+        """
+        key = self.cache_key(user_email, promo_id)
+        lock_key = f"{key}:lock"
+        lock_token = uuid.uuid4().hex
+        if not await redis.set(lock_key, lock_token, nx=True, px=self.lock_ttl):
+            while await redis.exists(lock_key):
+                await asyncio.sleep(self.lock_poll)
+            cached = await self.get_cached(redis, user_email, promo_id)
+            if cached is not None:
+                return cached
+            return await self._fetch(redis, user_email, promo_id)
+        try:
+            cached = await self.get_cached(redis, user_email, promo_id)
+            if cached is not None:
+                return cached
+            return await self._fetch(redis, user_email, promo_id)
+        finally:
+            await redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, lock_token)
+
+    async def _fetch(self, redis: Redis, user_email: str, promo_id: UUID) -> bool:
+        data = await self._request({"user_email": user_email, "promo_id": str(promo_id)})
+        if data is None:
+            return False
+        ok = bool(data.get("ok"))
+        ttl = verdict_ttl_ms(data.get("cache_until"))
+        if ttl > 0:
+            await redis.set(self.cache_key(user_email, promo_id), "1" if ok else "0", px=ttl)
+        return ok
+
+    async def _request(self, payload: dict) -> Optional[dict]:
+        for attempt in range(self.retries + 1):
+            if attempt:
+                await asyncio.sleep(random.uniform(0, self.retry_backoff * 2 ** attempt))
+            start = time.perf_counter()
+            try:
+                async with self._session.post(self.url, json=payload) as response:
+                    if response.status == 200:
+                        data = await response.json()
+                        record_antifraud(time.perf_counter() - start, "ok")
+                        return data
+                    record_antifraud(time.perf_counter() - start, "http_error")
+                    logger.warning("Antifraud responded %s (attempt %s)", response.status, attempt + 1)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                record_antifraud(time.perf_counter() - start, "failed")
+                logger.warning("Antifraud request failed (attempt %s): %r", attempt + 1, e)
+        return None
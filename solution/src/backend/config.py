@@ -1,5 +1,8 @@
+from typing import Literal
 from pydantic_settings import BaseSettings
 
+CountMode = Literal["exact", "cached", "window"]
+
 class Settings(BaseSettings):
     SERVER_ADDRESS: str
     SERVER_PORT: int
@@ -12,6 +15,52 @@ class Settings(BaseSettings):
     REDIS_PORT: int
     ANTIFRAUD_ADDRESS: str
     RANDOM_SECRET: str
+    DB_SLOW_QUERY_MS: float = 200
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800
+    DB_STATEMENT_CACHE_SIZE: int = 500
+    FEED_COUNT_MODE: CountMode = "exact"
+    BUSINESS_PROMOS_COUNT_MODE: CountMode = "exact"
+    COMMENTS_COUNT_MODE: CountMode = "exact"
+    HISTORY_COUNT_MODE: CountMode = "exact"
+    COUNT_CACHE_TTL: int = 5
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 64
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL: int = 30
+    ANTIFRAUD_POOL_SIZE: int = 100
+    ANTIFRAUD_KEEPALIVE: float = 30
+    ANTIFRAUD_TIMEOUT: float = 5
+    ANTIFRAUD_CONNECT_TIMEOUT: float = 1
+    ANTIFRAUD_RETRIES: int = 1
+    ANTIFRAUD_RETRY_BACKOFF: float = 0.05
+    ANTIFRAUD_LOCK_TTL: int = 3000
+    ANTIFRAUD_LOCK_POLL: float = 0.02
+    PROMO_CACHE_TTL: int = 300
+    PROMO_COUNTERS_TTL: int = 60
+    LIKES_WRITE_BEHIND: bool = False
+    LIKES_FLUSH_INTERVAL: float = 1
+    LIKES_FLUSH_BATCH: int = 500
+    LIKES_FLUSH_LOCK_TTL: int = 30000
+    FEED_INDEX_ENABLED: bool = False
+    FEED_INDEX_TTL: int = 3600
+    FEED_INDEX_RECONCILE_INTERVAL: float = 300
+    FEED_INDEX_RECONCILE_LOCK_TTL: int = 60000
+    FEED_INDEX_BUILD_LOCK_TTL: int = 60000
+    LOG_LEVEL: str = "INFO"
+    LOG_QUEUE_SIZE: int = 10000
+    LOG_SAMPLE_BURST: int = 200
+    LOG_SAMPLE_RATE: float = 0.1
+    PROFILING_ENABLED: bool = False
+    PROFILING_TOKEN: str = ""
+    PROFILING_DIR: str = "profiles"
+    PROFILING_FORMAT: Literal["speedscope", "collapsed"] = "speedscope"
+    PROFILING_INTERVAL: float = 0.001
+    PROFILING_MIN_INTERVAL: float = 10
+    PROFILING_MAX_FILES: int = 100
 
     @property
     def database_url(self):
@@ -1,10 +1,102 @@
+import logging
+import time
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from src.backend.config import settings
 
-engine = create_async_engine(settings.database_url, echo=True, future=True)
+logger = logging.getLogger(__name__)
+SLOW_QUERY_STATEMENT_LIMIT = 2000
+
+
+class PoolStats:
+    """
+    Счётчики ожидания соединения из пула, общие для всех пулов воркера
+    """
+    def __init__(self):
+        self.checkouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_checkout(self, wait_seconds: float) -> None:
+        self.checkouts += 1
+        self.wait_seconds_total += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    def connect(self):
+        start = time.perf_counter()
+        connection = super().connect()
+        pool_stats.record_checkout(time.perf_counter() - start)
+        return connection
+
+
+engine = create_async_engine(
+    settings.database_url,
+    poolclass=InstrumentedPool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    connect_args={"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+)
 async_session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+
+def pool_metrics() -> dict:
+    """
+    Текущее состояние пула соединений для экспорта в метрики
+    """
+    pool = engine.sync_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(0, pool.overflow()),
+        "checked_in": pool.checkedin(),
+        "checkouts_total": pool_stats.checkouts,
+        "checkout_wait_seconds_total": pool_stats.wait_seconds_total,
+        "checkout_wait_seconds_max": pool_stats.wait_seconds_max,
+    }
+
+
+def log_slow_queries(engine, threshold_ms: float) -> None:
+    """
+    Пишет в лог SQL-запросы дольше threshold_ms вместо echo всех запросов.
+    Параметры не логируются: среди них бывают хэши паролей и токены.
+    """
+    if threshold_ms <= 0:
+        return
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("slow_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        duration_ms = (time.perf_counter() - conn.info["slow_query_start"].pop()) * 1000
+        if duration_ms >= threshold_ms:
+            logger.warning(
+                "Slow query %.1f ms", duration_ms,
+                extra={
+                    "duration_ms": round(duration_ms, 1),
+                    "statement": statement[:SLOW_QUERY_STATEMENT_LIMIT],
+                    "executemany": executemany,
+                },
+            )
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("slow_query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
 async def get_db():
     async with async_session_maker() as session:
         yield session
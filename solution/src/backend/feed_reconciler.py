@@ -0,0 +1,47 @@
+import asyncio
+import logging
+import uuid
+from redis.asyncio import Redis
+from src.backend.antifraud import RELEASE_LOCK_SCRIPT
+from src.backend.config import settings
+from src.backend.db import async_session_maker
+from src.repositories.feed_index import FeedIndex
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_LOCK_KEY = "feed:reconcile:lock"
+
+
+async def reconcile_feed_index(redis: Redis) -> bool:
+    """
+    Перестраивает построенные сегменты индекса ленты из БД и пишет в лог найденное расхождение.
+    Одновременно сверяет только один воркер; возвращает False, если блокировку держит другой.
+    """
+    token = uuid.uuid4().hex
+    if not await redis.set(RECONCILE_LOCK_KEY, token, nx=True, px=settings.FEED_INDEX_RECONCILE_LOCK_TTL):
+        return False
+    try:
+        async with async_session_maker() as session:
+            drift = await FeedIndex(session, redis).reconcile()
+        if drift:
+            logger.warning(
+                "Feed index drift repaired in %s segments", len(drift),
+                extra={"drift": drift, "entries": sum(drift.values())},
+            )
+    finally:
+        await redis.eval(RELEASE_LOCK_SCRIPT, 1, RECONCILE_LOCK_KEY, token)
+    return True
+
+
+async def run_feed_reconciler(redis: Redis) -> None:
+    """
+    Фоновая задача воркера: раз в FEED_INDEX_RECONCILE_INTERVAL секунд сверяет индекс ленты с БД
+    """
+    while True:
+        try:
+            await asyncio.sleep(settings.FEED_INDEX_RECONCILE_INTERVAL)
+            await reconcile_feed_index(redis)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Feed index reconciliation failed, retrying on the next tick")
@@ -0,0 +1,49 @@
+import asyncio
+import logging
+import uuid
+from redis.asyncio import Redis
+from src.backend.antifraud import RELEASE_LOCK_SCRIPT
+from src.backend.config import settings
+from src.backend.db import async_session_maker
+from src.repositories.like_buffer import LikeBuffer
+
+logger = logging.getLogger(__name__)
+
+FLUSH_LOCK_KEY = "likes:flush:lock"
+
+
+async def flush_likes(redis: Redis) -> bool:
+    """
+    Переносит в БД накопленные изменения лайков пачками по LIKES_FLUSH_BATCH промокодов.
+    Одновременно сбрасывает только один воркер; возвращает False, если блокировку держит другой.
+    Сброс останавливается на половине TTL блокировки, остаток уйдёт на следующем тике.
+    """
+    token = uuid.uuid4().hex
+    if not await redis.set(FLUSH_LOCK_KEY, token, nx=True, px=settings.LIKES_FLUSH_LOCK_TTL):
+        return False
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.LIKES_FLUSH_LOCK_TTL / 2000
+    try:
+        async with async_session_maker() as session:
+            buffer = LikeBuffer(session, redis)
+            while await buffer.flush(settings.LIKES_FLUSH_BATCH) >= settings.LIKES_FLUSH_BATCH:
+                if loop.time() >= deadline:
+                    break
+    finally:
+        await redis.eval(RELEASE_LOCK_SCRIPT, 1, FLUSH_LOCK_KEY, token)
+    return True
+
+
+async def run_like_flusher(redis: Redis) -> None:
+    """
+    Фоновая задача воркера: раз в LIKES_FLUSH_INTERVAL секунд сбрасывает лайки в БД.
+    Изменение попадает в Postgres не позже чем через интервал плюс время одного сброса.
+    """
+    while True:
+        try:
+            await asyncio.sleep(settings.LIKES_FLUSH_INTERVAL)
+            await flush_likes(redis)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Like flush failed, retrying on the next tick")
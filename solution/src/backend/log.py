@@ -0,0 +1,189 @@
+import atexit
+import logging
+import queue
+import random
+import re
+import sys
+import time
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+from uuid import UUID, uuid4
+import orjson
+from src.backend.config import settings
+
+REQUEST_ID_HEADER = b"x-request-id"
+REQUEST_ID_PATTERN = re.compile(rb"[A-Za-z0-9._\-]{1,64}")
+# Аргументы этих типов неизменяемы, поэтому сообщение можно собрать позже в потоке записи
+LAZY_ARG_TYPES = (str, bytes, int, float, bool, type(None), UUID)
+RECORD_ATTRS = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "taskName", "request_id", "color_message"}
+# Логгеры серверов пишут через собственные синхронные хэндлеры, забираем их в общую очередь
+SERVER_LOGGERS = ("uvicorn", "uvicorn.error", "uvicorn.access", "gunicorn.error", "gunicorn.access")
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+
+class LogStats:
+    """
+    Записи, не попавшие в вывод, для экспорта в метрики
+    """
+    def __init__(self):
+        self.sampled = 0
+        self.dropped = 0
+
+
+log_stats = LogStats()
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Пропускает первые burst записей в секунду, сверх этого - долю rate.
+    Записи уровня ERROR и выше не отбрасываются. У попавших в выборку
+    записей есть поле sample_rate, чтобы при подсчёте их можно было перевзвесить.
+    """
+    def __init__(self, burst: int, rate: float):
+        super().__init__()
+        self.burst = burst
+        self.rate = rate
+        self.window_start = time.monotonic()
+        self.window_count = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.ERROR:
+            return True
+        now = time.monotonic()
+        if now - self.window_start >= 1:
+            self.window_start = now
+            self.window_count = 0
+        self.window_count += 1
+        if self.window_count <= self.burst:
+            return True
+        if random.random() < self.rate:
+            record.sample_rate = self.rate
+            return True
+        log_stats.sampled += 1
+        return False
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Кладёт запись в ограниченную очередь и сразу возвращается. Сообщение
+    собирается и сериализуется в потоке записи; если очередь переполнена,
+    запись отбрасывается, а не блокирует event loop.
+    """
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args and not all(isinstance(arg, LAZY_ARG_TYPES) for arg in _args(record)):
+            # Изменяемые объекты к моменту записи могут поменяться, форматируем сразу
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            log_stats.dropped += 1
+
+
+def _args(record: logging.LogRecord):
+    return record.args.values() if isinstance(record.args, dict) else record.args
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+        }
+        if getattr(record, "request_id", None):
+            data["request_id"] = record.request_id
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRS:
+                data[key] = value
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return orjson.dumps(data, default=str).decode()
+
+
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(stream=None) -> QueueListener:
+    """
+    Переводит корневой логгер на очередь с фоновым потоком, пишущим JSON-строки в stream
+    """
+    global _listener
+    stop_logging()
+
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(JsonFormatter())
+    handler = NonBlockingQueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+    handler.addFilter(SamplingFilter(settings.LOG_SAMPLE_BURST, settings.LOG_SAMPLE_RATE))
+    handler.addFilter(RequestIdFilter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(settings.LOG_LEVEL)
+    for name in SERVER_LOGGERS:
+        server_logger = logging.getLogger(name)
+        server_logger.handlers = []
+        server_logger.propagate = True
+
+    _listener = QueueListener(handler.queue, writer)
+    _listener.start()
+    return _listener
+
+
+def stop_logging() -> None:
+    """
+    Дописывает оставшиеся в очереди записи и останавливает поток записи
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+class RequestIdMiddleware:
+    """
+    ASGI-middleware: берёт X-Request-ID из запроса или создаёт новый, кладёт его
+    в контекст для логов и возвращает в ответе
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        value = None
+        for name, header in scope["headers"]:
+            if name == REQUEST_ID_HEADER and REQUEST_ID_PATTERN.fullmatch(header):
+                value = header
+                break
+        value = value or uuid4().hex.encode()
+        token = request_id.set(value.decode())
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(REQUEST_ID_HEADER, value)]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id.reset(token)
@@ -0,0 +1,210 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import Request, Response
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from src.backend.db import pool_metrics
+from src.backend.hashing import password_hasher
+from src.backend.log import log_stats
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 4, 5, 7, 10, 15, 20, 30, 50, 100)
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Время обработки запроса", ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Суммарное время SQL-запросов за HTTP-запрос", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_DB_STATEMENTS = Histogram(
+    "http_request_db_statements", "Число SQL-запросов за HTTP-запрос", ["method", "route"],
+    buckets=STATEMENT_BUCKETS,
+)
+REQUEST_REDIS_TIME = Histogram(
+    "http_request_redis_seconds", "Суммарное время команд Redis за HTTP-запрос", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_ANTIFRAUD_TIME = Histogram(
+    "http_request_antifraud_seconds", "Суммарное время запросов в антифрод за HTTP-запрос", ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+DB_STATEMENT_LATENCY = Histogram(
+    "db_statement_duration_seconds", "Время одного SQL-запроса, включая фоновые задачи", buckets=LATENCY_BUCKETS,
+)
+REDIS_LATENCY = Histogram(
+    "redis_command_duration_seconds", "Время команды Redis", ["command"], buckets=LATENCY_BUCKETS,
+)
+ANTIFRAUD_LATENCY = Histogram(
+    "antifraud_request_duration_seconds", "Время одной попытки запроса в антифрод", ["outcome"],
+    buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Запросы в обработке", multiprocess_mode="livesum")
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections", "Соединения пула по состояниям", ["state"], multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUTS = Gauge("db_pool_checkouts", "Выдано соединений из пула с запуска", multiprocess_mode="livesum")
+DB_POOL_WAIT = Gauge(
+    "db_pool_checkout_wait_seconds", "Суммарное ожидание соединения из пула с запуска", multiprocess_mode="livesum",
+)
+DB_POOL_WAIT_MAX = Gauge(
+    "db_pool_checkout_wait_seconds_max", "Самое долгое ожидание соединения из пула", multiprocess_mode="max",
+)
+HASH_QUEUE_DEPTH = Gauge(
+    "password_hash_queue_depth", "Задачи argon2, ждущие свободного потока", multiprocess_mode="livesum",
+)
+HASH_IN_FLIGHT = Gauge("password_hash_in_flight", "Задачи argon2 в работе и в очереди", multiprocess_mode="livesum")
+LOG_RECORDS_DISCARDED = Gauge(
+    "log_records_discarded", "Записи лога, отброшенные семплированием или при переполненной очереди",
+    ["reason"], multiprocess_mode="livesum",
+)
+UNMATCHED_ROUTES = Counter("http_unmatched_requests", "Запросы без подходящего маршрута", ["method"])
+
+
+class RequestStats:
+    """
+    Время по слоям в пределах одного HTTP-запроса. Объект изменяемый, поэтому
+    его видят и события движка, выполняемые в greenlet SQLAlchemy.
+    """
+    __slots__ = ("db_seconds", "db_statements", "redis_seconds", "antifraud_seconds")
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.db_statements = 0
+        self.redis_seconds = 0.0
+        self.antifraud_seconds = 0.0
+
+
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def instrument_engine(engine) -> None:
+    """
+    Вешает на движок подсчёт времени и числа SQL-запросов
+    """
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        DB_STATEMENT_LATENCY.observe(elapsed)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.db_seconds += elapsed
+            stats.db_statements += 1
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("query_start") if context.connection is not None else None
+        if starts:
+            starts.pop()
+
+
+@contextmanager
+def observe_redis(command: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        REDIS_LATENCY.labels(command).observe(elapsed)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.redis_seconds += elapsed
+
+
+def record_antifraud(seconds: float, outcome: str) -> None:
+    ANTIFRAUD_LATENCY.labels(outcome).observe(seconds)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.antifraud_seconds += seconds
+
+
+def refresh_gauges() -> None:
+    """
+    Переносит в метрики состояние пула соединений, очереди хэширования и логов этого воркера
+    """
+    pool = pool_metrics()
+    DB_POOL_CONNECTIONS.labels("checked_out").set(pool["checked_out"])
+    DB_POOL_CONNECTIONS.labels("checked_in").set(pool["checked_in"])
+    DB_POOL_CONNECTIONS.labels("overflow").set(pool["overflow"])
+    DB_POOL_CHECKOUTS.set(pool["checkouts_total"])
+    DB_POOL_WAIT.set(pool["checkout_wait_seconds_total"])
+    DB_POOL_WAIT_MAX.set(pool["checkout_wait_seconds_max"])
+    HASH_QUEUE_DEPTH.set(password_hasher.queue_depth)
+    HASH_IN_FLIGHT.set(password_hasher.in_flight)
+    LOG_RECORDS_DISCARDED.labels("sampled").set(log_stats.sampled)
+    LOG_RECORDS_DISCARDED.labels("queue_full").set(log_stats.dropped)
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: гистограмма задержки по шаблону маршрута и разбивка времени
+    запроса на БД, Redis и антифрод. Шаблон берётся из scope после роутинга,
+    поэтому path-параметры не раздувают число серий.
+    """
+    def __init__(self, app, skip_paths: tuple = ("/metrics",)):
+        self.app = app
+        self.skip_paths = skip_paths
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip_paths:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_FLIGHT.dec()
+            request_stats.reset(token)
+            method = scope["method"]
+            route = scope.get("route")
+            if route is None:
+                UNMATCHED_ROUTES.labels(method).inc()
+            else:
+                path = route.path
+                HTTP_LATENCY.labels(method, path, str(status)).observe(elapsed)
+                REQUEST_DB_TIME.labels(method, path).observe(stats.db_seconds)
+                REQUEST_DB_STATEMENTS.labels(method, path).observe(stats.db_statements)
+                REQUEST_REDIS_TIME.labels(method, path).observe(stats.redis_seconds)
+                REQUEST_ANTIFRAUD_TIME.labels(method, path).observe(stats.antifraud_seconds)
+            refresh_gauges()
+
+
+def metrics_registry() -> CollectorRegistry:
+    """
+    Под gunicorn каждый воркер пишет метрики в PROMETHEUS_MULTIPROC_DIR,
+    и любой из них отдаёт их сумму по всем воркерам
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    refresh_gauges()
+    return Response(generate_latest(metrics_registry()), media_type=CONTENT_TYPE_LATEST)
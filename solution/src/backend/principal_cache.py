@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from types import SimpleNamespace
+from typing import Optional
+from redis.asyncio import Redis
+from src.backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "principal_cache:invalidate"
+
+
+class PrincipalCache:
+    """
+    LRU-кэш проверенных токенов в памяти воркера: токен -> снимок пользователя или компании.
+    Запись живёт не дольше ttl секунд и не дольше срока действия самого токена.
+
+    Между проверкой токена и заполнением кэша запрос ждёт Redis и БД. Инвалидация,
+    пришедшая в это время, не нашла бы записи, и устаревший снимок попал бы в кэш.
+    Поэтому у каждого принципала есть поколение: его читают до проверки токена,
+    invalidate и clear его меняют, а set с устаревшим поколением ничего не кэширует.
+    """
+    def __init__(self, max_entries: int, ttl: int):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._keys_by_principal = {}
+        self._epoch = 0
+        self._generations = {}
+
+    def generation(self, kind: str, principal_id) -> tuple:
+        return self._epoch, self._generations.get(f"{kind}:{principal_id}", 0)
+
+    def get(self, kind: str, token: str) -> Optional[SimpleNamespace]:
+        key = (kind, token)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, _, snapshot = entry
+        if expires_at <= time.monotonic():
+            self._pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return snapshot
+
+    def set(
+        self, kind: str, token: str, principal_id, data: dict, token_exp: Optional[int] = None, generation: tuple = None
+    ) -> SimpleNamespace:
+        snapshot = SimpleNamespace(**data)
+        if self.max_entries <= 0:
+            return snapshot
+        if generation is not None and generation != self.generation(kind, principal_id):
+            return snapshot
+        now = time.monotonic()
+        expires_at = now + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, now + token_exp - time.time())
+
+        key = (kind, token)
+        principal_key = f"{kind}:{principal_id}"
+        self._pop(key)
+        self._entries[key] = (expires_at, principal_key, snapshot)
+        self._keys_by_principal.setdefault(principal_key, set()).add(key)
+        while len(self._entries) > self.max_entries:
+            self._pop(next(iter(self._entries)))
+        return snapshot
+
+    def invalidate(self, principal_key: str) -> None:
+        self._generations[principal_key] = self._generations.get(principal_key, 0) + 1
+        for key in self._keys_by_principal.pop(principal_key, set()):
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        # Новая эпоха делает устаревшими все начатые заполнения, счётчики принципалов можно сбросить
+        self._epoch += 1
+        self._generations.clear()
+        self._entries.clear()
+        self._keys_by_principal.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _pop(self, key) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._keys_by_principal.get(entry[1])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_principal[entry[1]]
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_SIZE, settings.PRINCIPAL_CACHE_TTL)
+
+
+async def publish_invalidation(redis: Redis, principal_key: str) -> None:
+    """
+    Сбрасывает закэшированные токены принципала во всех воркерах
+    """
+    principal_cache.invalidate(principal_key)
+    await redis.publish(INVALIDATION_CHANNEL, principal_key)
+
+
+async def listen_for_invalidations(redis: Redis) -> None:
+    """
+    Фоновая задача воркера: применяет инвалидации, опубликованные другими воркерами.
+    После переподключения кэш очищается, так как часть сообщений могла быть пропущена.
+    """
+    while True:
+        try:
+            async with redis.pubsub() as pubsub:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                principal_cache.clear()
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        principal_cache.invalidate(message["data"].decode("utf-8"))
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            logger.exception("Principal cache invalidation listener failed, reconnecting")
+            principal_cache.clear()
+            await asyncio.sleep(1)
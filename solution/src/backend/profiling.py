@@ -0,0 +1,135 @@
+import asyncio
+import hmac
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from uuid import uuid4
+from pyinstrument import Profiler
+from pyinstrument.renderers import SpeedscopeRenderer
+from src.backend.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_FILE_HEADER = b"x-profile-file"
+EXTENSIONS = {"speedscope": "speedscope.json", "collapsed": "collapsed.txt"}
+
+
+def collapsed_stacks(session) -> str:
+    """
+    Профиль в формате collapsed stack (flamegraph.pl, speedscope, inferno):
+    одна строка на стек, вес - время в микросекундах. Ожидание в await
+    выделено отдельным кадром [await], время самой функции свёрнуто в неё.
+    """
+    lines = []
+
+    def walk(frame, stack: tuple):
+        if frame.identifier == "[self]":
+            name_stack = stack
+        elif frame.is_synthetic:
+            name_stack = stack + (frame.function,)
+        else:
+            name_stack = stack + (f"{frame.function} ({frame.file_path_short}:{frame.line_no})",)
+        if not frame.children:
+            weight = round(frame.time * 1_000_000)
+            if weight:
+                lines.append(f"{';'.join(name_stack)} {weight}")
+        for child in frame.children:
+            walk(child, name_stack)
+
+    root = session.root_frame()
+    if root is not None:
+        walk(root, ())
+    return "\n".join(lines) + "\n"
+
+
+def render(session, output_format: str) -> str:
+    if output_format == "collapsed":
+        return collapsed_stacks(session)
+    return SpeedscopeRenderer().render(session)
+
+
+def prune(directory: Path, keep: int) -> None:
+    profiles = sorted(
+        (path for extension in EXTENSIONS.values() for path in directory.glob(f"*.{extension}")),
+        key=lambda path: path.stat().st_mtime,
+    )
+    for path in profiles[:max(len(profiles) - keep, 0)]:
+        path.unlink(missing_ok=True)
+
+
+def save_profile(session, directory: Path, name: str, output_format: str, keep: int) -> None:
+    """
+    Рендерит и пишет профиль; вызывается в потоке, чтобы не занимать event loop
+    """
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp = directory / f".{name}.tmp"
+    tmp.write_text(render(session, output_format))
+    tmp.rename(directory / name)
+    prune(directory, keep)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI-middleware: по запросу с заголовком X-Profile, равным PROFILING_TOKEN,
+    снимает семплирующий профиль обработки этого запроса и пишет его в PROFILING_DIR.
+    Профилировщик работает в async-режиме, поэтому время ожидания asyncpg, Redis,
+    антифрода и пула argon2 попадает в стек той корутины, которая его ждёт.
+
+    В каждом воркере одновременно снимается не больше одного профиля и не чаще
+    раза в PROFILING_MIN_INTERVAL секунд; остальные запросы с заголовком обслуживаются
+    как обычно. В каталоге хранятся последние PROFILING_MAX_FILES файлов.
+    Имя файла возвращается в заголовке X-Profile-File.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.token = settings.PROFILING_TOKEN.encode()
+        self.directory = Path(settings.PROFILING_DIR)
+        self.active = False
+        self.last_started = float("-inf")
+
+    def _requested(self, scope) -> bool:
+        if scope["type"] != "http" or not self.token:
+            return False
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return hmac.compare_digest(value, self.token)
+        return False
+
+    def _acquire(self) -> bool:
+        now = time.monotonic()
+        if self.active or now - self.last_started < settings.PROFILING_MIN_INTERVAL:
+            return False
+        self.active = True
+        self.last_started = now
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if not self._requested(scope) or not self._acquire():
+            await self.app(scope, receive, send)
+            return
+
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        route = scope["path"].strip("/").replace("/", "_") or "root"
+        name = f"{stamp}_{os.getpid()}_{scope['method']}_{route}_{uuid4().hex[:8]}.{EXTENSIONS[settings.PROFILING_FORMAT]}"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(PROFILE_FILE_HEADER, name.encode())]
+            await send(message)
+
+        profiler = Profiler(interval=settings.PROFILING_INTERVAL, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            session = profiler.stop()
+            self.active = False
+            try:
+                await asyncio.to_thread(
+                    save_profile, session, self.directory, name, settings.PROFILING_FORMAT, settings.PROFILING_MAX_FILES
+                )
+            except OSError:
+                logger.exception("Failed to write profile %s", name)
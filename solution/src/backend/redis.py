@@ -1,13 +1,34 @@
 import redis.asyncio as redis
 from src.backend.config import settings
+from src.backend.metrics import observe_redis
 from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
 from fastapi import Request
 
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        with observe_redis("PIPELINE"):
+            return await super().execute(raise_on_error)
+
+
+class InstrumentedRedis(Redis):
+    """
+    Клиент Redis, который пишет время каждой команды и пайплайна в метрики
+    """
+    async def execute_command(self, *args, **options):
+        with observe_redis(str(args[0]).upper()):
+            return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
 async def connect():
-    return redis.from_url(f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}")
+    return InstrumentedRedis.from_url(f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}")
 
 async def close(redis_client: redis.Redis):
     await redis_client.close()
 
 def get_redis(request: Request) -> Redis:
-    return request.app.state.redis
\ No newline at end of file
+    return request.app.state.redis
@@ -0,0 +1,58 @@
+"""
+Сброс лайков из Redis в Postgres для режима LIKES_WRITE_BEHIND.
+
+Без флагов переносит в БД все накопленные изменения, включая пачки, которые остались
+в likes:inflight после падения воркера посреди сброса. С --reset после сброса удаляет
+засеянные множества лайков, и при следующем обращении они загрузятся из БД.
+
+Восстановление после сбоев:
+- упал воркер приложения: изменения остаются в Redis, ничего делать не нужно, их
+  подхватит сбросчик любого живого воркера или эта команда;
+- упал воркер посреди сброса: пачка лежит в likes:{promo_id}:flushing и повторяется
+  целиком, запись идемпотентна, like_count пересчитывается по user_liked_promos;
+- потерян Redis: в БД остаётся всё, что было сброшено до сбоя, изменения за последний
+  интервал LIKES_FLUSH_INTERVAL теряются. Множества засеются из БД заново автоматически,
+  так как отметки likes:{promo_id}:seeded пропали вместе с ними. Для этого режима Redis
+  нужен с AOF и maxmemory-policy noeviction;
+- выключение режима: остановить приложение, выполнить команду с --reset и только потом
+  запускать воркеры с LIKES_WRITE_BEHIND=false. Иначе лайки, поставленные в обычном режиме,
+  не попадут в множества при повторном включении.
+
+    python -m src.commands.flush_likes [--reset]
+"""
+import argparse
+import asyncio
+import sys
+from src.backend.db import async_session_maker, engine
+from src.backend.like_flusher import flush_likes
+from src.backend.redis import connect, close
+from src.repositories.like_buffer import LikeBuffer, DIRTY_KEY, INFLIGHT_KEY
+
+
+async def run(reset: bool) -> int:
+    redis = await connect()
+    try:
+        while await redis.scard(DIRTY_KEY) or await redis.scard(INFLIGHT_KEY):
+            if not await flush_likes(redis):
+                print("flush lock is held by another worker, waiting")
+                await asyncio.sleep(1)
+        print("pending likes flushed")
+        if reset:
+            async with async_session_maker() as session:
+                removed = await LikeBuffer(session, redis).reset()
+            print(f"removed keys: {removed}")
+    finally:
+        await close(redis)
+        await engine.dispose()
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reset", action="store_true", help="после сброса удалить множества лайков из Redis")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.reset)))
+
+
+if __name__ == "__main__":
+    main()
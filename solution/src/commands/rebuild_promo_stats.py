@@ -0,0 +1,43 @@
+"""
+Пересчёт статистики активаций по странам (promo_stats_by_country) из сырых активаций.
+
+Без флагов пересчитывает таблицу целиком в одной транзакции. С --check только сравнивает
+готовую статистику с пересчётом и печатает расхождения; код выхода 1, если они есть.
+
+    python -m src.commands.rebuild_promo_stats [--promo-id <uuid>] [--check]
+"""
+import argparse
+import asyncio
+import sys
+from uuid import UUID
+from src.backend.db import async_session_maker, engine
+from src.repositories.promo import PromoRepository
+
+
+async def run(promo_id: UUID, check: bool) -> int:
+    async with async_session_maker() as session:
+        repo = PromoRepository(session)
+        if check:
+            diff = await repo.diff_promo_stats(promo_id)
+            for row_promo_id, country, stored, actual in diff:
+                print(f"{row_promo_id} {country}: stored={stored} actual={actual}")
+            print(f"mismatched rows: {len(diff)}")
+            result = 1 if diff else 0
+        else:
+            rows = await repo.rebuild_promo_stats(promo_id)
+            print(f"rebuilt rows: {rows}")
+            result = 0
+    await engine.dispose()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--promo-id", type=UUID, default=None, help="пересчитать только один промокод")
+    parser.add_argument("--check", action="store_true", help="только сравнить, ничего не меняя")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args.promo_id, args.check)))
+
+
+if __name__ == "__main__":
+    main()
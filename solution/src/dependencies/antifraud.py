@@ -0,0 +1,5 @@
+from fastapi import Request
+from src.backend.antifraud import AntifraudClient
+
+def get_antifraud(request: Request) -> AntifraudClient:
+    return request.app.state.antifraud
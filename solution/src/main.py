@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
@@ -6,21 +7,37 @@ import uvicorn
 
 from src.backend.redis import connect, close
 from src.backend.config import settings
+from src.backend.antifraud import AntifraudClient
+from src.backend.hashing import password_hasher
+from src.backend.principal_cache import listen_for_invalidations
+from src.backend.like_flusher import flush_likes, run_like_flusher
+from src.backend.feed_reconciler import run_feed_reconciler
+from src.backend.db import engine, log_slow_queries
+from src.backend.log import RequestIdMiddleware, configure_logging
+from src.backend.metrics import MetricsMiddleware, instrument_engine, metrics_endpoint
+from src.backend.profiling import ProfilingMiddleware
 from src.routers import auth, promo, auth_user, user_profile, user_promo
 
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 app = FastAPI()
+instrument_engine(engine)
+log_slow_queries(engine, settings.DB_SLOW_QUERY_MS)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
+app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
-    logger.error(f"Validation error on {request.url}: {exc}")
+    logger.warning("Validation error on %s %s: %s", request.method, request.url.path, exc)
     return JSONResponse(status_code=400, content={"detail": "Invalid request data"})
 
 @app.exception_handler(ValueError)
 async def value_error_handler(request: Request, exc: ValueError):
-    logger.error(f"Value error on {request.url}: {exc}")
+    logger.warning("Value error on %s %s: %s", request.method, request.url.path, exc)
     return JSONResponse(status_code=400, content={"detail": str(exc)})
 
 app.include_router(auth.router)
@@ -38,14 +55,31 @@ async def on_startup():
     logger.info("Starting up application")
     app.state.redis = await connect()
     logger.info("Connected to Redis")
+    app.state.antifraud = AntifraudClient()
+    await app.state.antifraud.start()
+    app.state.principal_cache_listener = asyncio.create_task(listen_for_invalidations(app.state.redis))
+    app.state.like_flusher = None
+    if settings.LIKES_WRITE_BEHIND:
+        app.state.like_flusher = asyncio.create_task(run_like_flusher(app.state.redis))
+    app.state.feed_reconciler = None
+    if settings.FEED_INDEX_ENABLED:
+        app.state.feed_reconciler = asyncio.create_task(run_feed_reconciler(app.state.redis))
 
 @app.on_event("shutdown")
 async def on_shutdown():
     logger.info("Shutting down application")
+    app.state.principal_cache_listener.cancel()
+    if app.state.like_flusher is not None:
+        app.state.like_flusher.cancel()
+        await flush_likes(app.state.redis)
+    if app.state.feed_reconciler is not None:
+        app.state.feed_reconciler.cancel()
     await close(app.state.redis)
     logger.info("Redis connection closed")
+    await app.state.antifraud.close()
+    password_hasher.shutdown()
 
 if __name__ == "__main__":
     host = settings.SERVER_ADDRESS.split(":")[0]
     port = int(settings.SERVER_ADDRESS.split(":")[1])
-    uvicorn.run(app, host=host, port=port)
+    uvicorn.run(app, host=host, port=port, log_config=None)
@@ -1,2 +1,4 @@
 from .company import Company
-from .promocode import PromoCode
\ No newline at end of file
+from .promocode import PromoCode, PromoUniqueCode, PromoStatByCountry, PromoActivation
+from .user import User
+from .comment import Commentary
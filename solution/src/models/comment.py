@@ -1,4 +1,4 @@
-from sqlalchemy import Column, DateTime, ForeignKey, UUID, String
+from sqlalchemy import Column, DateTime, ForeignKey, UUID, String, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from src.backend.db import Base
@@ -15,3 +15,6 @@ class Commentary(Base):
 
     author = relationship("User", backref="comments")
     promo = relationship("PromoCode", back_populates="comments")
+
+
+Index("ix_comments_promo_date_id", Commentary.promo_id, Commentary.date.desc(), Commentary.id.desc())
@@ -1,13 +1,19 @@
 from src.backend.db import Base
-from sqlalchemy import Column, Integer, String, Boolean, Date, ForeignKey, JSON, DateTime
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Date, ForeignKey, JSON, DateTime, Index, case, select
+from sqlalchemy.dialects.postgresql import UUID, ARRAY
 from sqlalchemy.sql import func
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import column_property, relationship
 import uuid
 
+STAT_SHARDS = 16
+
 
 class PromoCode(Base):
     __tablename__ = "promo_codes"
+    __table_args__ = (
+        Index("ix_promo_codes_target_age", "target_age_from", "target_age_until"),
+        Index("ix_promo_codes_target_categories", "target_categories", postgresql_using="gin"),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     created_at = Column(DateTime, default=func.now())
@@ -25,11 +31,16 @@ class PromoCode(Base):
     active_until = Column(Date, nullable=True)
 
     target = Column(JSON, nullable=True)
+    target_country = Column(String(2), nullable=True, index=True)
+    target_age_from = Column(Integer, nullable=True)
+    target_age_until = Column(Integer, nullable=True)
+    target_categories = Column(ARRAY(String(20)), nullable=True)
 
     limit = Column(Integer, default=0)
     max_count = Column(Integer, nullable=True)
     like_count = Column(Integer, default=0)
-    used_count = Column(Integer, default=0)
+    # Счётчик активаций COMMON. UNIQUE-активация не пишет в promo_codes, см. PromoCode.used_count ниже
+    common_used_count = Column("used_count", Integer, default=0)
     unique_count = Column(Integer, default=0)
     comment_count = Column(Integer, default=0)
 
@@ -38,3 +49,84 @@ class PromoCode(Base):
     company = relationship("Company", back_populates="promos")
     comments = relationship("Commentary", back_populates="promo")
     users_activated = relationship("User", secondary="user_activated_promos", backref="users_activated_promo")
+
+
+Index("ix_promo_codes_created_at_id", PromoCode.created_at.desc(), PromoCode.id.desc())
+Index("ix_promo_codes_company_created_at_id", PromoCode.company_id, PromoCode.created_at.desc(), PromoCode.id.desc())
+Index("ix_promo_codes_company_active_from", PromoCode.company_id, PromoCode.active_from.desc())
+Index("ix_promo_codes_company_active_until", PromoCode.company_id, PromoCode.active_until.desc())
+Index(
+    "ix_promo_codes_active_created_at_id",
+    PromoCode.created_at.desc(),
+    PromoCode.id.desc(),
+    postgresql_where=PromoCode.active,
+)
+
+
+class PromoUniqueCode(Base):
+    __tablename__ = "promo_unique_codes"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    promo_id = Column(UUID(as_uuid=True), ForeignKey("promo_codes.promo_id", ondelete="CASCADE"), nullable=False)
+    code = Column(String(30), nullable=False)
+    activated_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    activated_at = Column(DateTime, nullable=True)
+
+
+Index(
+    "ix_promo_unique_codes_free",
+    PromoUniqueCode.promo_id,
+    PromoUniqueCode.id,
+    postgresql_where=PromoUniqueCode.activated_by.is_(None),
+)
+Index(
+    "ix_promo_unique_codes_issued",
+    PromoUniqueCode.promo_id,
+    postgresql_where=PromoUniqueCode.activated_by.is_not(None),
+)
+
+# Для UNIQUE число использований - число выданных кодов: так параллельные активации
+# не обновляют одну строку promo_codes и не ждут друг друга
+PromoCode.used_count = column_property(
+    case(
+        (
+            PromoCode.mode == "UNIQUE",
+            select(func.count(PromoUniqueCode.id))
+            .where(PromoUniqueCode.promo_id == PromoCode.promo_id, PromoUniqueCode.activated_by.is_not(None))
+            .correlate_except(PromoUniqueCode)
+            .scalar_subquery(),
+        ),
+        else_=PromoCode.common_used_count,
+    )
+)
+
+
+class PromoStatByCountry(Base):
+    """
+    Активации по странам. Счётчик страны разбит на STAT_SHARDS строк, чтобы параллельные
+    активации из одной страны не ждали блокировку одной строки; читается суммой по shard.
+    """
+    __tablename__ = "promo_stats_by_country"
+
+    promo_id = Column(UUID(as_uuid=True), ForeignKey("promo_codes.promo_id", ondelete="CASCADE"), primary_key=True)
+    country = Column(String(2), primary_key=True)
+    shard = Column(Integer, primary_key=True, default=0)
+    activations_count = Column(Integer, nullable=False, default=0)
+
+
+class PromoActivation(Base):
+    __tablename__ = "promo_activations"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    promo_id = Column(UUID(as_uuid=True), ForeignKey("promo_codes.promo_id", ondelete="CASCADE"), nullable=False)
+    activated_at = Column(DateTime, nullable=False, default=func.now())
+
+
+Index(
+    "ix_promo_activations_user_activated_at",
+    PromoActivation.user_id,
+    PromoActivation.activated_at.desc(),
+    PromoActivation.id.desc(),
+)
+Index("ix_promo_activations_promo_id", PromoActivation.promo_id)
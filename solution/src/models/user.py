@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, JSON, ForeignKey, Table, DateTime, Integer
+from sqlalchemy import Column, String, JSON, ForeignKey, Table, DateTime, Integer, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 import uuid
@@ -38,3 +38,6 @@ user_liked_promos = Table(
     Column('user_id', UUID(as_uuid=True), ForeignKey('users.id', ondelete="CASCADE"), primary_key=True),
     Column('promo_id', UUID(as_uuid=True), ForeignKey('promo_codes.promo_id', ondelete="CASCADE"), primary_key=True)
 )
+
+Index("ix_user_activated_promos_promo_id_user_id", user_activated_promos.c.promo_id, user_activated_promos.c.user_id)
+Index("ix_user_liked_promos_promo_id_user_id", user_liked_promos.c.promo_id, user_liked_promos.c.user_id)
@@ -1,42 +1,128 @@
 # src/repositories/comment.py
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func
-from uuid import UUID
+from sqlalchemy import func, tuple_, literal, update, delete, insert
+from typing import Optional
+from uuid import UUID, uuid4
+from redis.asyncio import Redis
 from src.models.comment import Commentary
+from src.models.promocode import PromoCode
+from src.models.user import User
+from src.repositories.counting import PageCounter, COMMENTS
+
+# Комментарий вместе с полями автора, которые попадают в ответ
+COMMENT_COLUMNS = (
+    Commentary.id,
+    Commentary.text,
+    Commentary.date,
+    Commentary.author_id,
+    User.name.label("author_name"),
+    User.surname.label("author_surname"),
+    User.avatar_url.label("author_avatar_url"),
+)
 
 class CommentRepository:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, redis: Redis = None):
         self.db = db
+        self.redis = redis
 
-    async def create_comment(self, comment: Commentary) -> Commentary:
-        self.db.add(comment)
+    async def create_comment(self, comment: Commentary) -> Optional[Commentary]:
+        """
+        Добавляет комментарий и увеличивает comment_count промокода одним запросом.
+        Возвращает None, если промокода нет.
+        """
+        if comment.id is None:
+            comment.id = uuid4()
+        columns = Commentary.__table__.c
+        promo = select(PromoCode.promo_id).where(PromoCode.promo_id == comment.promo_id).cte("promo")
+        inserted = (
+            insert(Commentary)
+            .from_select(
+                ["id", "text", "date", "author_id", "promo_id"],
+                select(
+                    literal(comment.id, columns.id.type),
+                    literal(comment.text, columns.text.type),
+                    literal(comment.date, columns.date.type),
+                    literal(comment.author_id, columns.author_id.type),
+                    promo.c.promo_id,
+                )
+            )
+            .returning(Commentary.promo_id)
+            .cte("inserted")
+        )
+        counted = (
+            update(PromoCode)
+            .where(PromoCode.promo_id.in_(select(inserted.c.promo_id)))
+            .values(comment_count=PromoCode.comment_count + 1)
+            .returning(PromoCode.promo_id)
+            .cte("counted")
+        )
+        result = await self.db.execute(select(func.count()).select_from(promo).add_cte(inserted, counted))
         await self.db.commit()
-        await self.db.refresh(comment)
-        return comment
-
-    async def get_comments(self, promo_id: UUID, offset: int = 0, limit: int = 10) -> (list, int):
-        query = select(Commentary).where(Commentary.promo_id == promo_id).order_by(Commentary.date.desc()).offset(offset).limit(limit)
-        result = await self.db.execute(query)
-        comments = result.scalars().all()
+        return comment if result.scalar() else None
 
-        count_query = select(func.count()).select_from(Commentary).where(Commentary.promo_id == promo_id)
-        count_result = await self.db.execute(count_query)
-        total = count_result.scalar() or 0
+    async def get_comments(self, promo_id: UUID, offset: int = 0, limit: int = 10, cursor: tuple = None) -> (list, int):
+        """
+        Страница комментариев строками COMMENT_COLUMNS: автор подтягивается join-ом в том же запросе
+        """
+        query = (
+            select(*COMMENT_COLUMNS)
+            .join(User, User.id == Commentary.author_id)
+            .where(Commentary.promo_id == promo_id)
+        )
+        keyset = tuple_(Commentary.date, Commentary.id) < cursor if cursor is not None else None
+        return await PageCounter(self.db, self.redis, COMMENTS).fetch(
+            query,
+            order_by=[Commentary.date.desc(), Commentary.id.desc()],
+            count_column=Commentary.id,
+            offset=offset,
+            limit=limit,
+            keyset=keyset,
+            scalars=False,
+        )
 
-        return comments, total
-
-    async def get_by_id(self, comment_id: UUID, promo_id: UUID) -> Commentary:
-        query = select(Commentary).where(Commentary.id == comment_id, Commentary.promo_id == promo_id)
+    async def get_by_id(self, comment_id: UUID, promo_id: UUID):
+        """
+        Комментарий строкой COMMENT_COLUMNS или None
+        """
+        query = (
+            select(*COMMENT_COLUMNS)
+            .join(User, User.id == Commentary.author_id)
+            .where(Commentary.id == comment_id, Commentary.promo_id == promo_id)
+        )
         result = await self.db.execute(query)
-        return result.scalar()
+        return result.one_or_none()
 
-    async def update(self, comment: Commentary) -> Commentary:
-        self.db.add(comment)
+    async def update_text(self, comment_id: UUID, text: str):
+        """
+        Меняет текст комментария и возвращает его строкой COMMENT_COLUMNS
+        """
+        query = (
+            update(Commentary)
+            .where(Commentary.id == comment_id, User.id == Commentary.author_id)
+            .values(text=text)
+            .returning(*COMMENT_COLUMNS)
+        )
+        result = await self.db.execute(query)
         await self.db.commit()
-        await self.db.refresh(comment)
-        return comment
+        return result.one_or_none()
 
-    async def delete(self, comment: Commentary) -> None:
-        await self.db.delete(comment)
+    async def delete(self, comment) -> bool:
+        """
+        Удаляет комментарий и уменьшает comment_count промокода одним запросом.
+        Возвращает False, если комментарий уже удалён.
+        """
+        deleted = (
+            delete(Commentary)
+            .where(Commentary.id == comment.id)
+            .returning(Commentary.promo_id)
+            .cte("deleted")
+        )
+        result = await self.db.execute(
+            update(PromoCode)
+            .where(PromoCode.promo_id.in_(select(deleted.c.promo_id)))
+            .values(comment_count=func.greatest(PromoCode.comment_count - 1, 0))
+            .add_cte(deleted)
+        )
         await self.db.commit()
+        return bool(result.rowcount)
@@ -0,0 +1,89 @@
+import hashlib
+from typing import Optional
+from redis.asyncio import Redis
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.backend.config import settings
+
+EXACT = "exact"
+CACHED = "cached"
+WINDOW = "window"
+
+FEED = "feed"
+BUSINESS_PROMOS = "business_promos"
+COMMENTS = "comments"
+HISTORY = "history"
+
+
+def count_mode(namespace: str) -> str:
+    return {
+        FEED: settings.FEED_COUNT_MODE,
+        BUSINESS_PROMOS: settings.BUSINESS_PROMOS_COUNT_MODE,
+        COMMENTS: settings.COMMENTS_COUNT_MODE,
+        HISTORY: settings.HISTORY_COUNT_MODE,
+    }[namespace]
+
+
+class PageCounter:
+    """
+    Выбирает страницу и считает X-Total-Count одним из способов:
+    exact - отдельный COUNT(*), cached - COUNT(*) с кэшем в Redis по отпечатку фильтров,
+    window - count(*) over () в том же запросе, что и страница.
+    При scalars=False возвращаются строки целиком; в режиме window у них есть лишняя колонка total_count.
+    """
+    def __init__(self, db: AsyncSession, redis: Optional[Redis], namespace: str):
+        self.db = db
+        self.redis = redis
+        self.namespace = namespace
+        self.mode = count_mode(namespace)
+
+    async def fetch(
+        self, query, order_by: list, count_column, offset: int, limit: int, keyset=None, scalars: bool = True
+    ) -> (list, int):
+        page_query = query.order_by(*order_by)
+        page_query = page_query.filter(keyset) if keyset is not None else page_query.offset(offset)
+        page_query = page_query.limit(limit)
+
+        if self.mode == WINDOW and keyset is None:
+            result = await self.db.execute(page_query.add_columns(func.count().over().label("total_count")))
+            rows = result.all()
+            if rows:
+                return [row[0] for row in rows] if scalars else rows, rows[0].total_count
+            if offset == 0:
+                return [], 0
+
+        total = await self._count(query.with_only_columns(func.count(count_column)).order_by(None))
+        result = await self.db.execute(page_query)
+        return (result.scalars().all() if scalars else result.all()), total
+
+    async def _count(self, count_query) -> int:
+        if self.mode != CACHED or self.redis is None:
+            result = await self.db.execute(count_query)
+            return result.scalar() or 0
+
+        key = await self._cache_key(count_query)
+        cached = await self.redis.get(key)
+        if cached is not None:
+            return int(cached)
+        result = await self.db.execute(count_query)
+        total = result.scalar() or 0
+        await self.redis.set(key, total, ex=settings.COUNT_CACHE_TTL)
+        return total
+
+    async def _cache_key(self, count_query) -> str:
+        compiled = count_query.compile(dialect=postgresql.dialect())
+        fingerprint = f"{compiled}|{sorted(compiled.params.items(), key=lambda item: item[0])!r}"
+        digest = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()
+        generation = await self.redis.get(f"count:{self.namespace}:generation") or b"0"
+        return f"count:{self.namespace}:{generation.decode('utf-8')}:{digest}"
+
+
+async def invalidate_counts(redis: Optional[Redis], *namespaces: str) -> None:
+    """
+    Делает недействительными закэшированные счётчики: ключи с прежним поколением истекут по TTL
+    """
+    if redis is None:
+        return
+    for namespace in namespaces:
+        await redis.incr(f"count:{namespace}:generation")
@@ -0,0 +1,270 @@
+from datetime import datetime, timedelta
+from typing import Optional
+from uuid import UUID, uuid4
+from redis.asyncio import Redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from src.backend.antifraud import RELEASE_LOCK_SCRIPT
+from src.backend.config import settings
+from src.models.promocode import PromoCode
+from src.utils.promo_helpers import USER_PROMO_COLUMNS, target_filter
+
+REGISTRY_KEY = "feed:segments"
+VERSION_KEY = "feed:version"
+BUILD_CHUNK = 1000
+EPOCH = datetime(1970, 1, 1)
+
+PAGE_SCRIPT = """
+if redis.call("EXISTS", KEYS[2]) == 0 then
+    return false
+end
+local total = redis.call("ZCARD", KEYS[1])
+local offset, limit = tonumber(ARGV[1]), tonumber(ARGV[2])
+if ARGV[3] == "" then
+    return {total, redis.call("ZREVRANGE", KEYS[1], offset, offset + limit - 1)}
+end
+-- Курсор (created_at, id): при равном score порядок задаёт id, как в ORDER BY created_at, id
+local ties = redis.call("ZCOUNT", KEYS[1], ARGV[3], ARGV[3])
+local candidates = redis.call("ZREVRANGEBYSCORE", KEYS[1], ARGV[3], "-inf", "WITHSCORES", "LIMIT", 0, limit + ties)
+local page = {}
+for i = 1, #candidates, 2 do
+    if #page == limit then
+        break
+    end
+    if tonumber(candidates[i + 1]) ~= tonumber(ARGV[3]) or candidates[i] < ARGV[4] then
+        table.insert(page, candidates[i])
+    end
+end
+return {total, page}
+"""
+
+PUBLISH_SCRIPT = """
+-- Собранные во временных ключах sorted set встают на место, только если версия не менялась
+if (redis.call("GET", KEYS[5]) or "0") ~= ARGV[1] then
+    redis.call("UNLINK", KEYS[3], KEYS[4])
+    return 0
+end
+for i = 1, 2 do
+    -- Старый набор освобождается в фоне: DEL большого sorted set заблокировал бы Redis
+    redis.call("UNLINK", KEYS[i])
+    if redis.call("EXISTS", KEYS[i + 2]) == 1 then
+        redis.call("RENAME", KEYS[i + 2], KEYS[i])
+        redis.call("EXPIRE", KEYS[i], ARGV[2])
+    end
+end
+redis.call("SET", KEYS[6], "1", "EX", ARGV[2])
+redis.call("SADD", KEYS[7], ARGV[3])
+return 1
+"""
+
+UPDATE_SCRIPT = """
+redis.call("INCR", KEYS[2])
+local member, score = ARGV[1], ARGV[2]
+local country, age_from, age_until = ARGV[3], tonumber(ARGV[4]), tonumber(ARGV[5])
+for _, segment in ipairs(redis.call("SMEMBERS", KEYS[1])) do
+    local base = "feed:segment:" .. segment
+    if redis.call("EXISTS", base .. ":built") == 0 then
+        redis.call("SREM", KEYS[1], segment)
+    else
+        local user_country, user_age = string.match(segment, "^(.*):(%d+)$")
+        user_age = tonumber(user_age)
+        local matches = (country == "" or country == user_country)
+            and (age_from == nil or age_from <= user_age)
+            and (age_until == nil or age_until >= user_age)
+        if matches then
+            redis.call("ZADD", base .. ":all", score, member)
+            if ARGV[6] == "1" then
+                redis.call("ZADD", base .. ":active", score, member)
+            else
+                redis.call("ZREM", base .. ":active", member)
+            end
+        else
+            redis.call("ZREM", base .. ":all", member)
+            redis.call("ZREM", base .. ":active", member)
+        end
+    end
+end
+return 1
+"""
+
+
+def segment_name(country: str, age: int) -> str:
+    return f"{country}:{age}"
+
+def segment_keys(segment: str) -> tuple:
+    base = f"feed:segment:{segment}"
+    return f"{base}:all", f"{base}:active", f"{base}:built"
+
+def build_lock_key(segment: str) -> str:
+    return f"feed:segment:{segment}:building"
+
+def score(created_at: datetime) -> int:
+    # Микросекунды с эпохи точно представимы в double, которым Redis хранит score
+    return (created_at - EPOCH) // timedelta(microseconds=1)
+
+
+class FeedIndex:
+    """
+    Индекс ленты в Redis. Сегмент - пара (страна, возраст) пользователя: все пользователи
+    сегмента видят одну и ту же ленту до флагов лайка и активации. Для сегмента хранятся
+    два sorted set с PromoCode.id по created_at: все подходящие по таргетингу промокоды
+    и только активные. Страница ленты - ZREVRANGE и один запрос в БД по первичному ключу.
+
+    Сегмент строится из БД при первом обращении и живёт FEED_INDEX_TTL секунд. Строит его
+    один запрос под блокировкой сегмента, остальные на это время идут в обычный путь.
+    create_promo и patch_promo обновляют все построенные сегменты одним скриптом,
+    который заодно увеличивает feed:version. Построение сегмента сохраняется, только
+    если версия не изменилась с начала чтения из БД, иначе запрос уходит в обычный путь.
+    Остальное расхождение, например потерянное после коммита обновление, чинит сверка.
+    """
+    def __init__(self, db: AsyncSession, redis: Optional[Redis]):
+        self.db = db
+        self.redis = redis
+
+    @property
+    def enabled(self) -> bool:
+        return settings.FEED_INDEX_ENABLED and self.redis is not None
+
+    async def page(
+        self, country: str, age: int, active: Optional[bool], offset: int, limit: int, cursor: tuple = None
+    ) -> Optional[tuple]:
+        """
+        Страница ленты в том же виде, что get_feed_promos, или None, если индекс
+        не может её отдать: фильтр active=false или сегмент не удалось построить
+        """
+        if not self.enabled or active is False:
+            return None
+        segment = segment_name(country, age)
+        all_key, active_key, built_key = segment_keys(segment)
+        key = active_key if active else all_key
+        args = (offset, limit, score(cursor[0]), str(cursor[1])) if cursor is not None else (offset, limit, "", "")
+
+        found = await self.redis.eval(PAGE_SCRIPT, 2, key, built_key, *args)
+        if found is None:
+            if not await self.build(country, age):
+                return None
+            found = await self.redis.eval(PAGE_SCRIPT, 2, key, built_key, *args)
+            if found is None:
+                return None
+        total, members = found
+        return await self._hydrate([UUID(member.decode()) for member in members], country, age, active), total
+
+    async def _hydrate(self, ids: list, country: str, age: int, active: Optional[bool]) -> list:
+        """
+        Строки страницы одним запросом по первичному ключу. Таргетинг проверяется ещё раз,
+        чтобы устаревшая запись индекса не показала промокод чужому сегменту.
+        """
+        if not ids:
+            return []
+        query = (
+            select(*USER_PROMO_COLUMNS, PromoCode.id, PromoCode.created_at)
+            .where(PromoCode.id.in_(ids), target_filter(country, age))
+            .order_by(PromoCode.created_at.desc(), PromoCode.id.desc())
+        )
+        if active:
+            query = query.where(PromoCode.active)
+        result = await self.db.execute(query)
+        return result.all()
+
+    async def build(self, country: str, age: int, expected: dict = None) -> bool:
+        """
+        Строит сегмент из БД. Возвращает False, если сегмент уже строит другой запрос
+        или промокоды менялись во время чтения. В expected, если передан, записывается
+        состояние сегмента по БД: id -> активность.
+
+        Строки читаются из БД потоком по BUILD_CHUNK и пачками пишутся во временные ключи,
+        поэтому ни один вызов Redis не несёт весь сегмент. Готовые наборы подменяют
+        старые одним коротким скриптом с проверкой версии.
+        """
+        segment = segment_name(country, age)
+        token = uuid4().hex
+        lock_key = build_lock_key(segment)
+        if not await self.redis.set(lock_key, token, nx=True, px=settings.FEED_INDEX_BUILD_LOCK_TTL):
+            return False
+        all_key, active_key, built_key = segment_keys(segment)
+        building_all, building_active = f"{all_key}:{token}", f"{active_key}:{token}"
+        try:
+            version = (await self.redis.get(VERSION_KEY) or b"0").decode()
+            result = await self.db.stream(
+                select(PromoCode.id, PromoCode.created_at, PromoCode.active)
+                .where(target_filter(country, age))
+                .execution_options(yield_per=BUILD_CHUNK)
+            )
+            async for rows in result.partitions():
+                if expected is not None:
+                    expected.update((str(row.id), bool(row.active)) for row in rows)
+                async with self.redis.pipeline(transaction=False) as pipe:
+                    pipe.zadd(building_all, {str(row.id): score(row.created_at) for row in rows})
+                    active = {str(row.id): score(row.created_at) for row in rows if row.active}
+                    if active:
+                        pipe.zadd(building_active, active)
+                    # Брошенная сборка не останется в Redis навсегда
+                    pipe.expire(building_all, settings.FEED_INDEX_TTL)
+                    pipe.expire(building_active, settings.FEED_INDEX_TTL)
+                    await pipe.execute()
+            await self.db.commit()
+            keys = (all_key, active_key, building_all, building_active, VERSION_KEY, built_key, REGISTRY_KEY)
+            built = await self.redis.eval(PUBLISH_SCRIPT, len(keys), *keys, version, settings.FEED_INDEX_TTL, segment)
+        finally:
+            await self.redis.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+        return bool(built)
+
+    async def update(self, promo) -> None:
+        """
+        Переносит изменение таргетинга, активности или новый промокод во все построенные сегменты.
+        Вызывается после коммита в БД.
+        """
+        if not self.enabled:
+            return
+        await self.redis.eval(
+            UPDATE_SCRIPT, 2, REGISTRY_KEY, VERSION_KEY,
+            str(promo.id),
+            score(promo.created_at),
+            promo.target_country or "",
+            "" if promo.target_age_from is None else promo.target_age_from,
+            "" if promo.target_age_until is None else promo.target_age_until,
+            "1" if promo.active else "0",
+        )
+
+    async def refresh(self, promo_id: UUID) -> None:
+        """
+        Перечитывает промокод из БД и обновляет сегменты
+        """
+        if not self.enabled:
+            return
+        result = await self.db.execute(
+            select(
+                PromoCode.id, PromoCode.created_at, PromoCode.active,
+                PromoCode.target_country, PromoCode.target_age_from, PromoCode.target_age_until,
+            ).where(PromoCode.promo_id == promo_id)
+        )
+        promo = result.one_or_none()
+        if promo is not None:
+            await self.update(promo)
+
+    async def reconcile(self) -> dict:
+        """
+        Перестраивает все живые сегменты из БД и возвращает число исправленных записей по сегментам
+        """
+        drift = {}
+        for segment in await self.redis.smembers(REGISTRY_KEY):
+            segment = segment.decode()
+            all_key, active_key, built_key = segment_keys(segment)
+            if not await self.redis.exists(built_key):
+                await self.redis.srem(REGISTRY_KEY, segment)
+                continue
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.zrange(all_key, 0, -1)
+                pipe.zrange(active_key, 0, -1)
+                indexed, indexed_active = await pipe.execute()
+            active_members = {member.decode() for member in indexed_active}
+            current = {member.decode(): member.decode() in active_members for member in indexed}
+
+            country, age = segment.rsplit(":", 1)
+            expected = {}
+            if await self.build(country, int(age), expected):
+                changed = current.keys() ^ expected.keys()
+                changed |= {member for member in current.keys() & expected.keys() if current[member] != expected[member]}
+                if changed:
+                    drift[segment] = len(changed)
+        return drift
@@ -0,0 +1,237 @@
+from typing import Optional
+from uuid import UUID
+from redis.asyncio import Redis
+from sqlalchemy import select, update, delete, func, bindparam
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from src.models.promocode import PromoCode
+from src.models.user import user_liked_promos
+
+DIRTY_KEY = "likes:dirty"
+INFLIGHT_KEY = "likes:inflight"
+SEED_CHUNK = 1000
+
+TOGGLE_SCRIPT = """
+if redis.call("EXISTS", KEYS[2]) == 0 then
+    return -1
+end
+local changed
+if ARGV[2] == "1" then
+    changed = redis.call("SADD", KEYS[1], ARGV[1])
+else
+    changed = redis.call("SREM", KEYS[1], ARGV[1])
+end
+if changed == 1 then
+    redis.call("HSET", KEYS[3], ARGV[1], ARGV[2])
+    redis.call("SADD", KEYS[4], ARGV[3])
+end
+return changed
+"""
+
+SEED_SCRIPT = """
+if redis.call("EXISTS", KEYS[2]) == 1 then
+    return 0
+end
+redis.call("DEL", KEYS[1])
+local chunk = tonumber(ARGV[1])
+for i = 2, #ARGV, chunk do
+    redis.call("SADD", KEYS[1], unpack(ARGV, i, math.min(i + chunk - 1, #ARGV)))
+end
+redis.call("SET", KEYS[2], "1")
+return 1
+"""
+
+LIKED_SCRIPT = """
+local liked = {}
+for i = 1, #KEYS, 2 do
+    if redis.call("EXISTS", KEYS[i + 1]) == 0 then
+        table.insert(liked, -1)
+    else
+        table.insert(liked, redis.call("SISMEMBER", KEYS[i], ARGV[1]))
+    end
+end
+return liked
+"""
+
+CLAIM_SCRIPT = """
+local claimed = {}
+for _, promo in ipairs(redis.call("SRANDMEMBER", KEYS[1], ARGV[1])) do
+    local pending = "likes:" .. promo .. ":pending"
+    local flushing = "likes:" .. promo .. ":flushing"
+    if redis.call("EXISTS", flushing) == 0 then
+        if redis.call("EXISTS", pending) == 1 then
+            redis.call("RENAME", pending, flushing)
+            redis.call("SADD", KEYS[2], promo)
+            table.insert(claimed, promo)
+        end
+        redis.call("SREM", KEYS[1], promo)
+    end
+end
+return claimed
+"""
+
+
+def users_key(promo_id) -> str:
+    return f"likes:{promo_id}:users"
+
+def seeded_key(promo_id) -> str:
+    return f"likes:{promo_id}:seeded"
+
+def pending_key(promo_id) -> str:
+    return f"likes:{promo_id}:pending"
+
+def flushing_key(promo_id) -> str:
+    return f"likes:{promo_id}:flushing"
+
+
+class LikeBuffer:
+    """
+    Лайки в режиме write-behind: множество лайкнувших промокод живёт в Redis, его размер
+    и есть счётчик. Каждое изменение записывает итоговое состояние пары (пользователь, промокод)
+    в хэш pending, а фоновый сбросчик переносит его в user_liked_promos и like_count.
+
+    Сброс идемпотентен: в БД пишется итоговое состояние (insert on conflict / delete),
+    а like_count пересчитывается по таблице. Перед записью pending атомарно переименовывается
+    в flushing и промокод попадает в likes:inflight; после коммита ключ удаляется. Если процесс
+    упал между этими шагами, следующий сброс сначала повторяет всё, что осталось в inflight.
+    """
+    def __init__(self, db: AsyncSession, redis: Redis):
+        self.db = db
+        self.redis = redis
+
+    async def like_promo(self, user_id: UUID, promo_id: UUID) -> Optional[bool]:
+        """
+        Возвращает None, если промокода нет, иначе признак того, что лайк добавлен
+        """
+        return await self._toggle(user_id, promo_id, "1")
+
+    async def unlike_promo(self, user_id: UUID, promo_id: UUID) -> Optional[bool]:
+        """
+        Возвращает None, если промокода нет, иначе признак того, что лайк снят
+        """
+        return await self._toggle(user_id, promo_id, "0")
+
+    async def get_liked_promo_ids(self, user_id: UUID, promo_ids: list) -> set:
+        """
+        Лайкнутые пользователем промокоды страницы. Для засеянных промокодов ответ берётся
+        из множеств в Redis, где лайк виден сразу, а не после сброса; остальные
+        ещё не менялись в Redis, и для них актуальна БД.
+        """
+        if not promo_ids:
+            return set()
+        keys = [key for promo_id in promo_ids for key in (users_key(promo_id), seeded_key(promo_id))]
+        flags = await self.redis.eval(LIKED_SCRIPT, len(keys), *keys, str(user_id))
+        liked = {promo_id for promo_id, flag in zip(promo_ids, flags) if flag == 1}
+        unseeded = [promo_id for promo_id, flag in zip(promo_ids, flags) if flag == -1]
+        if unseeded:
+            result = await self.db.execute(
+                select(user_liked_promos.c.promo_id).where(
+                    user_liked_promos.c.user_id == user_id,
+                    user_liked_promos.c.promo_id.in_(unseeded)
+                )
+            )
+            liked.update(result.scalars())
+        return liked
+
+    async def apply_like_count(self, promo: PromoCode) -> PromoCode:
+        """
+        Подставляет в прочитанный из БД промокод число лайков из засеянного множества.
+        Значение не помечается изменённым и не уйдёт в БД при коммите сессии.
+        """
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.exists(seeded_key(promo.promo_id))
+            pipe.scard(users_key(promo.promo_id))
+            seeded, like_count = await pipe.execute()
+        if seeded:
+            set_committed_value(promo, "like_count", like_count)
+        return promo
+
+    async def _toggle(self, user_id: UUID, promo_id: UUID, state: str) -> Optional[bool]:
+        keys = (users_key(promo_id), seeded_key(promo_id), pending_key(promo_id), DIRTY_KEY)
+        changed = await self.redis.eval(TOGGLE_SCRIPT, len(keys), *keys, str(user_id), state, str(promo_id))
+        if changed == -1:
+            if not await self._seed(promo_id):
+                return None
+            changed = await self.redis.eval(TOGGLE_SCRIPT, len(keys), *keys, str(user_id), state, str(promo_id))
+        return bool(changed)
+
+    async def _seed(self, promo_id: UUID) -> bool:
+        """
+        Загружает лайки промокода из БД в Redis при первом обращении. Пока промокод
+        не засеян, изменений по нему нет, поэтому БД в этот момент содержит актуальное состояние.
+        """
+        exists = await self.db.scalar(select(PromoCode.promo_id).where(PromoCode.promo_id == promo_id))
+        if exists is None:
+            return False
+        result = await self.db.execute(
+            select(user_liked_promos.c.user_id).where(user_liked_promos.c.promo_id == promo_id)
+        )
+        user_ids = [str(user_id) for user_id in result.scalars()]
+        await self.db.commit()
+        await self.redis.eval(SEED_SCRIPT, 2, users_key(promo_id), seeded_key(promo_id), SEED_CHUNK, *user_ids)
+        return True
+
+    async def flush(self, limit: int) -> int:
+        """
+        Дописывает в БД недосброшенные после сбоя пачки, затем забирает до limit промокодов
+        с изменениями и переносит их. Возвращает число промокодов из новой пачки.
+        Вызывающий держит блокировку сброса, чтобы пачки одного промокода не переставлялись.
+        """
+        inflight = [promo_id.decode() for promo_id in await self.redis.smembers(INFLIGHT_KEY)]
+        if inflight:
+            await self._apply(inflight)
+        claimed = [promo_id.decode() for promo_id in await self.redis.eval(CLAIM_SCRIPT, 2, DIRTY_KEY, INFLIGHT_KEY, limit)]
+        if claimed:
+            await self._apply(claimed)
+        return len(claimed)
+
+    async def _apply(self, promo_ids: list) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for promo_id in promo_ids:
+                pipe.hgetall(flushing_key(promo_id))
+            batches = await pipe.execute()
+
+        liked, unliked = [], []
+        for promo_id, batch in zip(promo_ids, batches):
+            for user_id, state in batch.items():
+                pair = {"user_id": UUID(user_id.decode()), "promo_id": UUID(promo_id)}
+                (liked if state == b"1" else unliked).append(pair)
+
+        if liked:
+            await self.db.execute(insert(user_liked_promos).on_conflict_do_nothing(), liked)
+        if unliked:
+            await self.db.execute(
+                delete(user_liked_promos).where(
+                    user_liked_promos.c.user_id == bindparam("user_id"),
+                    user_liked_promos.c.promo_id == bindparam("promo_id"),
+                ),
+                unliked,
+            )
+        like_count = (
+            select(func.count())
+            .where(user_liked_promos.c.promo_id == PromoCode.promo_id)
+            .scalar_subquery()
+        )
+        await self.db.execute(
+            update(PromoCode)
+            .where(PromoCode.promo_id.in_([UUID(promo_id) for promo_id in promo_ids]))
+            .values(like_count=like_count)
+        )
+        await self.db.commit()
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.delete(*(flushing_key(promo_id) for promo_id in promo_ids))
+            pipe.srem(INFLIGHT_KEY, *promo_ids)
+            await pipe.execute()
+
+    async def reset(self) -> int:
+        """
+        Удаляет засеянные множества лайков, чтобы при следующем обращении они загрузились из БД.
+        Вызывать только после полного сброса, иначе несброшенные изменения потеряются.
+        """
+        removed = 0
+        async for key in self.redis.scan_iter(match="likes:*:seeded"):
+            promo_id = key.decode().split(":")[1]
+            removed += await self.redis.delete(key, users_key(promo_id))
+        return removed
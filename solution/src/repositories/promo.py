@@ -1,15 +1,25 @@
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select, func, tuple_, insert, delete
 from uuid import UUID
-from src.models.promocode import PromoCode
-from src.models.user import user_activated_promos
+from redis.asyncio import Redis
+from src.models.promocode import PromoCode, PromoUniqueCode, PromoStatByCountry, PromoActivation
+from src.repositories.counting import PageCounter, BUSINESS_PROMOS
+from src.models.user import User
+from src.utils.promo_helpers import BUSINESS_PROMO_COLUMNS
 
 class PromoRepository:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, redis: Redis = None):
         self.db = db
+        self.redis = redis
 
     async def create_promo(self, promo: PromoCode) -> PromoCode:
         self.db.add(promo)
+        if promo.mode == "UNIQUE" and promo.promo_unique:
+            await self.db.flush()
+            await self.db.execute(
+                insert(PromoUniqueCode),
+                [{"promo_id": promo.promo_id, "code": code} for code in promo.promo_unique]
+            )
         await self.db.commit()
         await self.db.refresh(promo)
         return promo
@@ -20,27 +30,31 @@ class PromoRepository:
         filter_condition=None,
         offset: int = 0,
         limit: int = 10,
-        sort_by: str = None
-    ):
-        query = select(PromoCode).filter(PromoCode.company_id == company_id)
+        sort_by: str = None,
+        cursor: tuple = None
+    ) -> (list, int):
+        """
+        Страница промокодов компании строками с колонками PromoReadOnly, без типизированного таргетинга
+        """
+        query = select(*BUSINESS_PROMO_COLUMNS, PromoCode.id, PromoCode.created_at).filter(PromoCode.company_id == company_id)
         if filter_condition is not None:
             query = query.filter(filter_condition)
         if sort_by == "active_from":
-            query = query.order_by(PromoCode.active_from.desc())
+            order_by = [PromoCode.active_from.desc()]
         elif sort_by == "active_until":
-            query = query.order_by(PromoCode.active_until.desc())
+            order_by = [PromoCode.active_until.desc()]
         else:
-            query = query.order_by(PromoCode.created_at.desc())
-        query = query.offset(offset).limit(limit)
-        result = await self.db.execute(query)
-        return result.scalars().all()
-
-    async def count_promos_by_company(self, company_id, filter_condition=None) -> int:
-        query = select(func.count(PromoCode.id)).filter(PromoCode.company_id == company_id)
-        if filter_condition is not None:
-            query = query.filter(filter_condition)
-        result = await self.db.execute(query)
-        return result.scalar() or 0
+            order_by = [PromoCode.created_at.desc(), PromoCode.id.desc()]
+        keyset = tuple_(PromoCode.created_at, PromoCode.id) < cursor if cursor is not None else None
+        return await PageCounter(self.db, self.redis, BUSINESS_PROMOS).fetch(
+            query,
+            order_by=order_by,
+            count_column=PromoCode.id,
+            offset=offset,
+            limit=limit,
+            keyset=keyset,
+            scalars=False,
+        )
 
     async def get_promo_by_id(self, promo_id: UUID) -> PromoCode:
         query = select(PromoCode).where(PromoCode.promo_id == promo_id)
@@ -53,22 +67,82 @@ class PromoRepository:
         await self.db.refresh(promo)
         return promo
 
-    async def get_promo_stat(self, promo_id: UUID) -> dict:
-        total_query = select(func.count()).select_from(user_activated_promos).where(
-            user_activated_promos.c.promo_id == promo_id
+    async def get_promo_stat(self, promo_id: UUID) -> list:
+        """
+        Готовая статистика активаций по странам, отсортированная по коду страны
+        """
+        activations_count = func.sum(PromoStatByCountry.activations_count)
+        query = (
+            select(PromoStatByCountry.country, activations_count)
+            .where(PromoStatByCountry.promo_id == promo_id)
+            .group_by(PromoStatByCountry.country)
+            .having(activations_count > 0)
+            .order_by(PromoStatByCountry.country)
+        )
+        result = await self.db.execute(query)
+        return result.all()
+
+    def _raw_promo_stat_query(self, promo_id: UUID = None):
+        country = func.lower(User.other["country"].as_string())
+        query = (
+            select(
+                PromoActivation.promo_id,
+                country.label("country"),
+                func.count().label("activations_count")
+            )
+            .join(User, User.id == PromoActivation.user_id)
+            .where(country.is_not(None))
+            .group_by(PromoActivation.promo_id, country)
         )
-        total_result = await self.db.execute(total_query)
-        total_count = total_result.scalar() or 0
+        if promo_id is not None:
+            query = query.where(PromoActivation.promo_id == promo_id)
+        return query
 
-        country_query = (
+    async def diff_promo_stats(self, promo_id: UUID = None) -> list:
+        """
+        Сравнивает готовую статистику с пересчётом по сырым активациям.
+        Возвращает строки (promo_id, country, сохранено, по активациям), где значения расходятся.
+        """
+        raw = self._raw_promo_stat_query(promo_id).subquery()
+        activations_count = func.sum(PromoStatByCountry.activations_count)
+        stored = (
+            select(PromoStatByCountry.promo_id, PromoStatByCountry.country, activations_count.label("activations_count"))
+            .group_by(PromoStatByCountry.promo_id, PromoStatByCountry.country)
+            .having(activations_count > 0)
+        )
+        if promo_id is not None:
+            stored = stored.where(PromoStatByCountry.promo_id == promo_id)
+        stored = stored.subquery()
+        query = (
             select(
-                func.jsonb_extract_path_text(PromoCode.target, 'country').label("country"),
-                func.count().label("cnt")
+                func.coalesce(stored.c.promo_id, raw.c.promo_id),
+                func.coalesce(stored.c.country, raw.c.country),
+                func.coalesce(stored.c.activations_count, 0),
+                func.coalesce(raw.c.activations_count, 0),
             )
-            .select_from(user_activated_promos)
-            .group_by(func.jsonb_extract_path_text(PromoCode.target, 'country'))
-            .where(user_activated_promos.c.promo_id == promo_id)
+            .select_from(stored.join(
+                raw,
+                (stored.c.promo_id == raw.c.promo_id) & (stored.c.country == raw.c.country),
+                full=True
+            ))
+            .where(func.coalesce(stored.c.activations_count, 0) != func.coalesce(raw.c.activations_count, 0))
         )
-        country_result = await self.db.execute(country_query)
-        rows = country_result.all()
-        return {"total": total_count, "country_stats": rows}
+        result = await self.db.execute(query)
+        return result.all()
+
+    async def rebuild_promo_stats(self, promo_id: UUID = None) -> int:
+        """
+        Пересчитывает статистику по странам из сырых активаций в одной транзакции,
+        собирая счётчик каждой страны в нулевой shard
+        """
+        query = delete(PromoStatByCountry)
+        if promo_id is not None:
+            query = query.where(PromoStatByCountry.promo_id == promo_id)
+        await self.db.execute(query)
+        result = await self.db.execute(
+            insert(PromoStatByCountry).from_select(
+                ["promo_id", "country", "activations_count"], self._raw_promo_stat_query(promo_id)
+            )
+        )
+        await self.db.commit()
+        return result.rowcount
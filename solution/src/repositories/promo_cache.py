@@ -0,0 +1,121 @@
+from datetime import date
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Optional
+from uuid import UUID
+import orjson
+from redis.asyncio import Redis
+from src.backend.config import settings
+from src.utils.promo_helpers import USER_PROMO_FIELDS, BUSINESS_PROMO_FIELDS, ACTIVE_FIELDS
+
+COUNTER_FIELDS = ("like_count", "used_count", "comment_count")
+DOCUMENT_FIELDS = tuple(
+    name for name in dict.fromkeys(USER_PROMO_FIELDS + BUSINESS_PROMO_FIELDS + ACTIVE_FIELDS)
+    if name not in COUNTER_FIELDS
+)
+# Меняется вместе с составом документа, чтобы после деплоя не читать записи старого формата
+DOCUMENT_FORMAT = 1
+
+FILL_COUNTERS_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    redis.call("HSET", KEYS[1], unpack(ARGV, 2))
+    redis.call("EXPIRE", KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+BUMP_COUNTER_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 1 then
+    return redis.call("HINCRBY", KEYS[1], ARGV[1], ARGV[2])
+end
+return nil
+"""
+
+
+class PromoCache:
+    """
+    Read-through кэш документа промокода для GET по ID.
+    Неизменяемая часть лежит под ключом с версией промокода: patch увеличивает версию,
+    и старый документ просто истекает по TTL. Счётчики лайков, активаций и комментариев
+    хранятся отдельным хэшем и меняются через HINCRBY, не трогая документ. Хэш живёт
+    PROMO_COUNTERS_TTL секунд, этим ограничено расхождение, если инкремент пришёлся
+    между чтением из БД и заполнением кэша. Без Redis все чтения идут в БД.
+    """
+    def __init__(self, redis: Optional[Redis]):
+        self.redis = redis
+
+    @staticmethod
+    def version_key(promo_id: UUID) -> str:
+        return f"promo:{promo_id}:version"
+
+    @staticmethod
+    def counters_key(promo_id: UUID) -> str:
+        return f"promo:{promo_id}:counters"
+
+    @staticmethod
+    def document_key(promo_id: UUID, version: int) -> str:
+        return f"promo:{promo_id}:doc:{DOCUMENT_FORMAT}:{version}"
+
+    async def get(self, promo_id: UUID, loader: Callable[[UUID], Awaitable]):
+        """
+        Промокод из кэша или из loader с заполнением кэша. Из кэша возвращается
+        объект с теми же атрибутами, что читают promo_for_user и promo_read_only.
+        """
+        if self.redis is None:
+            return await loader(promo_id)
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.get(self.version_key(promo_id))
+            pipe.hgetall(self.counters_key(promo_id))
+            version, counters = await pipe.execute()
+        version = int(version or 0)
+
+        if counters:
+            document = await self.redis.get(self.document_key(promo_id, version))
+            if document is not None:
+                return self._load(document, counters)
+
+        promo = await loader(promo_id)
+        if promo is not None:
+            await self._fill(promo, version)
+        return promo
+
+    async def invalidate(self, promo_id: UUID) -> None:
+        """
+        Сбрасывает документ и счётчики после изменения промокода
+        """
+        if self.redis is None:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.incr(self.version_key(promo_id))
+            pipe.delete(self.counters_key(promo_id))
+            await pipe.execute()
+
+    async def bump(self, promo_id: UUID, field: str, delta: int) -> None:
+        """
+        Сдвигает закэшированный счётчик; если хэша нет, следующее чтение возьмёт значение из БД
+        """
+        if self.redis is None:
+            return
+        await self.redis.eval(BUMP_COUNTER_SCRIPT, 1, self.counters_key(promo_id), field, delta)
+
+    async def _fill(self, promo, version: int) -> None:
+        document = orjson.dumps({name: getattr(promo, name) for name in DOCUMENT_FIELDS}, default=str)
+        counters = [item for name in COUNTER_FIELDS for item in (name, getattr(promo, name) or 0)]
+        # Версия документа и хэш счётчиков читаются до запроса в БД: если patch успел
+        # увеличить версию, документ ляжет под устаревший ключ и не будет прочитан
+        await self.redis.set(self.document_key(promo.promo_id, version), document, ex=settings.PROMO_CACHE_TTL)
+        await self.redis.eval(
+            FILL_COUNTERS_SCRIPT, 1, self.counters_key(promo.promo_id), settings.PROMO_COUNTERS_TTL, *counters
+        )
+
+    @staticmethod
+    def _load(document: bytes, counters: dict) -> SimpleNamespace:
+        data = orjson.loads(document)
+        data["promo_id"] = UUID(data["promo_id"])
+        data["company_id"] = UUID(data["company_id"])
+        for name in ("active_from", "active_until"):
+            if data[name] is not None:
+                data[name] = date.fromisoformat(data[name])
+        for name in COUNTER_FIELDS:
+            data[name] = max(int(counters.get(name.encode(), 0)), 0)
+        return SimpleNamespace(**data)
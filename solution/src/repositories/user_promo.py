@@ -1,13 +1,19 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, or_, and_, Integer, cast
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import func, and_, tuple_, literal, update, delete
+from sqlalchemy.dialects.postgresql import insert
+from typing import Optional
 from uuid import UUID
-from src.models.promocode import PromoCode
+from redis.asyncio import Redis
+from src.models.promocode import PromoCode, PromoUniqueCode, PromoStatByCountry, PromoActivation, STAT_SHARDS
+from src.repositories.counting import PageCounter, FEED, HISTORY
+from src.models.user import user_activated_promos, user_liked_promos
+from src.utils.promo_helpers import USER_PROMO_COLUMNS, normalize_categories, target_filter
 
 class PromoRepository:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, redis: Redis = None):
         self.db = db
+        self.redis = redis
 
     async def get_feed_promos(
         self,
@@ -15,48 +21,40 @@ class PromoRepository:
         user_country: str,
         user_age: int,
         active: bool = None,
-        category: str = None,
+        category: list = None,
         offset: int = 0,
         limit: int = 10,
+        cursor: tuple = None,
+        match_all: bool = False,
     ) -> (list, int):
-        query = select(PromoCode)
+        """
+        Страница ленты строками с колонками PromoForUser, без массива promo_unique и таргетинга.
+        По категориям отбираются промокоды хотя бы с одной из них (&&) или, с match_all, со всеми (@>);
+        оба оператора идут по GIN-индексу target_categories и сравнивают категории целиком.
+        """
+        query = select(*USER_PROMO_COLUMNS, PromoCode.id, PromoCode.created_at)
         if active is not None:
             query = query.filter(PromoCode.active == active)
 
-        country_filter = or_(
-            func.jsonb_extract_path_text(cast(PromoCode.target, JSONB), 'country').is_(None),
-            func.lower(func.jsonb_extract_path_text(cast(PromoCode.target, JSONB), 'country')) == user_country
-        )
-        query = query.filter(country_filter)
-
-        age_filter = and_(
-            or_(
-                func.jsonb_extract_path_text(cast(PromoCode.target, JSONB), 'age_from').is_(None),
-                func.cast(func.jsonb_extract_path_text(cast(PromoCode.target, JSONB), 'age_from'), Integer) <= user_age
-            ),
-            or_(
-                func.jsonb_extract_path_text(cast(PromoCode.target, JSONB), 'age_until').is_(None),
-                func.cast(func.jsonb_extract_path_text(cast(PromoCode.target, JSONB), 'age_until'), Integer) >= user_age
-            )
-        )
-        query = query.filter(age_filter)
-
-        if category:
-            category = category.lower()
-            category_filter = and_(
-                func.jsonb_extract_path_text(cast(PromoCode.target, JSONB), 'categories').isnot(None),
-                func.jsonb_extract_path_text(cast(PromoCode.target, JSONB), 'categories').notin_([""]),
-                func.lower(func.jsonb_extract_path_text(cast(PromoCode.target, JSONB), 'categories')).contains(category)
-            )
-            query = query.filter(category_filter)
+        query = query.filter(target_filter(user_country, user_age))
 
-        count_query = query.with_only_columns(func.count(PromoCode.id)).order_by(None)
-        count_result = await self.db.execute(count_query)
-        total = count_result.scalar() or 0
+        categories = normalize_categories(category)
+        if categories:
+            if match_all:
+                query = query.filter(PromoCode.target_categories.contains(categories))
+            else:
+                query = query.filter(PromoCode.target_categories.overlap(categories))
 
-        query = query.order_by(PromoCode.created_at.desc()).offset(offset).limit(limit)
-        result = await self.db.execute(query)
-        promos = result.scalars().all()
+        keyset = tuple_(PromoCode.created_at, PromoCode.id) < cursor if cursor is not None else None
+        promos, total = await PageCounter(self.db, self.redis, FEED).fetch(
+            query,
+            order_by=[PromoCode.created_at.desc(), PromoCode.id.desc()],
+            count_column=PromoCode.id,
+            offset=offset,
+            limit=limit,
+            keyset=keyset,
+            scalars=False,
+        )
 
         return promos, total
 
@@ -71,6 +69,225 @@ class PromoRepository:
         await self.db.refresh(promo)
         return promo
 
-    async def like_promo(self, promo: PromoCode) -> None:
-        self.db.add(promo)
+    async def like_promo(self, user_id: UUID, promo_id: UUID) -> Optional[bool]:
+        """
+        Ставит лайк и увеличивает like_count одним запросом, повторный лайк ничего не меняет.
+        Возвращает None, если промокода нет, иначе признак того, что лайк добавлен.
+        """
+        promo = select(PromoCode.promo_id).where(PromoCode.promo_id == promo_id).cte("promo")
+        inserted = (
+            insert(user_liked_promos)
+            .from_select(
+                ["user_id", "promo_id"],
+                select(literal(user_id, user_liked_promos.c.user_id.type), promo.c.promo_id)
+            )
+            .on_conflict_do_nothing()
+            .returning(user_liked_promos.c.promo_id)
+            .cte("inserted")
+        )
+        counted = (
+            update(PromoCode)
+            .where(PromoCode.promo_id.in_(select(inserted.c.promo_id)))
+            .values(like_count=PromoCode.like_count + 1)
+            .returning(PromoCode.promo_id)
+            .cte("counted")
+        )
+        changed = select(func.count()).select_from(counted).scalar_subquery()
+        result = await self.db.execute(select(func.count(), changed).select_from(promo).add_cte(inserted, counted))
         await self.db.commit()
+        found, changed = result.one()
+        return bool(changed) if found else None
+
+    async def unlike_promo(self, user_id: UUID, promo_id: UUID) -> Optional[bool]:
+        """
+        Снимает лайк и уменьшает like_count одним запросом.
+        Возвращает None, если промокода нет, иначе признак того, что лайк снят.
+        """
+        promo = select(PromoCode.promo_id).where(PromoCode.promo_id == promo_id).cte("promo")
+        deleted = (
+            delete(user_liked_promos)
+            .where(user_liked_promos.c.user_id == user_id, user_liked_promos.c.promo_id == promo_id)
+            .returning(user_liked_promos.c.promo_id)
+            .cte("deleted")
+        )
+        counted = (
+            update(PromoCode)
+            .where(PromoCode.promo_id.in_(select(deleted.c.promo_id)))
+            .values(like_count=func.greatest(PromoCode.like_count - 1, 0))
+            .returning(PromoCode.promo_id)
+            .cte("counted")
+        )
+        changed = select(func.count()).select_from(counted).scalar_subquery()
+        result = await self.db.execute(select(func.count(), changed).select_from(promo).add_cte(deleted, counted))
+        await self.db.commit()
+        found, changed = result.one()
+        return bool(changed) if found else None
+
+    async def activate_promo(self, user_id: UUID, user_country: str, promo: PromoCode) -> Optional[tuple]:
+        """
+        Выдаёт пользователю промокод. Возвращает пару (код, active после выдачи)
+        или None, если промокоды закончились. active становится False, когда выдача
+        исчерпала промокод: по нему вызывающий обновляет индекс ленты.
+        """
+        issued = await self.issue_promo(user_id, user_country, promo)
+        await self.db.commit()
+        if issued is None:
+            return None
+        if promo.mode == "UNIQUE":
+            return issued.code, not await self._deactivate_exhausted(promo.promo_id)
+        return issued.code, issued.active
+
+    async def issue_promo(self, user_id: UUID, user_country: str, promo: PromoCode):
+        """
+        Выдача промокода одним запросом в текущей транзакции, без коммита. Возвращает строку
+        с кодом и, для COMMON, новым значением active, или None, если промокоды закончились.
+        UNIQUE-код забирается через FOR UPDATE SKIP LOCKED, а строка promo_codes не меняется,
+        поэтому параллельные активации не ждут друг друга; счётчик COMMON увеличивается
+        только пока не достигнут max_count. В том же запросе активация пишется в журнал
+        и в статистику по стране пользователя.
+        """
+        if promo.mode == "UNIQUE":
+            free_code = (
+                select(PromoUniqueCode.id)
+                .where(PromoUniqueCode.promo_id == promo.promo_id, PromoUniqueCode.activated_by.is_(None))
+                .order_by(PromoUniqueCode.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            issued = (
+                update(PromoUniqueCode)
+                .where(PromoUniqueCode.id == free_code)
+                .values(activated_by=user_id, activated_at=func.now())
+                .returning(PromoUniqueCode.promo_id, PromoUniqueCode.code, (PromoUniqueCode.id % STAT_SHARDS).label("shard"))
+                .cte("issued")
+            )
+        else:
+            # Строка COMMON-промокода и так заблокирована обновлением счётчика, шард статистики один
+            issued = (
+                update(PromoCode)
+                .where(PromoCode.promo_id == promo.promo_id, PromoCode.common_used_count < PromoCode.max_count)
+                .values(
+                    common_used_count=PromoCode.common_used_count + 1,
+                    active=and_(PromoCode.active, PromoCode.common_used_count + 1 < PromoCode.max_count)
+                )
+                .returning(
+                    PromoCode.promo_id, PromoCode.promo_common.label("code"), PromoCode.active, literal(0).label("shard")
+                )
+                .cte("issued")
+            )
+
+        activation = insert(user_activated_promos).from_select(
+            ["user_id", "promo_id", "activation_date", "activation_count"],
+            select(literal(user_id, user_activated_promos.c.user_id.type), issued.c.promo_id, func.now(), literal(1))
+        )
+        activated = (
+            activation.on_conflict_do_update(
+                index_elements=[user_activated_promos.c.user_id, user_activated_promos.c.promo_id],
+                set_={
+                    "activation_count": user_activated_promos.c.activation_count + 1,
+                    "activation_date": activation.excluded.activation_date,
+                }
+            )
+            .returning(user_activated_promos.c.promo_id)
+            .cte("activated")
+        )
+        stat = insert(PromoStatByCountry).from_select(
+            ["promo_id", "country", "shard", "activations_count"],
+            select(issued.c.promo_id, literal(user_country.lower(), PromoStatByCountry.country.type), issued.c.shard, literal(1))
+        )
+        counted_stat = (
+            stat.on_conflict_do_update(
+                index_elements=[PromoStatByCountry.promo_id, PromoStatByCountry.country, PromoStatByCountry.shard],
+                set_={"activations_count": PromoStatByCountry.activations_count + 1}
+            )
+            .returning(PromoStatByCountry.promo_id)
+            .cte("counted_stat")
+        )
+        logged = (
+            insert(PromoActivation)
+            .from_select(
+                ["user_id", "promo_id", "activated_at"],
+                select(literal(user_id, PromoActivation.user_id.type), issued.c.promo_id, func.now())
+            )
+            .returning(PromoActivation.id)
+            .cte("logged")
+        )
+        columns = [issued.c.code] if promo.mode == "UNIQUE" else [issued.c.code, issued.c.active]
+        result = await self.db.execute(select(*columns).add_cte(issued, activated, counted_stat, logged))
+        return result.first()
+
+    async def _deactivate_exhausted(self, promo_id: UUID) -> bool:
+        """
+        Снимает active у UNIQUE-промокода без свободных кодов; возвращает True, если снял.
+        Запрос идёт после коммита выдачи: из параллельных активаций последний код видит
+        как выданный по крайней мере та, что закоммитилась последней. Пока свободные коды
+        есть, условие не выполняется и строка promo_codes не блокируется.
+        """
+        free_code = select(PromoUniqueCode.id).where(
+            PromoUniqueCode.promo_id == promo_id, PromoUniqueCode.activated_by.is_(None)
+        )
+        result = await self.db.execute(
+            update(PromoCode)
+            .where(PromoCode.promo_id == promo_id, PromoCode.active, ~free_code.exists())
+            .values(active=False)
+            .returning(PromoCode.promo_id)
+        )
+        await self.db.commit()
+        return result.first() is not None
+
+    async def get_activation_history(
+        self, user_id: UUID, offset: int = 0, limit: int = 10, cursor: tuple = None
+    ) -> (list, int):
+        """
+        Страница журнала активаций пользователя одним запросом: колонки PromoForUser, время активации
+        и лайк пользователя. Флаг активации для строк журнала всегда истинный.
+        """
+        query = (
+            select(
+                *USER_PROMO_COLUMNS,
+                PromoActivation.activated_at,
+                PromoActivation.id.label("id"),
+                user_liked_promos.c.user_id.is_not(None).label("is_liked"),
+            )
+            .select_from(PromoActivation)
+            .join(PromoCode, PromoCode.promo_id == PromoActivation.promo_id)
+            .outerjoin(
+                user_liked_promos,
+                and_(
+                    user_liked_promos.c.promo_id == PromoActivation.promo_id,
+                    user_liked_promos.c.user_id == user_id
+                )
+            )
+            .where(PromoActivation.user_id == user_id)
+        )
+        keyset = tuple_(PromoActivation.activated_at, PromoActivation.id) < cursor if cursor is not None else None
+        return await PageCounter(self.db, self.redis, HISTORY).fetch(
+            query,
+            order_by=[PromoActivation.activated_at.desc(), PromoActivation.id.desc()],
+            count_column=PromoActivation.id,
+            offset=offset,
+            limit=limit,
+            keyset=keyset,
+            scalars=False,
+        )
+
+    async def get_activated_promo_ids(self, user_id: UUID, promo_ids: list) -> set:
+        if not promo_ids:
+            return set()
+        query = select(user_activated_promos.c.promo_id).where(
+            user_activated_promos.c.user_id == user_id,
+            user_activated_promos.c.promo_id.in_(promo_ids)
+        )
+        result = await self.db.execute(query)
+        return set(result.scalars().all())
+
+    async def get_liked_promo_ids(self, user_id: UUID, promo_ids: list) -> set:
+        if not promo_ids:
+            return set()
+        query = select(user_liked_promos.c.promo_id).where(
+            user_liked_promos.c.user_id == user_id,
+            user_liked_promos.c.promo_id.in_(promo_ids)
+        )
+        result = await self.db.execute(query)
+        return set(result.scalars().all())
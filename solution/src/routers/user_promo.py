@@ -1,52 +1,86 @@
-from fastapi import APIRouter, Depends, Query, HTTPException, Path, status
+from fastapi import APIRouter, Depends, Query, HTTPException, Path, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
+from redis.asyncio import Redis
+from typing import List, Literal, Optional
 from uuid import UUID
 from starlette.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from src.backend.db import get_db
+from src.dependencies.database import get_redis
+from src.dependencies.antifraud import get_antifraud
+from src.backend.antifraud import AntifraudClient
 from src.services.user_promo import PromoService
 from src.schemas.user_promo import PromoForUser, Comment, CommentText, Author
 from src.utils.get_company_or_user import get_current_user
+from src.utils.cursor import pagination_headers
 
 router = APIRouter(prefix="/api/user")
 
 @router.get("/feed", response_model=List[PromoForUser])
 async def get_promos_feed(
+    request: Request,
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
-    category: Optional[str] = Query(None),
+    category: Optional[List[str]] = Query(None),
+    category_match: Literal["any", "all"] = Query("any"),
     active: Optional[bool] = Query(None),
+    cursor: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
     current_user = Depends(get_current_user)
 ):
-    service = PromoService(db)
+    service = PromoService(db, redis)
     try:
-        promos, total = await service.get_feed(current_user, limit, offset, category, active)
+        promos, total, next_cursor = await service.get_feed(
+            current_user, limit, offset, category, active, cursor, category_match
+        )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    return JSONResponse(content=promos, headers={"X-Total-Count": str(total)})
+    return ORJSONResponse(content=promos, headers=pagination_headers(request, total, next_cursor))
+
+@router.get("/promo/history", response_model=List[PromoForUser])
+async def get_promo_history(
+    request: Request,
+    limit: int = Query(10, ge=0),
+    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+    current_user = Depends(get_current_user)
+):
+    service = PromoService(db, redis)
+    try:
+        promos, total, next_cursor = await service.get_history(current_user, limit, offset, cursor)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ORJSONResponse(content=promos, headers=pagination_headers(request, total, next_cursor))
 
 @router.get("/promo/{id}", response_model=PromoForUser)
 async def get_promo_by_id(
     id: UUID = Path(...),
     db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
     current_user = Depends(get_current_user),
 ):
-    service = PromoService(db)
+    service = PromoService(db, redis)
     try:
         promo = await service.get_promo(id, current_user)
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
-    promo = {k: (str(v) if isinstance(v, UUID) else v) for k, v in promo.items()}
-    return JSONResponse(content=promo)
+    return ORJSONResponse(content=promo)
 
 @router.post("/promo/{id}/like", status_code=200)
 async def like_promo(
     id: UUID = Path(...),
     db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
     current_user = Depends(get_current_user),
 ):
-    service = PromoService(db)
+    service = PromoService(db, redis)
     try:
         await service.like_promo(id, current_user)
     except Exception as e:
@@ -57,23 +91,42 @@ async def like_promo(
 async def unlike_promo(
     id: UUID = Path(...),
     db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
     current_user = Depends(get_current_user),
 ):
-    service = PromoService(db)
+    service = PromoService(db, redis)
     try:
         await service.unlike_promo(id, current_user)
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
     return JSONResponse(content={"status": "ok"})
 
+@router.post("/promo/{id}/activate", status_code=200)
+async def activate_promo(
+    id: UUID = Path(...),
+    db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
+    antifraud: AntifraudClient = Depends(get_antifraud),
+    current_user = Depends(get_current_user),
+):
+    service = PromoService(db, redis, antifraud)
+    try:
+        code = await service.activate_promo(id, current_user)
+    except HTTPException as e:
+        if e.status_code == status.HTTP_403_FORBIDDEN:
+            return JSONResponse(status_code=e.status_code, content={"status": "error", "message": e.detail})
+        raise
+    return JSONResponse(content={"promo": code})
+
 @router.post("/promo/{id}/comments", status_code=status.HTTP_201_CREATED)
 async def create_comment(
     comment: CommentText,
     id: UUID = Path(...),
     db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
     current_user = Depends(get_current_user),
 ):
-    service = PromoService(db)
+    service = PromoService(db, redis)
     try:
         response = await service.create_comment(id, current_user, comment.text)
     except Exception as e:
@@ -82,27 +135,33 @@ async def create_comment(
 
 @router.get("/promo/{id}/comments")
 async def get_comments(
+    request: Request,
     id: UUID = Path(...),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None),
     db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
     current_user = Depends(get_current_user),
 ):
-    service = PromoService(db)
+    service = PromoService(db, redis)
     try:
-        comments, total = await service.get_comments(id, offset, limit)
+        comments, total, next_cursor = await service.get_comments(id, offset, limit, cursor)
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=404, detail=str(e))
-    return JSONResponse(content=comments, headers={"X-Total-Count": str(total)})
+    return ORJSONResponse(content=comments, headers=pagination_headers(request, total, next_cursor))
 
 @router.get("/promo/{id}/comments/{comment_id}")
 async def get_comment_by_id(
     id: UUID = Path(...),
     comment_id: UUID = Path(...),
     db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
     current_user = Depends(get_current_user),
 ):
-    service = PromoService(db)
+    service = PromoService(db, redis)
     try:
         comment = await service.get_comment(id, comment_id, current_user)
     except Exception as e:
@@ -115,9 +174,10 @@ async def edit_comment(
     id: UUID = Path(...),
     comment_id: UUID = Path(...),
     db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
     current_user = Depends(get_current_user),
 ):
-    service = PromoService(db)
+    service = PromoService(db, redis)
     try:
         updated = await service.edit_comment(id, comment_id, current_user, comment_text.text)
     except Exception as e:
@@ -129,9 +189,10 @@ async def delete_comment(
     id: UUID = Path(...),
     comment_id: UUID = Path(...),
     db: AsyncSession = Depends(get_db),
+    redis: Redis = Depends(get_redis),
     current_user = Depends(get_current_user),
 ):
-    service = PromoService(db)
+    service = PromoService(db, redis)
     try:
         await service.delete_comment(id, comment_id, current_user)
     except Exception as e:
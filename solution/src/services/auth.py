@@ -1,5 +1,4 @@
 from jose import jwt
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Dict
 from sqlalchemy.exc import IntegrityError
@@ -8,18 +7,18 @@ from redis.asyncio import Redis
 from sqlalchemy.ext.asyncio import AsyncSession
 from src.backend.config import settings
 from src.repositories.company import CompanyRepository
+from src.backend.hashing import password_hasher
+from src.backend.principal_cache import publish_invalidation
 from fastapi import HTTPException
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
-
 class AuthService:
     def __init__(self, db: AsyncSession, redis: Redis):
         self.db = db
         self.redis = redis
         self.company_repo = CompanyRepository(db)
 
-    def hash_password(self, password: str) -> str:
-        return pwd_context.hash(password)
+    async def hash_password(self, password: str) -> str:
+        return await password_hasher.hash(password)
 
     def create_access_token(self, data: Dict, expires_delta: timedelta) -> str:
         to_encode = data.copy()
@@ -37,9 +36,10 @@ class AuthService:
     async def invalidate_existing_token(self, company_id: int):
         key = f"company:{company_id}:token"
         await self.redis.delete(key)
+        await publish_invalidation(self.redis, f"company:{company_id}")
 
     async def sign_up(self, company_data) -> dict:
-        hashed_password = self.hash_password(company_data.password)
+        hashed_password = await self.hash_password(company_data.password)
         company_dict = company_data.dict()
         company_dict["password"] = hashed_password
 
@@ -58,7 +58,7 @@ class AuthService:
 
     async def sign_in(self, email: str, password: str) -> dict:
         company = await self.company_repo.get_by_email(email)
-        if not company or not pwd_context.verify(password, company.password):
+        if not company or not await password_hasher.verify(password, company.password):
             raise HTTPException(status_code=401, detail="Invalid email or password")
 
         await self.invalidate_existing_token(company.id)
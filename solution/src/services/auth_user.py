@@ -1,14 +1,14 @@
 import uuid
 from datetime import datetime, timedelta
 from jose import jwt
-from passlib.context import CryptContext
 from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from redis.asyncio import Redis
 from src.backend.config import settings
 from src.repositories.user import UserRepository
+from src.backend.hashing import password_hasher
+from src.backend.principal_cache import publish_invalidation
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
 TOKEN_TTL = 7200
 
 
@@ -17,11 +17,11 @@ class AuthService:
         self.user_repo = UserRepository(db)
         self.redis = redis
 
-    def hash_password(self, password: str) -> str:
-        return pwd_context.hash(password)
+    async def hash_password(self, password: str) -> str:
+        return await password_hasher.hash(password)
 
-    def verify_password(self, plain_password: str, hashed_password: str) -> bool:
-        return pwd_context.verify(plain_password, hashed_password)
+    async def verify_password(self, plain_password: str, hashed_password: str) -> bool:
+        return await password_hasher.verify(plain_password, hashed_password)
 
     def create_access_token(self, data: dict, expires_delta: timedelta) -> str:
         to_encode = data.copy()
@@ -39,13 +39,14 @@ class AuthService:
     async def invalidate_existing_token(self, user_id: uuid.UUID):
         key = f"user:{user_id}:token"
         await self.redis.delete(key)
+        await publish_invalidation(self.redis, f"user:{user_id}")
 
     async def register_user(self, user_data) -> dict:
         existing_user = await self.user_repo.get_by_email(user_data.email)
         if existing_user:
             raise HTTPException(status_code=409, detail="Email already registered")
 
-        hashed_password = self.hash_password(user_data.password)
+        hashed_password = await self.hash_password(user_data.password)
         user_dict = user_data.dict()
         user_dict["password"] = hashed_password
 
@@ -60,8 +61,9 @@ class AuthService:
 
     async def sign_in(self, email: str, password: str) -> dict:
         user_db = await self.user_repo.get_by_email(email)
-        if not user_db or not self.verify_password(password, user_db.password):
+        if not user_db or not await self.verify_password(password, user_db.password):
             raise HTTPException(status_code=401, detail="Invalid credentials")
+        await self.invalidate_existing_token(user_db.id)
         access_token = self.create_access_token({"user_id": user_db.id}, timedelta(seconds=TOKEN_TTL))
         await self.save_token_to_redis(user_db.id, access_token)
         return {"token": access_token}
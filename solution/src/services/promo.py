@@ -2,17 +2,24 @@ from datetime import datetime
 from typing import Optional
 from uuid import uuid4, UUID
 from fastapi import HTTPException
-from pydantic import TypeAdapter
+from sqlalchemy import or_
 from sqlalchemy.ext.asyncio import AsyncSession
+from redis.asyncio import Redis
 from src.repositories.promo import PromoRepository
+from src.repositories.counting import invalidate_counts, FEED, BUSINESS_PROMOS
+from src.repositories.promo_cache import PromoCache
+from src.repositories.feed_index import FeedIndex
 from src.models.promocode import PromoCode
-from src.schemas.promo import PromoCreate, PromoPatch, PromoReadOnly, PromoStat, CountryStat
-from src.utils.promo_helpers import calculate_active
-from src.utils.serializer import to_dict, uuid_to_str
+from src.schemas.promo import PromoCreate, PromoPatch, PromoStat, CountryStat
+from src.utils.promo_helpers import calculate_active, target_columns, promo_read_only
+from src.utils.cursor import decode_cursor, next_cursor
 
 class PromoService:
-    def __init__(self, db: AsyncSession):
-        self.repo = PromoRepository(db)
+    def __init__(self, db: AsyncSession, redis: Redis = None):
+        self.redis = redis
+        self.repo = PromoRepository(db, redis)
+        self.promo_cache = PromoCache(redis)
+        self.feed_index = FeedIndex(db, redis)
 
     async def create_promo(self, promo_data: PromoCreate, company) -> dict:
         active_from = promo_data.active_from
@@ -24,6 +31,7 @@ class PromoService:
         promo_codes = promo_data.promo_unique if promo_data.mode == "UNIQUE" else None
         image_url = str(promo_data.image_url) if promo_data.image_url else None
         unique_count = len(promo_codes) if promo_codes else 0
+        target = promo_data.target.dict()
 
         promo_instance = PromoCode(
             company_id=company.id,
@@ -33,14 +41,15 @@ class PromoService:
             promo_unique=promo_codes,
             limit=promo_data.max_count,
             max_count=promo_data.max_count,
-            target=promo_data.target.dict(),
+            target=target,
+            **target_columns(target),
             description=promo_data.description,
             image_url=image_url,
             active_from=active_from,
             active_until=active_until,
             active=True,
             like_count=0,
-            used_count=0,
+            common_used_count=0,
             created_at=datetime.utcnow(),
             promo_id=uuid4(),
             comment_count=0,
@@ -51,50 +60,44 @@ class PromoService:
             promo_instance.active = False
 
         promo = await self.repo.create_promo(promo_instance)
+        await invalidate_counts(self.redis, FEED, BUSINESS_PROMOS)
+        await self.feed_index.update(promo)
         return {"id": str(promo.promo_id)}
 
-    async def get_promos(self, company, limit: int, offset: int, sort_by: Optional[str], country: Optional[list]) -> (list, int):
+    async def get_promos(
+        self, company, limit: int, offset: int, sort_by: Optional[str], country: Optional[list], cursor: Optional[str] = None
+    ) -> (list, int, Optional[str]):
+        if cursor and sort_by in ("active_from", "active_until"):
+            raise HTTPException(status_code=400, detail="cursor can't be combined with sort_by")
         filter_condition = None
         if country:
             lower_country = [c.lower() for c in country]
-            from sqlalchemy import or_, func, cast
-            from sqlalchemy.dialects.postgresql import JSONB
             filter_condition = or_(
-                func.jsonb_extract_path_text(cast(PromoCode.target, JSONB), 'country').is_(None),
-                func.lower(func.jsonb_extract_path_text(cast(PromoCode.target, JSONB), 'country')).in_(lower_country)
+                PromoCode.target_country.is_(None),
+                PromoCode.target_country.in_(lower_country)
             )
 
-        promos = await self.repo.get_promos_by_company(company.id, filter_condition, offset, limit, sort_by)
-        total = await self.repo.count_promos_by_company(company.id, filter_condition)
-        result = []
-        for promo in promos:
-            promo_dict = to_dict(promo)
-            target = promo_dict.get("target", {})
-            if isinstance(target, dict):
-                promo_dict["target"] = {k: v for k, v in target.items() if v is not None}
-            if not promo_dict["target"]:
-                promo_dict["target"] = {}
-            promo_dict.update({
-                "active_from": promo.active_from.strftime("%Y-%m-%d") if promo.active_from else None,
-                "active_until": promo.active_until.strftime("%Y-%m-%d") if promo.active_until else None,
-                "active": calculate_active(promo),
-            })
-            promo_ro = PromoReadOnly(**promo_dict).dict(exclude_unset=True)
-            result.append(promo_ro)
-        result = [{k: uuid_to_str(v) for k, v in promo.items() if v is not None} for promo in result]
-        return result, total
-
-    async def get_promo_by_id(self, promo_id: UUID, company_id: UUID) -> PromoReadOnly:
-        promo = await self.repo.get_promo_by_id(promo_id)
+        promos, total = await self.repo.get_promos_by_company(
+            company.id, filter_condition, offset, limit, sort_by, decode_cursor(cursor) if cursor else None
+        )
+        result = [promo_read_only(promo, drop_none=True) for promo in promos]
+        cursor = next_cursor(promos, limit) if sort_by not in ("active_from", "active_until") else None
+        return result, total, cursor
+
+    async def _get_own_promo(self, promo_id: UUID, company_id: UUID) -> PromoCode:
+        promo = await self.promo_cache.get(promo_id, self.repo.get_promo_by_id)
 
         if not promo:
             raise HTTPException(status_code=404, detail="Промокод не найден")
         if promo.company_id != company_id:
             raise HTTPException(status_code=403, detail="Промокод не принадлежит этой компании.")
+        return promo
 
-        return TypeAdapter(PromoReadOnly).validate_python(promo)
+    async def get_promo_by_id(self, promo_id: UUID, company_id: UUID) -> dict:
+        promo = await self._get_own_promo(promo_id, company_id)
+        return promo_read_only(promo)
 
-    async def patch_promo(self, promo_id: UUID, promo_data: PromoPatch, company_id: UUID) -> PromoReadOnly:
+    async def patch_promo(self, promo_id: UUID, promo_data: PromoPatch, company_id: UUID) -> dict:
         promo = await self.repo.get_promo_by_id(promo_id)
         if not promo or promo.company_id != company_id:
             raise HTTPException(status_code=404, detail="Промокод не найден")
@@ -120,26 +123,23 @@ class PromoService:
 
         for field, value in update_data.items():
             setattr(promo, field, value)
+        if 'target' in update_data:
+            for field, value in target_columns(update_data['target']).items():
+                setattr(promo, field, value)
 
-        promo.active = calculate_active(
-            active_from=promo.active_from,
-            active_until=promo.active_until
-        )
+        promo.active = calculate_active(promo)
 
         updated_promo = await self.repo.update_promo(promo)
-        return TypeAdapter(PromoReadOnly).validate_python(updated_promo)
+        await invalidate_counts(self.redis, FEED, BUSINESS_PROMOS)
+        await self.promo_cache.invalidate(promo_id)
+        await self.feed_index.update(updated_promo)
+        return promo_read_only(updated_promo)
 
     async def get_promo_stat(self, promo_id: UUID, company_id: UUID) -> PromoStat:
-        promo = await self.get_promo_by_id(promo_id, company_id)
-        stat_data = await self.repo.get_promo_stat(promo.id)
+        promo = await self._get_own_promo(promo_id, company_id)
+        rows = await self.repo.get_promo_stat(promo.promo_id)
 
         return PromoStat(
-            activations_count=stat_data.total,
-            countries=[
-                CountryStat(country=country, activations_count=count)
-                for country, count in sorted(
-                    ((c, cnt) for c, cnt in stat_data.country_stats if c),
-                    key=lambda x: x[0].lower()
-                )
-            ]
+            activations_count=sum(count for _, count in rows),
+            countries=[CountryStat(country=country, activations_count=count) for country, count in rows]
         )
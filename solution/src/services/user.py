@@ -1,13 +1,13 @@
 from fastapi import HTTPException
-from passlib.context import CryptContext
 from src.repositories.user_profile import UserRepository
 from src.schemas.user_profile import User as UserSchema, UserPatch
-
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+from src.backend.hashing import password_hasher
+from src.backend.principal_cache import publish_invalidation
 
 class UserService:
-    def __init__(self, db):
+    def __init__(self, db, redis):
         self.repo = UserRepository(db)
+        self.redis = redis
 
     async def get_profile(self, current_user) -> UserSchema:
         user = await self.repo.get_by_id(current_user.id)
@@ -25,8 +25,8 @@ class UserService:
 
         return UserSchema(**user_data)
 
-    def hash_password(self, password: str) -> str:
-        return pwd_context.hash(password)
+    async def hash_password(self, password: str) -> str:
+        return await password_hasher.hash(password)
 
     async def update_profile(self, current_user, user_patch: UserPatch) -> UserSchema:
         user = await self.repo.get_by_id(current_user.id)
@@ -37,12 +37,13 @@ class UserService:
         if user_patch.avatar_url:
             update_data["avatar_url"] = str(user_patch.avatar_url)
         if "password" in update_data:
-            update_data["password"] = self.hash_password(update_data["password"])
+            update_data["password"] = await self.hash_password(update_data["password"])
 
         for key, value in update_data.items():
             setattr(user, key, value)
 
         updated_user = await self.repo.update(user)
+        await publish_invalidation(self.redis, f"user:{updated_user.id}")
 
         user_data = {
             "name": updated_user.name,
@@ -1,126 +1,133 @@
 from uuid import UUID
 from fastapi import HTTPException
-from select import select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from redis.asyncio import Redis
 from datetime import datetime, timezone
 from src.repositories.user_promo import PromoRepository
 from src.repositories.comment import CommentRepository
-from src.models.promocode import PromoCode
+from src.repositories.counting import invalidate_counts, COMMENTS, HISTORY
+from src.repositories.promo_cache import PromoCache
+from src.repositories.like_buffer import LikeBuffer
+from src.repositories.feed_index import FeedIndex
+from src.backend.config import settings
 from src.models.comment import Commentary
-from src.schemas.user_promo import PromoForUser, Comment, Author
-from src.utils.promo_helpers import calculate_active
-from src.utils.serializer import to_dict, uuid_to_str
-from src.models.user import user_liked_promos
+from src.schemas.user_promo import Comment, Author
+from src.utils.promo_helpers import calculate_active, matches_target, normalize_categories, promo_for_user
+from src.backend.antifraud import AntifraudClient
+from src.utils.cursor import decode_cursor, next_cursor
 
 class PromoService:
-    def __init__(self, db: AsyncSession):
+    def __init__(self, db: AsyncSession, redis: Redis = None, antifraud: AntifraudClient = None):
         self.db = db
-        self.promo_repo = PromoRepository(db)
-        self.comment_repo = CommentRepository(db)
-
-    async def get_feed(self, current_user, limit: int, offset: int, category: str = None, active: bool = None):
+        self.redis = redis
+        self.antifraud = antifraud
+        self.promo_repo = PromoRepository(db, redis)
+        self.comment_repo = CommentRepository(db, redis)
+        self.promo_cache = PromoCache(redis)
+        self.feed_index = FeedIndex(db, redis)
+        self.write_behind = settings.LIKES_WRITE_BEHIND and redis is not None
+        self.likes = LikeBuffer(db, redis) if self.write_behind else self.promo_repo
+
+    async def get_feed(
+        self, current_user, limit: int, offset: int, category=None, active: bool = None, cursor: str = None,
+        category_match: str = "any",
+    ):
         user_country = (current_user.other.get("country") or "").lower()
         user_age = current_user.other.get("age") or 0
 
-        promos, total = await self.promo_repo.get_feed_promos(
-            company_id=None,
-            user_country=user_country,
-            user_age=user_age,
-            active=active,
-            category=category,
-            offset=offset,
-            limit=limit,
-        )
-
-        response = []
-        for promo in promos:
-            promo_dict = to_dict(promo)
-            is_activated = await self._is_activated_by_user(current_user.id, promo.promo_id)
-            is_liked = await self._is_liked_by_user(current_user.id, promo.promo_id)
-
-            promo_dict.update({
-                "active": calculate_active(promo),
-                "is_activated_by_user": is_activated,
-                "is_liked_by_user": is_liked,
-            })
+        cursor = decode_cursor(cursor) if cursor else None
+
+        category = normalize_categories(category)
+        page = None
+        if not category:
+            page = await self.feed_index.page(user_country, user_age, active, offset, limit, cursor)
+        if page is not None:
+            promos, total = page
+        else:
+            promos, total = await self.promo_repo.get_feed_promos(
+                company_id=None,
+                user_country=user_country,
+                user_age=user_age,
+                active=active,
+                category=category,
+                offset=offset,
+                limit=limit,
+                cursor=cursor,
+                match_all=category_match == "all",
+            )
 
-            promo_data = PromoForUser(**promo_dict).dict(exclude_unset=True)
-            promo_data = {k: uuid_to_str(v) for k, v in promo_data.items() if v is not None}
-            response.append(promo_data)
+        activated, liked = await self._get_user_flags(current_user.id, [promo.promo_id for promo in promos])
 
-        return response, total
+        response = [
+            promo_for_user(promo, promo.promo_id in activated, promo.promo_id in liked) for promo in promos
+        ]
+        return response, total, next_cursor(promos, limit)
 
-    async def get_promo(self, promo_id: UUID, current_user) -> PromoForUser:
-        promo = await self.promo_repo.get_by_id(promo_id)
+    async def get_promo(self, promo_id: UUID, current_user) -> dict:
+        promo = await self.promo_cache.get(promo_id, self._load_promo)
         if not promo:
             raise HTTPException(status_code=404, detail="Промокод не найден")
-        promo_dict = to_dict(promo)
-        is_activated = await self._is_activated_by_user(current_user.id, promo.promo_id)
-        is_liked = await self._is_liked_by_user(current_user.id, promo.promo_id)
-        promo_dict.update({
-            "active": calculate_active(promo),
-            "is_activated_by_user": is_activated,
-            "is_liked_by_user": is_liked,
-        })
-        promo_data = PromoForUser(**promo_dict).dict(exclude_unset=True)
-        return promo_data
+        activated, liked = await self._get_user_flags(current_user.id, [promo.promo_id])
+        return promo_for_user(promo, promo.promo_id in activated, promo.promo_id in liked)
 
     async def like_promo(self, promo_id: UUID, current_user) -> None:
-        promo = await self.promo_repo.get_by_id(promo_id)
-        if not promo:
+        liked = await self.likes.like_promo(current_user.id, promo_id)
+        if liked is None:
             raise HTTPException(status_code=404, detail="Промокод не найден")
-        from src.models.user import user_liked_promos
-        query = (
-            select(user_liked_promos)
-            .where(
-                user_liked_promos.c.user_id == current_user.id,
-                user_liked_promos.c.promo_id == promo_id
-            )
-        )
-        result = await self.db.execute(query)
-        if result.scalar():
-            return
-
-        insert_stmt = user_liked_promos.insert().values(user_id=current_user.id, promo_id=promo_id)
-        await self.db.execute(insert_stmt)
-        promo.like_count += 1
-        await self.promo_repo.like_promo(promo)
+        if liked:
+            await self.promo_cache.bump(promo_id, "like_count", 1)
 
     async def unlike_promo(self, promo_id: UUID, current_user) -> None:
+        unliked = await self.likes.unlike_promo(current_user.id, promo_id)
+        if unliked is None:
+            raise HTTPException(status_code=404, detail="Промокод не найден")
+        if unliked:
+            await self.promo_cache.bump(promo_id, "like_count", -1)
+
+    async def activate_promo(self, promo_id: UUID, current_user) -> str:
         promo = await self.promo_repo.get_by_id(promo_id)
         if not promo:
             raise HTTPException(status_code=404, detail="Промокод не найден")
-        query = (
-            select(user_liked_promos)
-            .where(
-                user_liked_promos.c.user_id == current_user.id,
-                user_liked_promos.c.promo_id == promo_id
-            )
+        if not calculate_active(promo) or not matches_target(promo, current_user):
+            raise HTTPException(status_code=403, detail="Вы не можете использовать этот промокод.")
+        if not await self.antifraud.validate(self.redis, current_user.email, promo_id):
+            raise HTTPException(status_code=403, detail="Вы не можете использовать этот промокод.")
+        issued = await self.promo_repo.activate_promo(current_user.id, current_user.other.get("country"), promo)
+        if issued is None:
+            raise HTTPException(status_code=403, detail="Вы не можете использовать этот промокод.")
+        code, active = issued
+        await invalidate_counts(self.redis, HISTORY)
+        await self.promo_cache.bump(promo_id, "used_count", 1)
+        if not active:
+            # Активация исчерпала промокод: по строке из БД, а не по прочитанному до
+            # выдачи used_count, который при параллельных активациях уже устарел
+            await self.feed_index.refresh(promo_id)
+        return code
+
+    async def get_history(self, current_user, limit: int, offset: int, cursor: str = None):
+        rows, total = await self.promo_repo.get_activation_history(
+            current_user.id, offset, limit, decode_cursor(cursor, id_type=int) if cursor else None
         )
-        result = await self.db.execute(query)
-        if not result.scalar():
-            return
-        delete_stmt = user_liked_promos.delete().where(
-            user_liked_promos.c.user_id == current_user.id,
-            user_liked_promos.c.promo_id == promo_id
-        )
-        await self.db.execute(delete_stmt)
-        promo.like_count = max(0, promo.like_count - 1)
-        await self.promo_repo.like_promo(promo)
+        if self.write_behind:
+            liked = await self.likes.get_liked_promo_ids(current_user.id, list({row.promo_id for row in rows}))
+            response = [promo_for_user(row, True, row.promo_id in liked) for row in rows]
+        else:
+            response = [promo_for_user(row, True, row.is_liked) for row in rows]
+        return response, total, next_cursor(rows, limit, created_at_attr="activated_at")
 
     async def create_comment(self, promo_id: UUID, current_user, text: str) -> dict:
-        promo = await self.promo_repo.get_by_id(promo_id)
-        if not promo:
-            raise HTTPException(status_code=404, detail="Промокод не найден")
         new_comment = Commentary(
             text=text,
             date=datetime.now(timezone.utc),
             author_id=current_user.id,
-            promo_id=promo.promo_id
+            promo_id=promo_id
         )
         comment = await self.comment_repo.create_comment(new_comment)
-        promo.comment_count += 1
-        await self.promo_repo.update(promo)
+        if not comment:
+            raise HTTPException(status_code=404, detail="Промокод не найден")
+        await invalidate_counts(self.redis, COMMENTS)
+        await self.promo_cache.bump(promo_id, "comment_count", 1)
         author = {
             "name": current_user.name,
             "surname": current_user.surname,
@@ -134,42 +141,18 @@ class PromoService:
         }
         return response
 
-    async def get_comments(self, promo_id: UUID, offset: int, limit: int):
-        comments, total = await self.comment_repo.get_comments(promo_id, offset, limit)
-        formatted = []
-        for comment in comments:
-            author = {
-                "name": comment.author.name,
-                "surname": comment.author.surname,
-                "avatar_url": str(comment.author.avatar_url) if comment.author.avatar_url else None,
-            }
-            if author.get("avatar_url") is None:
-                author.pop("avatar_url", None)
-            formatted.append({
-                "id": str(comment.id),
-                "text": comment.text,
-                "date": comment.date.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
-                "author": author
-            })
-        return formatted, total
+    async def get_comments(self, promo_id: UUID, offset: int, limit: int, cursor: str = None):
+        comments, total = await self.comment_repo.get_comments(
+            promo_id, offset, limit, decode_cursor(cursor) if cursor else None
+        )
+        formatted = [self._format_comment(comment) for comment in comments]
+        return formatted, total, next_cursor(comments, limit, created_at_attr="date")
 
     async def get_comment(self, promo_id: UUID, comment_id: UUID, current_user) -> dict:
         comment = await self.comment_repo.get_by_id(comment_id, promo_id)
         if not comment:
             raise HTTPException(status_code=404, detail="Такого комментария не существует.")
-        author = {
-            "name": comment.author.name,
-            "surname": comment.author.surname,
-            "avatar_url": str(comment.author.avatar_url) if comment.author.avatar_url else None,
-        }
-        if author.get("avatar_url") is None:
-            author.pop("avatar_url", None)
-        return {
-            "id": str(comment.id),
-            "text": comment.text,
-            "date": comment.date.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
-            "author": author
-        }
+        return self._format_comment(comment)
 
     async def edit_comment(self, promo_id: UUID, comment_id: UUID, current_user, new_text: str) -> dict:
         comment = await self.comment_repo.get_by_id(comment_id, promo_id)
@@ -177,21 +160,10 @@ class PromoService:
             raise HTTPException(status_code=404, detail="Такого комментария не существует.")
         if comment.author_id != current_user.id:
             raise HTTPException(status_code=403, detail="Комментарий не принадлежит пользователю.")
-        comment.text = new_text
-        updated = await self.comment_repo.update(comment)
-        author = {
-            "name": updated.author.name,
-            "surname": updated.author.surname,
-            "avatar_url": str(updated.author.avatar_url) if updated.author.avatar_url else None,
-        }
-        if author.get("avatar_url") is None:
-            author.pop("avatar_url", None)
-        return {
-            "id": str(updated.id),
-            "text": updated.text,
-            "date": updated.date.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
-            "author": author
-        }
+        updated = await self.comment_repo.update_text(comment_id, new_text)
+        if not updated:
+            raise HTTPException(status_code=404, detail="Такого комментария не существует.")
+        return self._format_comment(updated)
 
     async def delete_comment(self, promo_id: UUID, comment_id: UUID, current_user) -> None:
         comment = await self.comment_repo.get_by_id(comment_id, promo_id)
@@ -199,19 +171,39 @@ class PromoService:
             raise HTTPException(status_code=404, detail="Такого комментария не существует.")
         if comment.author_id != current_user.id:
             raise HTTPException(status_code=403, detail="Комментарий не принадлежит пользователю.")
-        await self.comment_repo.delete(comment)
+        if await self.comment_repo.delete(comment):
+            await invalidate_counts(self.redis, COMMENTS)
+            await self.promo_cache.bump(promo_id, "comment_count", -1)
+
+    @staticmethod
+    def _format_comment(comment) -> dict:
+        """
+        Ответ Comment из строки COMMENT_COLUMNS; avatar_url опускается, если его нет
+        """
+        author = {"name": comment.author_name, "surname": comment.author_surname}
+        if comment.author_avatar_url:
+            author["avatar_url"] = str(comment.author_avatar_url)
+        return {
+            "id": str(comment.id),
+            "text": comment.text,
+            "date": comment.date.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "author": author
+        }
+
+    async def _load_promo(self, promo_id: UUID):
+        """
+        Промокод для кэша; в режиме write-behind like_count берётся из Redis, где лежат несброшенные лайки
+        """
         promo = await self.promo_repo.get_by_id(promo_id)
-        promo.comment_count = max(0, promo.comment_count - 1)
-        await self.promo_repo.update(promo)
-
-    async def _is_activated_by_user(self, user_id: UUID, promo_id: UUID) -> bool:
-        from src.models.user import user_activated_promos, User
-        query = select(User).where(User.id == user_id).join(user_activated_promos).filter(PromoCode.promo_id == promo_id)
-        result = await self.db.execute(query)
-        return result.scalar() is not None
-
-    async def _is_liked_by_user(self, user_id: UUID, promo_id: UUID) -> bool:
-        from src.models.user import user_liked_promos, User
-        query = select(User).where(User.id == user_id).join(user_liked_promos).filter(PromoCode.promo_id == promo_id)
-        result = await self.db.execute(query)
-        return result.scalar() is not None
+        if promo is not None and self.write_behind:
+            await self.likes.apply_like_count(promo)
+        return promo
+
+    async def _get_user_flags(self, user_id: UUID, promo_ids: list) -> (set, set):
+        """
+        Возвращает множества активированных и лайкнутых промокодов пользователя
+        для всей страницы за два запроса, независимо от её размера
+        """
+        activated = await self.promo_repo.get_activated_promo_ids(user_id, promo_ids)
+        liked = await self.likes.get_liked_promo_ids(user_id, promo_ids)
+        return activated, liked
@@ -0,0 +1,45 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+from fastapi import HTTPException, Request
+
+
+def encode_cursor(created_at: datetime, row_id) -> str:
+    """
+    Упаковывает позицию последней строки страницы в непрозрачный курсор
+    """
+    raw = json.dumps([created_at.isoformat(), str(row_id)])
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str, id_type=UUID) -> (datetime, UUID):
+    """
+    Распаковывает курсор в пару (created_at, id), с которой продолжается выдача
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), id_type(row_id)
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from e
+
+def next_cursor(rows: list, limit: int, created_at_attr: str = "created_at") -> Optional[str]:
+    """
+    Курсор следующей страницы или None, если страница неполная
+    """
+    if not rows or len(rows) < limit:
+        return None
+    last = rows[-1]
+    return encode_cursor(getattr(last, created_at_attr), last.id)
+
+def pagination_headers(request: Request, total: int, cursor: Optional[str]) -> dict:
+    """
+    X-Total-Count и ссылка на следующую страницу по курсору
+    """
+    headers = {"X-Total-Count": str(total)}
+    if cursor:
+        next_url = request.url.remove_query_params("offset").include_query_params(cursor=cursor)
+        headers["Link"] = f'<{next_url}>; rel="next"'
+        headers["X-Next-Cursor"] = cursor
+    return headers
@@ -1,5 +1,6 @@
 from fastapi.security import APIKeyHeader
 from src.backend.config import settings
+from src.backend.principal_cache import principal_cache
 from src.models.user import User
 from fastapi import HTTPException, Request, Depends, Security
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -8,6 +9,7 @@ from src.backend.db import get_db
 from src.models.company import Company
 from sqlalchemy.future import select
 from redis.asyncio import Redis
+from src.utils.serializer import to_dict
 import uuid
 
 auth_header = APIKeyHeader(name="Authorization", auto_error=False)
@@ -48,6 +50,9 @@ async def get_current_user(
     redis: Redis = Depends(get_redis)
 ) -> User:
     token = extract_token(authorization)
+    cached = principal_cache.get("user", token)
+    if cached is not None:
+        return cached
     payload = decode_jwt_token(token)
 
     user_id_str = payload.get("user_id")
@@ -59,13 +64,14 @@ async def get_current_user(
         raise HTTPException(status_code=401, detail="Invalid user_id format")
 
     key = f"user:{user_id}:token"
+    generation = principal_cache.generation("user", user_id)
     await verify_token_in_redis(redis, key, token)
 
     result = await db.execute(select(User).where(User.id == user_id))
     user = result.scalar()
     if not user:
         raise HTTPException(status_code=401, detail="User not found")
-    return user
+    return principal_cache.set("user", token, user.id, to_dict(user), payload.get("exp"), generation)
 
 async def get_current_company(
     authorization: str = Security(auth_header),
@@ -73,6 +79,9 @@ async def get_current_company(
     redis: Redis = Depends(get_redis)
 ) -> Company:
     token = extract_token(authorization)
+    cached = principal_cache.get("company", token)
+    if cached is not None:
+        return cached
     payload = decode_jwt_token(token)
 
     company_id = payload.get("company_id")
@@ -80,10 +89,11 @@ async def get_current_company(
         raise HTTPException(status_code=401, detail="Invalid token: 'company_id' not found")
 
     key = f"company:{company_id}:token"
+    generation = principal_cache.generation("company", company_id)
     await verify_token_in_redis(redis, key, token)
 
     result = await db.execute(select(Company).where(Company.id == company_id))
     company = result.scalar()
     if not company:
         raise HTTPException(status_code=401, detail="Company not found")
-    return company
+    return principal_cache.set("company", token, company.id, to_dict(company), payload.get("exp"), generation)
@@ -1,4 +1,6 @@
 from datetime import datetime, date
+from operator import attrgetter
+from sqlalchemy import and_, or_
 from src.models.promocode import PromoCode
 
 def calculate_active(promo: PromoCode) -> bool:
@@ -10,8 +12,118 @@ def calculate_active(promo: PromoCode) -> bool:
     active_until = promo.active_until or date.max
     if current_date < active_from or current_date > active_until:
         return False
-    if promo.mode == "COMMON" and promo.used_count >= promo.max_count:
+    # У ещё не сохранённого промокода used_count не вычислен
+    used_count = promo.used_count or 0
+    if promo.mode == "COMMON" and used_count >= promo.max_count:
         return False
-    if promo.mode == "UNIQUE" and not promo.promo_unique:
+    if promo.mode == "UNIQUE" and used_count >= promo.unique_count:
         return False
     return True
+
+def matches_target(promo: PromoCode, user) -> bool:
+    """
+    Проверяет, подходит ли пользователь под таргетинг промокода
+    """
+    other = user.other or {}
+    country = other.get("country")
+    age = other.get("age")
+    if promo.target_country and (not country or country.lower() != promo.target_country):
+        return False
+    if promo.target_age_from is not None and (age is None or age < promo.target_age_from):
+        return False
+    if promo.target_age_until is not None and (age is None or age > promo.target_age_until):
+        return False
+    return True
+
+def target_filter(user_country: str, user_age: int):
+    """
+    Условие таргетинга ленты для пользователя: то же, что matches_target, но в SQL
+    """
+    return and_(
+        or_(PromoCode.target_country.is_(None), PromoCode.target_country == user_country),
+        or_(PromoCode.target_age_from.is_(None), PromoCode.target_age_from <= user_age),
+        or_(PromoCode.target_age_until.is_(None), PromoCode.target_age_until >= user_age),
+    )
+
+def normalize_categories(categories) -> list:
+    """
+    Категории фильтра ленты в том виде, в каком они лежат в target_categories:
+    в нижнем регистре, без пустых и повторов. Принимает строку или список.
+    """
+    if not categories:
+        return []
+    if isinstance(categories, str):
+        categories = [categories]
+    return list(dict.fromkeys(category.strip().lower() for category in categories if category and category.strip()))
+
+def target_columns(target: dict) -> dict:
+    """
+    Раскладывает таргетинг по типизированным колонкам, по которым фильтруется лента
+    """
+    target = target or {}
+    country = target.get("country")
+    categories = target.get("categories")
+    return {
+        "target_country": country.lower() if country else None,
+        "target_age_from": target.get("age_from"),
+        "target_age_until": target.get("age_until"),
+        "target_categories": [category.lower() for category in categories] if categories else None,
+    }
+
+USER_PROMO_FIELDS = ("promo_id", "company_id", "company_name", "description", "image_url", "like_count", "comment_count")
+BUSINESS_PROMO_FIELDS = (
+    "description", "image_url", "target", "max_count", "active_from", "active_until", "mode",
+    "promo_common", "promo_unique", "promo_id", "company_id", "company_name", "like_count", "used_count",
+)
+TARGET_FIELDS = ("age_from", "age_until", "country", "categories")
+ACTIVE_FIELDS = ("mode", "active_from", "active_until", "used_count", "max_count", "unique_count")
+
+def promo_columns(*field_groups) -> list:
+    """
+    Колонки PromoCode для проекции списка: только то, что нужно схеме ответа и calculate_active
+    """
+    names = dict.fromkeys(name for fields in field_groups for name in fields)
+    return [getattr(PromoCode, name) for name in names]
+
+USER_PROMO_COLUMNS = promo_columns(USER_PROMO_FIELDS, ACTIVE_FIELDS)
+BUSINESS_PROMO_COLUMNS = promo_columns(BUSINESS_PROMO_FIELDS, ACTIVE_FIELDS)
+
+_user_promo_getter = attrgetter(*USER_PROMO_FIELDS)
+_business_promo_getter = attrgetter(*BUSINESS_PROMO_FIELDS)
+
+def promo_for_user(promo, is_activated: bool, is_liked: bool) -> dict:
+    """
+    Ответ PromoForUser прямо из строки БД: данные уже проверены при записи, поэтому
+    pydantic-модель здесь не строится
+    """
+    data = dict(zip(USER_PROMO_FIELDS, _user_promo_getter(promo)))
+    data["promo_id"] = str(data["promo_id"])
+    data["company_id"] = str(data["company_id"])
+    if data["image_url"] is None:
+        del data["image_url"]
+    data["active"] = calculate_active(promo)
+    data["is_activated_by_user"] = is_activated
+    data["is_liked_by_user"] = is_liked
+    return data
+
+def promo_read_only(promo, drop_none: bool = False) -> dict:
+    """
+    Ответ PromoReadOnly прямо из строки БД. В списках None-поля (и в таргете тоже) опускаются,
+    в ответе по ID таргет содержит все поля
+    """
+    data = dict(zip(BUSINESS_PROMO_FIELDS, _business_promo_getter(promo)))
+    target = data["target"] or {}
+    if drop_none:
+        data["target"] = {key: value for key, value in target.items() if value is not None}
+    else:
+        data["target"] = {key: target.get(key) for key in TARGET_FIELDS}
+    data["promo_id"] = str(data["promo_id"])
+    data["company_id"] = str(data["company_id"])
+    if data["active_from"] is not None:
+        data["active_from"] = data["active_from"].isoformat()
+    if data["active_until"] is not None:
+        data["active_until"] = data["active_until"].isoformat()
+    data["active"] = calculate_active(promo)
+    if drop_none:
+        data = {key: value for key, value in data.items() if value is not None}
+    return data
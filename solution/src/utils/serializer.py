@@ -1,11 +1,22 @@
+from functools import lru_cache
+from operator import attrgetter
 from sqlalchemy.orm import class_mapper
 from uuid import UUID
 
+@lru_cache(maxsize=None)
+def model_columns(cls) -> (tuple, attrgetter):
+    """
+    Имена колонок модели и функция, которая достаёт их значения одним вызовом
+    """
+    names = tuple(column.name for column in class_mapper(cls).columns)
+    return names, attrgetter(*names)
+
 def to_dict(obj):
     """
     Переводит в формат dict
     """
-    return {column.name: getattr(obj, column.name) for column in class_mapper(obj.__class__).columns}
+    names, getter = model_columns(obj.__class__)
+    return dict(zip(names, getter(obj)))
 
 def uuid_to_str(value):
     """
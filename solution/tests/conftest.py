@@ -0,0 +1,189 @@
+import asyncio
+import os
+import pytest
+import pytest_asyncio
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from redis.asyncio import Redis
+from redis.exceptions import ConnectionError as RedisConnectionError
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+from src.backend.config import settings
+from src.backend.db import Base
+from src.models.company import Company
+from src.models.promocode import PromoCode
+from src.models.user import User
+from src.models.comment import Commentary
+from src.utils.promo_helpers import target_columns
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", f"{settings.database_url}_test")
+TEST_REDIS_URL = os.getenv("TEST_REDIS_URL", f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/15")
+
+
+@pytest_asyncio.fixture
+async def engine():
+    engine = create_async_engine(TEST_DATABASE_URL)
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+    except (OSError, DBAPIError) as e:
+        await engine.dispose()
+        pytest.skip(f"Postgres недоступен: {e}")
+    yield engine
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def db(engine):
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with session_maker() as session:
+        yield session
+
+
+@pytest_asyncio.fixture
+async def redis():
+    redis = Redis.from_url(TEST_REDIS_URL)
+    try:
+        await redis.flushdb()
+    except (OSError, RedisConnectionError) as e:
+        await redis.aclose()
+        pytest.skip(f"Redis недоступен: {e}")
+    yield redis
+    await redis.flushdb()
+    await redis.aclose()
+
+
+@pytest.fixture
+def statements(engine):
+    """
+    Список SQL-запросов, выполненных через engine за время теста
+    """
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine.sync_engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+
+@pytest_asyncio.fixture
+async def company(db):
+    company = Company(name="Test Company", email=f"{uuid4().hex}@company.com", password="hashed")
+    db.add(company)
+    await db.commit()
+    return company
+
+
+@pytest_asyncio.fixture
+async def user(db):
+    user = User(
+        name="Test",
+        surname="User",
+        email=f"{uuid4().hex}@user.com",
+        password="hashed",
+        other={"age": 23, "country": "ru"},
+    )
+    db.add(user)
+    await db.commit()
+    return user
+
+
+@pytest.fixture
+def make_promos(db, company):
+    """
+    Создаёт count COMMON-промокодов компании с заданным таргетингом
+    """
+    async def make(count: int, target: dict = None, **fields) -> list:
+        now = datetime.utcnow()
+        promos = [
+            PromoCode(
+                company_id=company.id,
+                company_name=company.name,
+                mode="COMMON",
+                promo_common="common-promo",
+                max_count=100,
+                target=target or {},
+                **target_columns(target),
+                description=f"Test promo number {i}",
+                created_at=now - timedelta(seconds=i),
+                promo_id=uuid4(),
+                **fields,
+            )
+            for i in range(count)
+        ]
+        db.add_all(promos)
+        await db.commit()
+        return promos
+
+    return make
+
+
+@pytest.fixture
+def make_users(db):
+    """
+    Создаёт count пользователей из России 23 лет, как у фикстуры user
+    """
+    async def make(count: int) -> list:
+        users = [
+            User(
+                name="Test",
+                surname="User",
+                email=f"{uuid4().hex}@user.com",
+                password="hashed",
+                other={"age": 23, "country": "ru"},
+            )
+            for _ in range(count)
+        ]
+        db.add_all(users)
+        await db.commit()
+        return users
+
+    return make
+
+
+class AntifraudStub:
+    """
+    Локальный антифрод: считает обращения, умеет отвечать ошибками и с задержкой
+    """
+    def __init__(self):
+        self.hits = 0
+        self.peers = set()
+        self.verdicts = {}
+        self.failures = 0
+        self.delay = 0
+        self.cache_ms = 5000
+
+    async def validate(self, request: web.Request) -> web.Response:
+        self.hits += 1
+        self.peers.add(request.transport.get_extra_info("peername"))
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            return web.Response(status=500)
+        data = await request.json()
+        cache_until = None
+        if self.cache_ms:
+            cache_until = (datetime.now(timezone.utc) + timedelta(milliseconds=self.cache_ms)).isoformat()
+        return web.json_response({"ok": self.verdicts.get(data["user_email"], True), "cache_until": cache_until})
+
+
+@pytest_asyncio.fixture
+async def antifraud_stub():
+    stub = AntifraudStub()
+    app = web.Application()
+    app.router.add_post("/api/validate", stub.validate)
+    server = TestServer(app)
+    await server.start_server()
+    stub.address = f"{server.host}:{server.port}"
+    yield stub
+    await server.close()
@@ -0,0 +1,124 @@
+import asyncio
+from uuid import UUID, uuid4
+from sqlalchemy import select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from src.models.promocode import PromoCode
+from src.models.promocode import PromoStatByCountry
+from src.models.user import User, user_activated_promos
+from src.repositories.promo import PromoRepository as BusinessPromoRepository
+from src.repositories.user_promo import PromoRepository
+from src.schemas.promo import PromoCreate
+from src.services.promo import PromoService as BusinessPromoService
+
+
+async def _create_promo(db, company, **fields) -> PromoCode:
+    data = PromoCreate(description="Activation test promo", target={}, **fields)
+    created = await BusinessPromoService(db).create_promo(data, company)
+    return await PromoRepository(db).get_by_id(UUID(created["id"]))
+
+
+async def _activate_concurrently(engine, user, promo, times: int) -> list:
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def activate():
+        async with session_maker() as session:
+            issued = await PromoRepository(session).activate_promo(user.id, user.other["country"], promo)
+            return issued[0] if issued else None
+
+    return await asyncio.gather(*(activate() for _ in range(times)))
+
+
+async def _reload(db, promo) -> PromoCode:
+    result = await db.execute(
+        select(PromoCode).where(PromoCode.promo_id == promo.promo_id).execution_options(populate_existing=True)
+    )
+    return result.scalar()
+
+
+async def test_unique_codes_are_issued_once_under_contention(engine, db, company, user):
+    codes = [f"code-{i}" for i in range(50)]
+    promo = await _create_promo(db, company, mode="UNIQUE", max_count=1, promo_unique=codes)
+
+    issued = await _activate_concurrently(engine, user, promo, 100)
+
+    issued_codes = [code for code in issued if code is not None]
+    assert sorted(issued_codes) == sorted(codes)
+    promo = await _reload(db, promo)
+    assert promo.used_count == 50
+    assert promo.active is False
+    activation_count = await db.scalar(
+        select(user_activated_promos.c.activation_count).where(user_activated_promos.c.promo_id == promo.promo_id)
+    )
+    assert activation_count == 50
+
+
+async def test_unique_activations_do_not_wait_for_each_other(engine, db, company, user):
+    promo = await _create_promo(db, company, mode="UNIQUE", max_count=1, promo_unique=["code-1", "code-2", "code-3"])
+    other_user = User(name="Other", surname="User", email=f"{uuid4().hex}@user.com", password="hashed",
+                      other={"age": 30, "country": "ru"})
+    db.add(other_user)
+    await db.commit()
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async with session_maker() as first, session_maker() as second, session_maker() as observer:
+        # Ожидание любой блокировки дольше секунды - ошибка, а не зависший тест
+        for session in (first, second, observer):
+            await session.execute(text("SET LOCAL lock_timeout = '1s'"))
+        first_code = (await PromoRepository(first).issue_promo(user.id, "ru", promo)).code
+        second_code = (await PromoRepository(second).issue_promo(other_user.id, "ru", promo)).code
+        # Обе транзакции открыты, а строку промокода можно обновить: на ней только блокировки внешних ключей
+        await observer.execute(
+            select(PromoCode.promo_id).where(PromoCode.promo_id == promo.promo_id)
+            .with_for_update(nowait=True, key_share=True)
+        )
+        await first.commit()
+        await second.commit()
+
+    assert {first_code, second_code} == {"code-1", "code-2"}
+    promo = await _reload(db, promo)
+    assert promo.used_count == 2
+    assert promo.active is True
+    stat = await BusinessPromoService(db).get_promo_stat(promo.promo_id, company.id)
+    assert [(c.country, c.activations_count) for c in stat.countries] == [("ru", 2)]
+
+
+async def test_common_counter_never_exceeds_max_count(engine, db, company, user):
+    promo = await _create_promo(db, company, mode="COMMON", max_count=30, promo_common="common-code")
+
+    issued = await _activate_concurrently(engine, user, promo, 60)
+
+    assert issued.count("common-code") == 30
+    assert issued.count(None) == 30
+    promo = await _reload(db, promo)
+    assert promo.used_count == 30
+    assert promo.active is False
+
+
+async def test_stats_follow_activations_by_user_country(engine, db, company, user):
+    promo = await _create_promo(db, company, mode="COMMON", max_count=100, promo_common="common-code")
+    other_user = User(name="Other", surname="User", email=f"{uuid4().hex}@user.com", password="hashed",
+                      other={"age": 30, "country": "KZ"})
+    db.add(other_user)
+    await db.commit()
+
+    await _activate_concurrently(engine, user, promo, 3)
+    await _activate_concurrently(engine, other_user, promo, 2)
+    stat = await BusinessPromoService(db).get_promo_stat(promo.promo_id, company.id)
+
+    assert stat.activations_count == 5
+    assert [(c.country, c.activations_count) for c in stat.countries] == [("kz", 2), ("ru", 3)]
+    assert await BusinessPromoRepository(db).diff_promo_stats() == []
+
+
+async def test_rebuild_repairs_drifted_stats(engine, db, company, user):
+    promo = await _create_promo(db, company, mode="COMMON", max_count=100, promo_common="common-code")
+    await _activate_concurrently(engine, user, promo, 4)
+    await db.execute(update(PromoStatByCountry).values(activations_count=1))
+    await db.commit()
+    repo = BusinessPromoRepository(db)
+
+    assert await repo.diff_promo_stats() == [(promo.promo_id, "ru", 1, 4)]
+    assert await repo.rebuild_promo_stats() == 1
+    assert await repo.diff_promo_stats() == []
+    assert await repo.get_promo_stat(promo.promo_id) == [("ru", 4)]
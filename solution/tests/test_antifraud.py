@@ -0,0 +1,81 @@
+import asyncio
+from uuid import uuid4
+import pytest_asyncio
+from src.backend.antifraud import AntifraudClient
+
+
+@pytest_asyncio.fixture
+async def client(antifraud_stub):
+    client = AntifraudClient(address=antifraud_stub.address, retry_backoff=0.01)
+    await client.start()
+    yield client
+    await client.close()
+
+
+async def test_verdict_is_cached_until_cache_until(client, antifraud_stub, redis):
+    antifraud_stub.cache_ms = 300
+    promo_id = uuid4()
+
+    assert await client.validate(redis, "user@mail.com", promo_id) is True
+    assert await client.validate(redis, "user@mail.com", promo_id) is True
+    assert antifraud_stub.hits == 1
+
+    await asyncio.sleep(0.4)
+    assert await client.validate(redis, "user@mail.com", promo_id) is True
+    assert antifraud_stub.hits == 2
+
+
+async def test_negative_verdict_is_cached_too(client, antifraud_stub, redis):
+    antifraud_stub.verdicts["blocked@mail.com"] = False
+    promo_id = uuid4()
+
+    assert await client.validate(redis, "blocked@mail.com", promo_id) is False
+    antifraud_stub.verdicts["blocked@mail.com"] = True
+    assert await client.validate(redis, "blocked@mail.com", promo_id) is False
+    assert antifraud_stub.hits == 1
+
+
+async def test_failed_call_is_retried_once(client, antifraud_stub, redis):
+    antifraud_stub.failures = 1
+    assert await client.validate(redis, "user@mail.com", uuid4()) is True
+    assert antifraud_stub.hits == 2
+
+    antifraud_stub.failures = 2
+    assert await client.validate(redis, "user@mail.com", uuid4()) is False
+    assert antifraud_stub.hits == 4
+
+
+async def test_connections_are_kept_alive(client, antifraud_stub, redis):
+    antifraud_stub.cache_ms = 0
+    for _ in range(5):
+        await client.validate(redis, "user@mail.com", uuid4())
+
+    assert antifraud_stub.hits == 5
+    assert len(antifraud_stub.peers) == 1
+
+
+async def test_concurrent_checks_share_one_upstream_call(client, antifraud_stub, redis):
+    antifraud_stub.delay = 0.1
+    promo_id = uuid4()
+
+    verdicts = await asyncio.gather(*(client.validate(redis, "user@mail.com", promo_id) for _ in range(50)))
+
+    assert verdicts == [True] * 50
+    assert antifraud_stub.hits == 1
+
+
+async def test_workers_wait_for_the_leader_verdict(antifraud_stub, redis):
+    antifraud_stub.delay = 0.1
+    workers = [AntifraudClient(address=antifraud_stub.address, lock_poll=0.005) for _ in range(4)]
+    for worker in workers:
+        await worker.start()
+    promo_id = uuid4()
+
+    verdicts = await asyncio.gather(*(
+        worker.validate(redis, "user@mail.com", promo_id) for worker in workers for _ in range(10)
+    ))
+
+    for worker in workers:
+        await worker.close()
+    assert verdicts == [True] * 40
+    assert antifraud_stub.hits == 1
@@ -0,0 +1,45 @@
+from uuid import UUID
+from src.backend.config import settings
+from src.services.user_promo import PromoService
+
+
+async def test_comment_page_loads_authors_in_the_page_query(db, make_promos, make_users, statements, monkeypatch):
+    promo, = await make_promos(1)
+    authors = await make_users(10)
+    authors[0].avatar_url = "https://cdn.example.com/avatar.png"
+    await db.commit()
+    service = PromoService(db)
+    for i in range(100):
+        await service.create_comment(promo.promo_id, authors[i % 10], f"Comment {i}")
+    db.expunge_all()
+
+    statements.clear()
+    comments, total, _ = await service.get_comments(promo.promo_id, offset=0, limit=100)
+
+    assert len(statements) == 2
+    assert total == 100 and len(comments) == 100
+    assert comments[0]["text"] == "Comment 99"
+    assert {comment["author"].get("avatar_url") for comment in comments} == {None, "https://cdn.example.com/avatar.png"}
+
+    monkeypatch.setattr(settings, "COMMENTS_COUNT_MODE", "window")
+    statements.clear()
+    comments, total, _ = await service.get_comments(promo.promo_id, offset=0, limit=100)
+    assert len(statements) == 1
+    assert total == 100 and comments[0]["author"] == {"name": "Test", "surname": "User"}
+
+
+async def test_get_and_edit_comment_join_the_author(db, user, make_promos, statements):
+    promo, = await make_promos(1)
+    service = PromoService(db)
+    created = await service.create_comment(promo.promo_id, user, "Nice promo")
+    db.expunge_all()
+
+    statements.clear()
+    comment = await service.get_comment(promo.promo_id, UUID(created["id"]), user)
+    assert len(statements) == 1
+    assert comment["author"] == {"name": "Test", "surname": "User"}
+
+    statements.clear()
+    edited = await service.edit_comment(promo.promo_id, UUID(created["id"]), user, "Even nicer")
+    assert len(statements) == 2
+    assert edited == {**comment, "text": "Even nicer"}
@@ -0,0 +1,47 @@
+import asyncio
+from uuid import UUID
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from src.models.comment import Commentary
+from src.models.promocode import PromoCode
+from src.models.user import user_liked_promos
+from src.services.user_promo import PromoService
+
+
+async def _counts(db, promo_id) -> tuple:
+    like_count, comment_count = (await db.execute(
+        select(PromoCode.like_count, PromoCode.comment_count).where(PromoCode.promo_id == promo_id)
+        .execution_options(populate_existing=True)
+    )).one()
+    liked_rows = await db.scalar(select(func.count()).where(user_liked_promos.c.promo_id == promo_id))
+    return like_count, comment_count, liked_rows
+
+
+async def test_parallel_likes_keep_exact_counters(engine, db, make_promos, make_users):
+    promo, = await make_promos(1)
+    users = await make_users(500)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def run(method: str, user):
+        async with session_maker() as session:
+            await getattr(PromoService(session), method)(promo.promo_id, user)
+
+    await asyncio.gather(*(run("like_promo", user) for user in users * 2))
+    assert await _counts(db, promo.promo_id) == (500, 0, 500)
+
+    await asyncio.gather(*(run("unlike_promo", user) for user in users * 2))
+    assert await _counts(db, promo.promo_id) == (0, 0, 0)
+
+
+async def test_comment_counter_follows_create_and_delete(db, user, make_promos, statements):
+    promo, = await make_promos(1)
+    service = PromoService(db)
+
+    statements.clear()
+    created = await service.create_comment(promo.promo_id, user, "Nice promo")
+    assert len(statements) == 1
+
+    await service.delete_comment(promo.promo_id, UUID(created["id"]), user)
+    assert await db.scalar(select(func.count()).select_from(Commentary)) == 0
+    assert await _counts(db, promo.promo_id) == (0, 0, 0)
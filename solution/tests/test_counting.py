@@ -0,0 +1,53 @@
+import pytest
+from src.backend.config import settings
+from src.services.promo import PromoService as BusinessPromoService
+from src.services.user_promo import PromoService
+from src.schemas.promo import PromoCreate
+
+
+@pytest.mark.parametrize("mode", ["exact", "cached", "window"])
+async def test_feed_total_is_exact_in_every_mode(db, redis, user, make_promos, monkeypatch, mode):
+    monkeypatch.setattr(settings, "FEED_COUNT_MODE", mode)
+    await make_promos(5)
+    service = PromoService(db, redis)
+
+    first_page, total, _ = await service.get_feed(user, limit=2, offset=0)
+    past_end, past_end_total, _ = await service.get_feed(user, limit=2, offset=10)
+
+    assert len(first_page) == 2
+    assert total == past_end_total == 5
+    assert past_end == []
+
+
+async def test_window_mode_counts_in_the_page_query(db, user, make_promos, monkeypatch, statements):
+    monkeypatch.setattr(settings, "FEED_COUNT_MODE", "window")
+    await make_promos(5)
+    statements.clear()
+
+    await PromoService(db).promo_repo.get_feed_promos(None, "ru", 23, limit=2)
+
+    assert len(statements) == 1
+
+
+async def test_cached_count_is_invalidated_by_new_promo(db, redis, company, user, make_promos, monkeypatch, statements):
+    monkeypatch.setattr(settings, "FEED_COUNT_MODE", "cached")
+    await make_promos(3)
+    service = PromoService(db, redis)
+    await service.get_feed(user, limit=2, offset=0)
+
+    statements.clear()
+    _, total, _ = await service.get_feed(user, limit=2, offset=0)
+    assert total == 3
+    assert not any("count(promo_codes.id)" in statement for statement in statements)
+
+    promo = PromoCreate(
+        description="Freshly created promo",
+        target={},
+        max_count=10,
+        mode="COMMON",
+        promo_common="fresh-promo",
+    )
+    await BusinessPromoService(db, redis).create_promo(promo, company)
+
+    _, total, _ = await service.get_feed(user, limit=2, offset=0)
+    assert total == 4
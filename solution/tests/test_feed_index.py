@@ -0,0 +1,173 @@
+import asyncio
+from types import SimpleNamespace
+from uuid import UUID
+from fastapi import HTTPException
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from src.backend.antifraud import AntifraudClient
+from src.backend.config import settings
+from src.models.promocode import PromoCode
+from src.repositories import feed_index
+from src.repositories.feed_index import FeedIndex, REGISTRY_KEY, VERSION_KEY, build_lock_key, segment_keys
+from src.schemas.promo import PromoCreate, PromoPatch
+from src.services.promo import PromoService as BusinessPromoService
+from src.services.user_promo import PromoService
+
+
+def _user(country: str, age: int):
+    return SimpleNamespace(id=None, other={"country": country, "age": age})
+
+
+async def _pages(service, user, active=None, limit=3) -> list:
+    """
+    Вся лента пользователя по курсору и первая страница по offset
+    """
+    pages, cursor = [], None
+    while True:
+        page, total, cursor = await service.get_feed(user, limit=limit, offset=0, active=active, cursor=cursor)
+        pages.append(([promo["promo_id"] for promo in page], total))
+        if cursor is None:
+            break
+    second, total, _ = await service.get_feed(user, limit=limit, offset=limit, active=active)
+    pages.append(([promo["promo_id"] for promo in second], total))
+    return pages
+
+
+async def test_indexed_feed_matches_postgres(db, redis, make_promos, monkeypatch):
+    await make_promos(4)
+    await make_promos(3, {"country": "ru"})
+    await make_promos(3, {"country": "fr", "age_from": 30})
+    await make_promos(2, {"age_from": 18, "age_until": 25}, active=False)
+    tied = await make_promos(3, {"age_until": 40})
+    # Одинаковый created_at: порядок задаёт id, курсор не должен терять и дублировать строки
+    await db.execute(update(PromoCode).where(PromoCode.id.in_([promo.id for promo in tied])).values(created_at=tied[0].created_at))
+    await db.commit()
+    service = PromoService(db, redis)
+    segments = [("ru", 23), ("fr", 35), ("fr", 20), ("", 0)]
+
+    monkeypatch.setattr(settings, "FEED_INDEX_ENABLED", False)
+    expected = {(segment, active): await _pages(service, _user(*segment), active) for segment in segments for active in (None, True)}
+
+    monkeypatch.setattr(settings, "FEED_INDEX_ENABLED", True)
+    for (segment, active), pages in expected.items():
+        assert await _pages(service, _user(*segment), active) == pages
+    assert await redis.scard(REGISTRY_KEY) == len(segments)
+
+
+async def test_create_and_patch_update_built_segments(db, redis, company, make_promos, monkeypatch, statements):
+    monkeypatch.setattr(settings, "FEED_INDEX_ENABLED", True)
+    promo, = await make_promos(1, {"country": "ru"})
+    service = PromoService(db, redis)
+    russian, french = _user("ru", 23), _user("fr", 40)
+    assert (await service.get_feed(russian, limit=10, offset=0))[1] == 1
+    assert (await service.get_feed(french, limit=10, offset=0))[1] == 0
+
+    business = BusinessPromoService(db, redis)
+    await business.create_promo(
+        PromoCreate(description="Promo for adults", target={"age_from": 30}, max_count=10, mode="COMMON", promo_common="adults"),
+        company,
+    )
+    await business.patch_promo(promo.promo_id, PromoPatch(target={"country": "fr"}), company.id)
+
+    statements.clear()
+    russian_feed, russian_total, _ = await service.get_feed(russian, limit=10, offset=0)
+    french_feed, french_total, _ = await service.get_feed(french, limit=10, offset=0)
+    assert (russian_feed, russian_total) == ([], 0)
+    assert french_total == 2
+    assert [promo["description"] for promo in french_feed] == ["Promo for adults", promo.description]
+    # Лента из индекса: без COUNT и фильтра по таргетингу на всю таблицу, только гидратация страницы
+    assert not any("count(promo_codes.id)" in statement for statement in statements)
+
+
+async def test_reconcile_repairs_drift(db, redis, make_promos, monkeypatch):
+    monkeypatch.setattr(settings, "FEED_INDEX_ENABLED", True)
+    await make_promos(3)
+    index = FeedIndex(db, redis)
+    assert (await index.page("ru", 23, None, 0, 10))[1] == 3
+
+    # Обновление индекса потерялось: в БД промокод перестал подходить сегменту
+    hidden, = await make_promos(1)
+    await db.execute(update(PromoCode).where(PromoCode.target_country.is_(None)).values(active=False))
+    await db.commit()
+    all_key, active_key, _ = segment_keys("ru:23")
+    assert await redis.zcard(active_key) == 3
+
+    assert await index.reconcile() == {"ru:23": 4}
+    assert await redis.zcard(all_key) == 4
+    assert await redis.zcard(active_key) == 0
+    assert str(hidden.id).encode() in await redis.zrange(all_key, 0, -1)
+
+
+async def test_concurrent_exhaustion_leaves_the_active_feed(engine, db, redis, company, make_promos, make_users, antifraud_stub, monkeypatch):
+    monkeypatch.setattr(settings, "FEED_INDEX_ENABLED", True)
+    remaining, = await make_promos(1)
+    business = BusinessPromoService(db, redis)
+    exhausted = [
+        UUID((await business.create_promo(PromoCreate(description="Common promo to exhaust", target={}, **fields), company))["id"])
+        for fields in (
+            {"mode": "COMMON", "max_count": 5, "promo_common": "common"},
+            {"mode": "UNIQUE", "max_count": 1, "promo_unique": [f"code-{i}" for i in range(5)]},
+        )
+    ]
+    users = await make_users(10)
+    assert (await PromoService(db, redis).get_feed(users[0], limit=10, offset=0, active=True))[1] == 3
+
+    antifraud = AntifraudClient(address=antifraud_stub.address)
+    await antifraud.start()
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def activate(promo_id, user):
+        async with session_maker() as session:
+            return await PromoService(session, redis, antifraud).activate_promo(promo_id, user)
+
+    # Все активации читают промокод до выдачи, последней из них used_count ещё не виден
+    results = await asyncio.gather(
+        *(activate(promo_id, user) for promo_id in exhausted for user in users), return_exceptions=True
+    )
+    await antifraud.close()
+    assert sum(isinstance(result, str) for result in results) == 10
+    assert all(isinstance(result, (str, HTTPException)) for result in results)
+
+    feed, total, _ = await PromoService(db, redis).get_feed(users[0], limit=10, offset=0, active=True)
+    assert ([promo["promo_id"] for promo in feed], total) == ([str(remaining.promo_id)], 1)
+
+
+async def test_disabled_index_is_left_untouched(db, redis, company, make_promos):
+    promo, = await make_promos(1)
+    business = BusinessPromoService(db, redis)
+    await business.create_promo(
+        PromoCreate(description="Promo while index is off", target={}, max_count=10, mode="COMMON", promo_common="index-off"),
+        company,
+    )
+    await business.patch_promo(promo.promo_id, PromoPatch(target={"country": "fr"}), company.id)
+
+    assert await redis.exists(VERSION_KEY, REGISTRY_KEY) == 0
+
+
+async def test_build_streams_segment_in_chunks(db, redis, make_promos, monkeypatch):
+    monkeypatch.setattr(settings, "FEED_INDEX_ENABLED", True)
+    monkeypatch.setattr(feed_index, "BUILD_CHUNK", 2)
+    await make_promos(5)
+    await make_promos(2, active=False)
+    index = FeedIndex(db, redis)
+    calls = []
+    evaluate = redis.eval
+
+    async def spy_eval(script, numkeys, *args):
+        calls.append(len(args) - numkeys)
+        return await evaluate(script, numkeys, *args)
+
+    monkeypatch.setattr(redis, "eval", spy_eval)
+    assert await index.build("ru", 23)
+
+    all_key, active_key, _ = segment_keys("ru:23")
+    assert await redis.zcard(all_key) == 7
+    assert await redis.zcard(active_key) == 5
+    # Ни один скрипт не получает промокоды сегмента аргументами
+    assert max(calls) <= 3
+    assert await redis.keys(f"{all_key}:*") == []
+
+    # Пока сегмент строит другой запрос, повторная сборка не начинается
+    await redis.set(build_lock_key("ru:23"), "other")
+    assert not await index.build("ru", 23)
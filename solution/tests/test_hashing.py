@@ -0,0 +1,28 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from src.backend.hashing import PasswordHasher
+
+
+async def test_hash_and_verify_run_in_executor():
+    hasher = PasswordHasher(max_workers=2, max_queue=2)
+    hashed = await hasher.hash("Password123!")
+
+    assert await hasher.verify("Password123!", hashed)
+    assert not await hasher.verify("WrongPassword1!", hashed)
+    assert hasher.in_flight == 0
+    hasher.shutdown()
+
+
+async def test_rejects_with_503_when_queue_is_full():
+    hasher = PasswordHasher(max_workers=1, max_queue=1)
+    running = [asyncio.create_task(hasher.hash("Password123!")) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    assert hasher.queue_depth == 1
+    with pytest.raises(HTTPException) as exc:
+        await hasher.hash("Password123!")
+    assert exc.value.status_code == 503
+
+    await asyncio.gather(*running)
+    hasher.shutdown()
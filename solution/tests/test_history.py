@@ -0,0 +1,53 @@
+from datetime import datetime
+from sqlalchemy import update
+from src.models.promocode import PromoActivation
+from src.models.user import user_liked_promos
+from src.repositories.user_promo import PromoRepository
+from src.services.user_promo import PromoService
+
+
+async def _activate(db, user, promos: list) -> None:
+    repo = PromoRepository(db)
+    for promo in promos:
+        assert await repo.activate_promo(user.id, user.other["country"], promo) == (promo.promo_common, True)
+
+
+async def test_history_lists_every_activation_newest_first(db, user, make_promos, statements):
+    first, second = await make_promos(2)
+    await _activate(db, user, [first, first, second])
+    await db.execute(user_liked_promos.insert().values(user_id=user.id, promo_id=second.promo_id))
+    await db.commit()
+    service = PromoService(db)
+
+    statements.clear()
+    history, total, _ = await service.get_history(user, limit=10, offset=0)
+
+    assert len(statements) == 2
+    assert total == 3
+    assert [promo["promo_id"] for promo in history] == [str(second.promo_id), str(first.promo_id), str(first.promo_id)]
+    assert all(promo["is_activated_by_user"] for promo in history)
+    assert [promo["is_liked_by_user"] for promo in history] == [True, False, False]
+
+
+async def test_history_cursor_pages_match_offset_pages(db, user, make_promos):
+    promos = await make_promos(3)
+    await _activate(db, user, promos * 3)
+    await db.execute(update(PromoActivation).values(activated_at=datetime(2025, 1, 1)))
+    await db.commit()
+    service = PromoService(db)
+
+    by_offset = []
+    for offset in range(0, 9, 4):
+        page, _, _ = await service.get_history(user, limit=4, offset=offset)
+        by_offset += page
+
+    by_cursor, cursor = [], None
+    while True:
+        page, total, cursor = await service.get_history(user, limit=4, offset=0, cursor=cursor)
+        by_cursor += page
+        if cursor is None:
+            break
+
+    assert total == 9
+    assert by_cursor == by_offset
+    assert len(by_cursor) == 9
@@ -0,0 +1,90 @@
+import asyncio
+from uuid import uuid4
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from src.backend.config import settings
+from src.models.promocode import PromoCode
+from src.models.user import user_liked_promos
+from src.repositories.like_buffer import LikeBuffer, CLAIM_SCRIPT, DIRTY_KEY, INFLIGHT_KEY
+from src.services.user_promo import PromoService
+
+
+async def _db_likes(db, promo_id) -> tuple:
+    like_count = await db.scalar(
+        select(PromoCode.like_count).where(PromoCode.promo_id == promo_id).execution_options(populate_existing=True)
+    )
+    rows = await db.scalar(select(func.count()).where(user_liked_promos.c.promo_id == promo_id))
+    return like_count, rows
+
+
+async def test_write_behind_likes_reach_postgres_only_on_flush(engine, db, redis, make_promos, make_users, monkeypatch):
+    monkeypatch.setattr(settings, "LIKES_WRITE_BEHIND", True)
+    promo, = await make_promos(1)
+    users = await make_users(200)
+    session_maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    # Пул Redis-клиента ограничен, поэтому одновременных запросов меньше, чем лайков
+    limit = asyncio.Semaphore(50)
+
+    async def run(method: str, user):
+        async with limit, session_maker() as session:
+            await getattr(PromoService(session, redis), method)(promo.promo_id, user)
+
+    await asyncio.gather(*(run("like_promo", user) for user in users * 2))
+    await asyncio.gather(*(run("unlike_promo", user) for user in users[:50]))
+
+    assert await redis.scard(f"likes:{promo.promo_id}:users") == 150
+    assert await _db_likes(db, promo.promo_id) == (0, 0)
+
+    assert await LikeBuffer(db, redis).flush(settings.LIKES_FLUSH_BATCH) == 1
+    assert await _db_likes(db, promo.promo_id) == (150, 150)
+    assert await LikeBuffer(db, redis).flush(settings.LIKES_FLUSH_BATCH) == 0
+
+
+async def test_interrupted_flush_is_replayed_idempotently(db, redis, user, make_promos):
+    first, second = await make_promos(2)
+    await db.execute(user_liked_promos.insert().values(user_id=user.id, promo_id=second.promo_id))
+    await db.commit()
+    buffer = LikeBuffer(db, redis)
+
+    assert await buffer.like_promo(user.id, first.promo_id) is True
+    assert await buffer.unlike_promo(user.id, second.promo_id) is True
+    assert await buffer.unlike_promo(user.id, second.promo_id) is False
+    # Воркер забрал пачку и упал до записи в БД
+    await redis.eval(CLAIM_SCRIPT, 2, DIRTY_KEY, INFLIGHT_KEY, 10)
+    assert await redis.scard(INFLIGHT_KEY) == 2
+
+    await buffer.flush(10)
+    await buffer.flush(10)
+
+    assert await redis.scard(INFLIGHT_KEY) == 0
+    assert await _db_likes(db, first.promo_id) == (1, 1)
+    assert await _db_likes(db, second.promo_id) == (0, 0)
+
+
+async def test_write_behind_like_of_missing_promo_is_rejected(db, redis, user):
+    assert await LikeBuffer(db, redis).like_promo(user.id, uuid4()) is None
+    assert await redis.scard(DIRTY_KEY) == 0
+
+
+async def test_write_behind_like_is_visible_before_flush(db, redis, user, make_promos, monkeypatch):
+    monkeypatch.setattr(settings, "LIKES_WRITE_BEHIND", True)
+    promo, = await make_promos(1)
+    service = PromoService(db, redis)
+    await service.get_promo(promo.promo_id, user)
+
+    await service.like_promo(promo.promo_id, user)
+    await service.promo_repo.activate_promo(user.id, user.other["country"], promo)
+
+    fetched = await service.get_promo(promo.promo_id, user)
+    assert (fetched["is_liked_by_user"], fetched["like_count"]) == (True, 1)
+    feed, _, _ = await service.get_feed(user, limit=10, offset=0)
+    assert feed[0]["is_liked_by_user"] is True
+    history, _, _ = await service.get_history(user, limit=10, offset=0)
+    assert history[0]["is_liked_by_user"] is True
+
+    # Хэш счётчиков истёк: like_count перечитывается из множества, а не из like_count в БД
+    await redis.delete(service.promo_cache.counters_key(promo.promo_id))
+    fetched = await service.get_promo(promo.promo_id, user)
+    assert (fetched["is_liked_by_user"], fetched["like_count"]) == (True, 1)
+    assert await _db_likes(db, promo.promo_id) == (0, 0)
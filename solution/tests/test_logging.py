@@ -0,0 +1,99 @@
+import io
+import logging
+import orjson
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import text
+from src.backend.config import settings
+from src.backend.db import log_slow_queries
+from src.backend.log import NonBlockingQueueHandler, RequestIdMiddleware, configure_logging, log_stats, stop_logging
+
+# Вне иерархии логгеров: перехват логов pytest висит на корневом и форматирует каждую запись
+logger = logging.Logger("tests.logging")
+
+
+class Rendered:
+    calls = 0
+
+    def __str__(self):
+        Rendered.calls += 1
+        return "rendered"
+
+
+@pytest.fixture
+def json_logs(monkeypatch):
+    root = logging.getLogger()
+    handlers, level = root.handlers, root.level
+    stream = io.StringIO()
+    monkeypatch.setattr(settings, "LOG_SAMPLE_BURST", 5)
+    monkeypatch.setattr(settings, "LOG_SAMPLE_RATE", 0.0)
+
+    def read() -> list:
+        stop_logging()
+        return [orjson.loads(line) for line in stream.getvalue().splitlines()]
+
+    configure_logging(stream)
+    logger.handlers = [handler for handler in root.handlers if isinstance(handler, NonBlockingQueueHandler)]
+    yield read
+    stop_logging()
+    logger.handlers = []
+    root.handlers, root.level = handlers, level
+
+
+async def test_records_carry_request_id(json_logs):
+    app = FastAPI()
+    app.add_middleware(RequestIdMiddleware)
+
+    @app.get("/items")
+    async def items():
+        logger.info("Listing %s items for %s", 3, "user", extra={"page": 1})
+        return []
+
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http", "method": "GET", "path": "/items", "raw_path": b"/items", "root_path": "",
+        "query_string": b"", "headers": [(b"x-request-id", b"req-42")], "http_version": "1.1",
+        "scheme": "http", "server": ("test", 80), "client": ("test", 1),
+    }
+    await app(scope, receive, send)
+    logger.info("Outside of a request")
+
+    assert (b"x-request-id", b"req-42") in messages[0]["headers"]
+    inside, outside = [record for record in json_logs() if record["logger"] == "tests.logging"]
+    assert inside["message"] == "Listing 3 items for user"
+    assert inside["request_id"] == "req-42"
+    assert inside["page"] == 1
+    assert "request_id" not in outside
+
+
+async def test_sampled_out_records_are_never_formatted(json_logs):
+    Rendered.calls = 0
+    sampled_before = log_stats.sampled
+    for _ in range(50):
+        logger.info("Value %s", Rendered())
+    logger.error("Failure %s", Rendered())
+
+    records = json_logs()
+    assert [record["message"] for record in records] == ["Value rendered"] * 5 + ["Failure rendered"]
+    assert Rendered.calls == 6
+    assert log_stats.sampled - sampled_before == 45
+
+
+async def test_slow_queries_are_logged_without_parameters(engine, caplog):
+    log_slow_queries(engine, threshold_ms=20)
+    with caplog.at_level(logging.WARNING, logger="src.backend.db"):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await conn.execute(text("SELECT pg_sleep(:seconds)"), {"seconds": 0.05})
+
+    [record] = caplog.records
+    assert "pg_sleep" in record.statement
+    assert record.duration_ms >= 50
+    assert "0.05" not in record.getMessage()
@@ -0,0 +1,85 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+from fastapi import FastAPI
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from src.backend.metrics import MetricsMiddleware, instrument_engine
+from src.backend.redis import InstrumentedRedis
+from conftest import TEST_REDIS_URL
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+ROUTE = {"method": "GET", "route": "/items/{item_id}"}
+
+
+async def _get(app, path: str) -> int:
+    scope = {
+        "type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": [], "http_version": "1.1", "scheme": "http",
+        "server": ("test", 80), "client": ("test", 1),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages[0]["status"]
+
+
+def _sample(name: str, labels: dict) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+async def test_middleware_splits_request_time_by_layer(engine, redis):
+    instrument_engine(engine)
+    client = InstrumentedRedis.from_url(TEST_REDIS_URL)
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await conn.execute(text("SELECT 2"))
+        await client.set(f"item:{item_id}", item_id)
+        return {"id": item_id}
+
+    before = {
+        "requests": _sample("http_request_duration_seconds_count", {**ROUTE, "status": "200"}),
+        "statements": _sample("http_request_db_statements_sum", ROUTE),
+        "redis": _sample("redis_command_duration_seconds_count", {"command": "SET"}),
+    }
+    assert await _get(app, "/items/1") == 200
+    assert await _get(app, "/items/2") == 200
+    assert await _get(app, "/missing") == 404
+    await client.aclose()
+
+    assert _sample("http_request_duration_seconds_count", {**ROUTE, "status": "200"}) - before["requests"] == 2
+    assert _sample("http_request_db_statements_sum", ROUTE) - before["statements"] == 4
+    assert _sample("redis_command_duration_seconds_count", {"command": "SET"}) - before["redis"] == 2
+    assert _sample("http_request_db_seconds_sum", ROUTE) > 0
+    assert _sample("http_request_redis_seconds_sum", ROUTE) > 0
+    assert REGISTRY.get_sample_value("http_request_duration_seconds_count", {"method": "GET", "route": "/items/2", "status": "200"}) is None
+
+
+def test_metrics_are_summed_across_worker_processes(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+    worker = (
+        "from src.backend.metrics import HTTP_LATENCY;"
+        "HTTP_LATENCY.labels('GET', '/api/user/feed', '200').observe(0.01)"
+    )
+    for _ in range(3):
+        subprocess.run([sys.executable, "-c", worker], env=env, check=True, cwd=PROJECT_ROOT)
+    scrape = (
+        "from prometheus_client import generate_latest;"
+        "from src.backend.metrics import metrics_registry;"
+        "print(generate_latest(metrics_registry()).decode())"
+    )
+    output = subprocess.run([sys.executable, "-c", scrape], env=env, check=True, cwd=PROJECT_ROOT, capture_output=True, text=True).stdout
+
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/user/feed",status="200"} 3.0' in output
@@ -0,0 +1,73 @@
+import time
+from jose import jwt
+from src.backend.config import settings
+from src.backend.principal_cache import PrincipalCache
+from src.utils import get_company_or_user
+
+
+def test_evicts_least_recently_used_entry():
+    cache = PrincipalCache(max_entries=2, ttl=60)
+    cache.set("user", "token-1", 1, {"id": 1})
+    cache.set("user", "token-2", 2, {"id": 2})
+    assert cache.get("user", "token-1").id == 1
+
+    cache.set("user", "token-3", 3, {"id": 3})
+
+    assert cache.get("user", "token-2") is None
+    assert cache.get("user", "token-1").id == 1
+    assert cache.get("user", "token-3").id == 3
+
+
+def test_entry_does_not_outlive_token():
+    cache = PrincipalCache(max_entries=10, ttl=60)
+    cache.set("user", "expired", 1, {"id": 1}, token_exp=int(time.time()) - 1)
+
+    assert cache.get("user", "expired") is None
+    assert len(cache) == 0
+
+
+def test_invalidate_drops_all_tokens_of_principal():
+    cache = PrincipalCache(max_entries=10, ttl=60)
+    cache.set("user", "token-1", 1, {"id": 1})
+    cache.set("user", "token-2", 1, {"id": 1})
+    cache.set("company", "token-3", 1, {"id": 1})
+
+    cache.invalidate("user:1")
+
+    assert cache.get("user", "token-1") is None
+    assert cache.get("user", "token-2") is None
+    assert cache.get("user", "token-3") is None
+    assert cache.get("company", "token-3").id == 1
+
+
+async def test_invalidation_during_load_is_not_overwritten(db, redis, user, monkeypatch):
+    token = jwt.encode({"user_id": str(user.id), "exp": int(time.time()) + 600}, settings.RANDOM_SECRET, algorithm="HS256")
+    await redis.set(f"user:{user.id}:token", token)
+    monkeypatch.setattr(get_company_or_user, "principal_cache", PrincipalCache(max_entries=10, ttl=60))
+    cache = get_company_or_user.principal_cache
+    execute = db.execute
+
+    async def execute_during_sign_in(*args, **kwargs):
+        # Повторный вход пользователя, пока токен проверен, а пользователь ещё читается из БД
+        cache.invalidate(f"user:{user.id}")
+        return await execute(*args, **kwargs)
+
+    monkeypatch.setattr(db, "execute", execute_during_sign_in)
+    loaded = await get_company_or_user.get_current_user(f"Bearer {token}", db, redis)
+
+    assert loaded.id == user.id
+    assert cache.get("user", token) is None
+
+    monkeypatch.setattr(db, "execute", execute)
+    await get_company_or_user.get_current_user(f"Bearer {token}", db, redis)
+    assert cache.get("user", token).id == user.id
+
+
+def test_clear_discards_fills_started_before_it():
+    cache = PrincipalCache(max_entries=10, ttl=60)
+    generation = cache.generation("user", 1)
+    cache.clear()
+
+    cache.set("user", "token-1", 1, {"id": 1}, generation=generation)
+
+    assert cache.get("user", "token-1") is None
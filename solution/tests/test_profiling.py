@@ -0,0 +1,71 @@
+import asyncio
+import json
+from fastapi import FastAPI
+from sqlalchemy import text
+from src.backend.config import settings
+from src.backend.profiling import ProfilingMiddleware
+
+
+async def _get(app, path: str, headers: list) -> dict:
+    scope = {
+        "type": "http", "method": "GET", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": b"", "headers": headers, "http_version": "1.1", "scheme": "http",
+        "server": ("test", 80), "client": ("test", 1),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return dict(messages[0]["headers"])
+
+
+def _app(engine) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(ProfilingMiddleware)
+
+    @app.get("/slow")
+    async def slow():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT pg_sleep(0.05)"))
+        await asyncio.sleep(0.05)
+        return {"ok": True}
+
+    return app
+
+
+def _configure(monkeypatch, tmp_path, output_format: str):
+    monkeypatch.setattr(settings, "PROFILING_TOKEN", "secret")
+    monkeypatch.setattr(settings, "PROFILING_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "PROFILING_FORMAT", output_format)
+    monkeypatch.setattr(settings, "PROFILING_MIN_INTERVAL", 60)
+
+
+async def test_profile_is_written_only_for_privileged_requests(engine, monkeypatch, tmp_path):
+    _configure(monkeypatch, tmp_path, "collapsed")
+    app = _app(engine)
+
+    assert b"x-profile-file" not in await _get(app, "/slow", [])
+    assert b"x-profile-file" not in await _get(app, "/slow", [(b"x-profile", b"wrong")])
+    headers = await _get(app, "/slow", [(b"x-profile", b"secret")])
+    # Следующий профиль в этом воркере разрешён только через PROFILING_MIN_INTERVAL
+    assert b"x-profile-file" not in await _get(app, "/slow", [(b"x-profile", b"secret")])
+
+    profiles = list(tmp_path.iterdir())
+    assert [path.name.encode() for path in profiles] == [headers[b"x-profile-file"]]
+    stacks = profiles[0].read_text().splitlines()
+    awaited = sum(int(line.rsplit(" ", 1)[1]) for line in stacks if "slow (" in line and "[await]" in line)
+    assert awaited >= 90_000
+
+
+async def test_speedscope_output(engine, monkeypatch, tmp_path):
+    _configure(monkeypatch, tmp_path, "speedscope")
+    headers = await _get(_app(engine), "/slow", [(b"x-profile", b"secret")])
+
+    profile = json.loads((tmp_path / headers[b"x-profile-file"].decode()).read_text())
+    assert profile["$schema"] == "https://www.speedscope.app/file-format-schema.json"
+    assert any(frame["name"] == "slow" for frame in profile["shared"]["frames"])
@@ -0,0 +1,55 @@
+from src.schemas.promo import PromoPatch
+from src.services.promo import PromoService as BusinessPromoService
+from src.services.user_promo import PromoService
+
+
+async def test_cached_promo_overlays_counters_without_reloading(db, redis, user, make_promos, statements):
+    promo, = await make_promos(1)
+    service = PromoService(db, redis)
+    first = await service.get_promo(promo.promo_id, user)
+
+    await service.like_promo(promo.promo_id, user)
+    await service.create_comment(promo.promo_id, user, "Nice promo")
+    await service.promo_repo.activate_promo(user.id, user.other["country"], promo)
+    await service.promo_cache.bump(promo.promo_id, "used_count", 1)
+
+    statements.clear()
+    cached = await service.get_promo(promo.promo_id, user)
+
+    assert not [statement for statement in statements if "FROM promo_codes" in statement]
+    assert first["like_count"] == 0 and first["comment_count"] == 0
+    assert cached["like_count"] == 1 and cached["comment_count"] == 1
+    assert cached["is_liked_by_user"] is True and cached["is_activated_by_user"] is True
+    assert {key: value for key, value in cached.items() if key not in ("like_count", "comment_count", "is_liked_by_user", "is_activated_by_user")} == \
+        {key: value for key, value in first.items() if key not in ("like_count", "comment_count", "is_liked_by_user", "is_activated_by_user")}
+
+    await service.unlike_promo(promo.promo_id, user)
+    await service.unlike_promo(promo.promo_id, user)
+    assert (await service.get_promo(promo.promo_id, user))["like_count"] == 0
+
+
+async def test_patch_invalidates_cached_promo(db, redis, company, user, make_promos):
+    promo, = await make_promos(1)
+    business = BusinessPromoService(db, redis)
+    before = await business.get_promo_by_id(promo.promo_id, company.id)
+    assert (await PromoService(db, redis).get_promo(promo.promo_id, user))["description"] == before["description"]
+
+    await business.patch_promo(promo.promo_id, PromoPatch(description="Patched description"), company.id)
+
+    assert (await business.get_promo_by_id(promo.promo_id, company.id))["description"] == "Patched description"
+    assert (await PromoService(db, redis).get_promo(promo.promo_id, user))["description"] == "Patched description"
+
+
+async def test_expired_counters_reload_promo_from_db(db, redis, user, make_promos, statements):
+    promo, = await make_promos(1)
+    service = PromoService(db, redis)
+    await service.get_promo(promo.promo_id, user)
+    await service.like_promo(promo.promo_id, user)
+    await redis.delete(service.promo_cache.counters_key(promo.promo_id))
+    db.expunge_all()
+
+    statements.clear()
+    reloaded = await service.get_promo(promo.promo_id, user)
+
+    assert [statement for statement in statements if "FROM promo_codes" in statement]
+    assert reloaded["like_count"] == 1
@@ -0,0 +1,98 @@
+from src.models.user import user_activated_promos, user_liked_promos
+from src.services.user_promo import PromoService
+
+
+async def test_feed_statement_count_does_not_depend_on_limit(db, user, make_promos, statements):
+    promos = await make_promos(30)
+    await db.execute(user_liked_promos.insert().values(user_id=user.id, promo_id=promos[0].promo_id))
+    await db.execute(user_activated_promos.insert().values(user_id=user.id, promo_id=promos[1].promo_id))
+    await db.commit()
+    service = PromoService(db)
+
+    statements.clear()
+    small_page, _, _ = await service.get_feed(user, limit=5, offset=0)
+    small_page_statements = len(statements)
+
+    statements.clear()
+    large_page, total, _ = await service.get_feed(user, limit=30, offset=0)
+
+    assert total == 30
+    assert len(small_page) == 5
+    assert len(large_page) == 30
+    assert len(statements) == small_page_statements == 4
+
+    flags = {promo["promo_id"]: promo for promo in large_page}
+    assert flags[str(promos[0].promo_id)]["is_liked_by_user"] is True
+    assert flags[str(promos[0].promo_id)]["is_activated_by_user"] is False
+    assert flags[str(promos[1].promo_id)]["is_activated_by_user"] is True
+    assert flags[str(promos[2].promo_id)]["is_liked_by_user"] is False
+
+
+async def test_feed_filters_by_typed_target_columns(db, user, make_promos):
+    matching = await make_promos(1, {"country": "RU", "age_from": 18, "age_until": 30, "categories": ["Cats"]})
+    await make_promos(1, {"country": "FR"})
+    await make_promos(1, {"age_from": 40})
+    await make_promos(1, {"categories": ["party"]})
+    service = PromoService(db)
+
+    promos, total, _ = await service.get_feed(user, limit=10, offset=0, category="cAtS")
+
+    assert total == 1
+    assert [promo["promo_id"] for promo in promos] == [str(matching[0].promo_id)]
+
+    promos, total, _ = await service.get_feed(user, limit=10, offset=0, category="art")
+    assert total == 0
+
+
+async def test_feed_filters_by_any_or_all_categories(db, user, make_promos):
+    both, = await make_promos(1, {"categories": ["cats", "Food"]})
+    cats, = await make_promos(1, {"categories": ["cats"]})
+    food, = await make_promos(1, {"categories": ["food", "travel"]})
+    await make_promos(1, {"categories": ["catsfood"]})
+    await make_promos(1)
+    service = PromoService(db)
+
+    async def feed(**filters) -> set:
+        promos, total, _ = await service.get_feed(user, limit=10, offset=0, **filters)
+        assert total == len(promos)
+        return {promo["promo_id"] for promo in promos}
+
+    assert await feed(category=["CATS", "food"]) == {str(both.promo_id), str(cats.promo_id), str(food.promo_id)}
+    assert await feed(category=["cats", " Food "], category_match="all") == {str(both.promo_id)}
+    assert await feed(category=["cats", "food", "travel"], category_match="all") == set()
+
+
+async def test_feed_cursor_pages_match_offset_pages(db, user, make_promos):
+    await make_promos(7)
+    service = PromoService(db)
+    by_offset = [
+        promo["promo_id"]
+        for offset in (0, 3, 6)
+        for promo in (await service.get_feed(user, limit=3, offset=offset))[0]
+    ]
+
+    by_cursor = []
+    cursor = None
+    while True:
+        page, total, cursor = await service.get_feed(user, limit=3, offset=0, cursor=cursor)
+        by_cursor.extend(promo["promo_id"] for promo in page)
+        if cursor is None:
+            break
+
+    assert total == 7
+    assert len(by_cursor) == 7
+    assert by_cursor == by_offset
+
+
+async def test_feed_and_history_do_not_load_unique_codes(db, user, make_promos, statements):
+    promos = await make_promos(3)
+    service = PromoService(db)
+    await service.promo_repo.activate_promo(user.id, user.other["country"], promos[0])
+
+    statements.clear()
+    feed, _, _ = await service.get_feed(user, limit=10, offset=0)
+    history, _, _ = await service.get_history(user, limit=10, offset=0)
+
+    assert len(feed) == 3 and len(history) == 1
+    assert not [statement for statement in statements if "promo_codes.promo_unique," in statement]
+    assert history[0]["promo_id"] == str(promos[0].promo_id)